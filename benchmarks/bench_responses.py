@@ -0,0 +1,104 @@
+"""
+Compares serializing report pages through Pydantic + `response_model` with the
+orjson `MongoJSONResponse` fast path.
+
+Usage:
+    python -m benchmarks.bench_responses
+"""
+import json
+import timeit
+from datetime import date, datetime
+
+from bson import ObjectId, json_util
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from core.responses import ExtendedJSONResponse, MongoJSONResponse, with_defaults
+from models.filmshow import FilmShowReport
+
+
+def make_reports(count: int) -> list[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "Year": 2024,
+            "CreatedAt": date(2024, 5, 1),
+            "Team": "Paul",
+            "State": "Kebbi",
+            "LGA": "Ngaski",
+            "Ward": "Kimo",
+            "Village": f"Village {i}",
+            "Population": 415,
+            "UPG": "Dukawa/Kambari",
+            "Attendance": 80,
+            "SD_Cards": 32,
+            "Audio_Bibles": 25,
+            "People_Saved": 12,
+            "Date": "2024/05/01",
+            "Month": "MAY",
+            "updated_at": datetime(2024, 5, 1, 12, 30),
+        }
+        for i in range(count)
+    ]
+
+
+def make_links(count: int) -> list[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "url": f"https://www.youtube.com/watch?v={i:011d}",
+            "media_type": "video",
+            "created_at": datetime(2024, 5, 1, 12, 30),
+        }
+        for i in range(count)
+    ]
+
+
+# What FastAPI does for `response_model=List[FilmShowReport]`
+response_adapter = TypeAdapter(list[FilmShowReport])
+
+
+def pydantic_path(reports: list[dict]) -> bytes:
+    models = [FilmShowReport(**report) for report in reports]
+    validated = response_adapter.validate_python(
+        [model.model_dump(by_alias=True) for model in models]
+    )
+    content = jsonable_encoder(
+        response_adapter.dump_python(validated, mode="json", by_alias=True)
+    )
+    return JSONResponse(content).body
+
+
+def fast_path(reports: list[dict]) -> bytes:
+    return MongoJSONResponse(
+        [with_defaults(report, FilmShowReport) for report in reports]
+    ).body
+
+
+def json_util_path(reports: list[dict]) -> bytes:
+    return JSONResponse(json.loads(json_util.dumps(reports))).body
+
+
+def extended_path(reports: list[dict]) -> bytes:
+    return ExtendedJSONResponse(reports).body
+
+
+def main() -> None:
+    for count in (100, 1000):
+        reports = make_reports(count)
+        links = make_links(count)
+        number = max(1, 20000 // count)
+        print(f"{count} items ({number} runs each)")
+        for name, path, docs in (
+            ("pydantic + response_model", pydantic_path, reports),
+            ("MongoJSONResponse", fast_path, reports),
+            ("links json_util round trip", json_util_path, links),
+            ("links ExtendedJSONResponse", extended_path, links),
+        ):
+            seconds = timeit.timeit(lambda: path(docs), number=number) / number
+            print(f"  {name:<28} {seconds * 1000:8.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measures cold start: how long `import main` takes, which heavy optional
+dependencies it pulls in, and the latency of the first requests served.
+
+Every run is a fresh interpreter so nothing is already imported or cached.
+The app is driven in-process without its lifespan, so no database is needed;
+the first-request numbers cover routing, dependency resolution and OpenAPI
+schema generation, not MongoDB.
+
+Usage:
+    python -m benchmarks.startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Imported only by the paths that need them; none should load with the app
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pytube", "boto3", "cloudinary")
+
+FIRST_REQUESTS = ("/openapi.json", "/metrics")
+
+CHILD = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+heavy_modules = sorted(name for name in HEAVY if name in sys.modules)
+
+import httpx
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=main.app)
+    timings = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in PATHS:
+            request_started = time.perf_counter()
+            await client.get(path)
+            timings[path] = (time.perf_counter() - request_started) * 1000
+    return timings
+
+requests = asyncio.run(first_requests())
+
+# What a first upload pays for now that its parsers are imported on demand
+upload_started = time.perf_counter()
+import core.frames, openpyxl
+upload_imports = (time.perf_counter() - upload_started) * 1000
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "heavy_modules": heavy_modules,
+    "requests_ms": requests,
+    "upload_imports_ms": upload_imports,
+}))
+"""
+
+# Dummy values for the settings the app requires; nothing is contacted
+ENVIRONMENT = {
+    "MONGO_URL": "mongodb://localhost:27017",
+    "TITLE": "Hasken Rayuwa",
+    "DESCRIPTION": "Hasken Rayuwa API",
+    "API_VERSION": "v1",
+    "ADMIN_USERNAME": "admin",
+    "ADMIN_PASSWORD": "password",
+    "AUTH_SECRET_KEY": "bench-secret-key-xxxxxxxxxxxxxxxxxxxxxxxx",
+    "CLOUDINARY_CLOUD_NAME": "bench",
+    "CLOUDINARY_API_KEY": "bench",
+    "CLOUDINARY_API_SECRET": "bench",
+    "DOCS_URL": "/api/docs",
+    "S3_ACCESS_KEY": "bench",
+    "S3_SECRET_KEY": "bench",
+    "BUCKET_NAME": "bench",
+}
+
+
+def run_once() -> dict:
+    code = f"PATHS = {FIRST_REQUESTS!r}\nHEAVY = {HEAVY_MODULES!r}\n{CHILD}"
+    environment = {**ENVIRONMENT, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=environment,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+
+    def median(values) -> float:
+        return statistics.median(values)
+
+    print(f"{args.runs} cold starts, medians:")
+    print(f"  import main:            {median(run['import_ms'] for run in runs):8.1f} ms")
+    for path in FIRST_REQUESTS:
+        latency = median(run["requests_ms"][path] for run in runs)
+        print(f"  first GET {path:<14}{latency:8.1f} ms")
+    print(
+        f"  first upload imports:   {median(run['upload_imports_ms'] for run in runs):8.1f} ms"
+    )
+    heavy = runs[-1]["heavy_modules"]
+    print(f"  heavy modules loaded by import: {', '.join(heavy) if heavy else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
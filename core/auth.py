@@ -1,42 +1,280 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
 import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import orjson
 from fastapi import Depends
 from core.config import settings
 from fastapi import HTTPException, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.security import (
+    HTTPAuthorizationCredentials,
+    HTTPBasic,
+    HTTPBasicCredentials,
+    HTTPBearer,
+)
+from pymongo.errors import PyMongoError
+
+from db.database import get_db
+
+logger = logging.getLogger(__name__)
 
 # Security
 security = HTTPBasic()
+optional_basic = HTTPBasic(auto_error=False)
+bearer = HTTPBearer(auto_error=False)
 
 # Admin credentials
 ADMIN_USERNAME = settings.ADMIN_USERNAME.lower()
 ADMIN_PASSWORD = settings.ADMIN_PASSWORD.lower()
 
-# Session management
-session = None
+# Every worker must sign with the same key
+SECRET_KEY = settings.AUTH_SECRET_KEY.encode()
+
 
+class InvalidToken(Exception):
+    pass
 
-def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
-    global session
-    
-    current_username_bytes = credentials.username.encode("utf8")
+
+def is_admin(username: str, password: str) -> bool:
+    current_username_bytes = username.encode("utf8")
     correct_username_bytes = ADMIN_USERNAME.encode("utf8")
     correct_username = secrets.compare_digest(current_username_bytes, correct_username_bytes)
-    
-    current_password_bytes = credentials.password.encode("utf8")
+
+    current_password_bytes = password.encode("utf8")
     correct_password_bytes = ADMIN_PASSWORD.encode("utf8")
     correct_password = secrets.compare_digest(current_password_bytes, correct_password_bytes)
-    
-    if not (correct_username and correct_password):
+
+    return correct_username and correct_password
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(username: str, ttl: float | None = None) -> tuple[str, dict]:
+    """
+    Signs a session token for `username`, valid for `ttl` seconds.
+
+    The token is `<payload>.<signature>`: base64url JSON claims (`sub`,
+    `exp`, `jti`) and their HMAC-SHA256. Any worker holding the secret key
+    can verify it without looking anything up.
+    """
+    claims = {
+        "sub": username,
+        "exp": int(time.time() + (ttl or settings.AUTH_TOKEN_TTL)),
+        "jti": secrets.token_hex(8),
+    }
+    payload = _b64encode(orjson.dumps(claims))
+    return f"{payload}.{_sign(payload)}", claims
+
+
+def decode_token(token: str) -> dict:
+    """
+    Checks a token's signature and returns its claims, expired or not.
+
+    Raises:
+        InvalidToken: If the token is malformed or was not signed with `SECRET_KEY`.
+    """
+    payload, _, signature = token.partition(".")
+    if not payload or not signature:
+        raise InvalidToken("Malformed token")
+    # Compared as bytes: compare_digest rejects str holding non-ASCII characters
+    if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        raise InvalidToken("Invalid token signature")
+    try:
+        return orjson.loads(_b64decode(payload))
+    except (binascii.Error, ValueError):
+        raise InvalidToken("Malformed token")
+
+
+class VerifiedTokens:
+    """
+    An LRU of tokens whose signatures have already been checked.
+
+    Repeat requests with the same token skip the HMAC and JSON decoding;
+    expiry and revocation are still checked on every hit.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+
+    def get(self, token: str) -> dict | None:
+        claims = self.entries.get(token)
+        if claims is not None:
+            self.entries.move_to_end(token)
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        self.entries[token] = claims
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class RevocationList:
+    """
+    The ids of logged-out tokens that have not expired yet.
+
+    Logouts are written to `db.revoked_tokens_collection`, which a TTL index
+    empties as the tokens expire, and every worker pulls new entries into
+    its in-memory copy every `interval` seconds. The list only ever holds
+    tokens revoked within the last `AUTH_TOKEN_TTL`, so it stays small.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        # jti -> exp
+        self.revoked: dict[str, int] = {}
+        self.synced_at: datetime | None = None
+        self.task: asyncio.Task | None = None
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self.revoked
+
+    def add(self, jti: str, exp: int) -> None:
+        self.revoked[jti] = exp
+
+    async def revoke(self, db, claims: dict) -> None:
+        self.add(claims["jti"], claims["exp"])
+        await db.revoked_tokens_collection.update_one(
+            {"_id": claims["jti"]},
+            {
+                "$set": {
+                    "expires_at": datetime.fromtimestamp(claims["exp"], timezone.utc),
+                    "revoked_at": datetime.now(timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+
+    async def sync(self, db) -> None:
+        now = datetime.now(timezone.utc)
+        query = {"expires_at": {"$gt": now}}
+        if self.synced_at is not None:
+            # Overlap the previous sync so a slow write is not missed
+            query["revoked_at"] = {"$gte": self.synced_at - timedelta(seconds=self.interval)}
+        async for doc in db.revoked_tokens_collection.find(query, {"expires_at": 1}):
+            expires_at = doc["expires_at"].replace(tzinfo=timezone.utc)
+            self.add(doc["_id"], int(expires_at.timestamp()))
+        self.synced_at = now
+        self.prune()
+
+    def prune(self) -> None:
+        now = time.time()
+        self.revoked = {jti: exp for jti, exp in self.revoked.items() if exp > now}
+
+    async def start(self, db) -> None:
+        try:
+            await self.sync(db)
+        except PyMongoError as e:
+            logger.error(f"Could not load the token revocation list: {str(e)}")
+        self.task = asyncio.create_task(self._run(db), name="token-revocations")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def _run(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync(db)
+            except PyMongoError as e:
+                logger.error(f"Could not sync the token revocation list: {str(e)}")
+
+
+verified_tokens = VerifiedTokens(max_entries=settings.AUTH_TOKEN_CACHE_SIZE)
+revoked_tokens = RevocationList(interval=settings.AUTH_REVOCATION_SYNC_INTERVAL)
+
+
+def verify_token(token: str) -> dict:
+    """
+    Returns the claims of a valid, unexpired and unrevoked token.
+
+    Raises:
+        InvalidToken: If the token fails any of those checks.
+    """
+    claims = verified_tokens.get(token)
+    if claims is None:
+        claims = decode_token(token)
+        verified_tokens.put(token, claims)
+    if claims["exp"] <= time.time():
+        raise InvalidToken("Token has expired")
+    if claims["jti"] in revoked_tokens:
+        raise InvalidToken("Token has been revoked")
+    return claims
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={'WWW-Authenticate': 'Bearer'},
+    )
+
+
+async def authenticate_user(
+    token: HTTPAuthorizationCredentials | None = Depends(bearer),
+    credentials: HTTPBasicCredentials | None = Depends(optional_basic),
+) -> str:
+    """
+    Accepts a bearer token from `/auth` or, for older clients, Basic credentials.
+    """
+    if token is not None:
+        try:
+            return verify_token(token.credentials)["sub"]
+        except InvalidToken as e:
+            raise _unauthorized(str(e))
+    if credentials is not None and is_admin(credentials.username, credentials.password):
+        return credentials.username
+    raise _unauthorized('Incorrect username or password')
+
+
+def login_user(credentials: HTTPBasicCredentials = Depends(security)) -> dict:
+    if not is_admin(credentials.username, credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Incorrect username or password',
             headers={'WWW-Authenticate': 'Basic'},
         )
-    session = credentials.username
-    return session
-
-def logout_user():
-    global session
-    if session is None:
-            return {"message": "Unauthorized"}
-    session = None
\ No newline at end of file
+    token, claims = issue_token(credentials.username)
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_in": claims["exp"] - int(time.time()),
+    }
+
+
+async def logout_user(
+    token: HTTPAuthorizationCredentials | None = Depends(bearer), db=Depends(get_db)
+) -> str:
+    if token is None:
+        raise _unauthorized('Not logged in')
+    try:
+        claims = verify_token(token.credentials)
+    except InvalidToken as e:
+        raise _unauthorized(str(e))
+    await revoked_tokens.revoke(db, claims)
+    return claims["sub"]
@@ -0,0 +1,252 @@
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+import logging
+import time
+from contextvars import ContextVar
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Iterable
+from urllib.parse import urlencode
+
+import orjson
+from fastapi import Response
+
+from core.config import settings
+from core.responses import MongoJSONResponse
+
+
+logger = logging.getLogger(__name__)
+
+# Endpoint arguments that can be part of a cache key; dependencies like `db` are not
+KEY_TYPES = (str, int, float, bool, type(None))
+
+# Extra key component set around an endpoint call, e.g. the ETag of its data
+cache_variant: ContextVar[str] = ContextVar("cache_variant", default="")
+
+
+class CacheBackend(ABC):
+    """
+    Storage for cached response bodies.
+
+    Values are opaque bytes so a shared store (Redis, memcached) can replace
+    the in-memory backend without changing the callers.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        """
+        Drops every entry stored under any of `tags`; returns how many were dropped.
+        """
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def size(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """
+    A per-process LRU with a TTL per entry and caps on entry count and total bytes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # key -> (expires_at, value, tags), least recently used first
+        self.entries: OrderedDict[str, tuple[float, bytes, tuple[str, ...]]] = OrderedDict()
+        self.tags: dict[str, set[str]] = defaultdict(set)
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str]) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._drop(key)
+        tags = tuple(tags)
+        self.entries[key] = (time.monotonic() + ttl, value, tags)
+        self.bytes += len(value)
+        for tag in tags:
+            self.tags[tag].add(key)
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self.tags.pop(tag, set())
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    async def clear(self) -> None:
+        self.entries.clear()
+        self.tags.clear()
+        self.bytes = 0
+
+    def size(self) -> dict:
+        return {"entries": len(self.entries), "bytes": self.bytes}
+
+    def _drop(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= len(entry[1])
+        for tag in entry[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+def pack(response: Response) -> bytes:
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name != "content-length"
+    }
+    return orjson.dumps([response.status_code, headers]) + b"\n" + response.body
+
+
+def unpack(value: bytes) -> Response:
+    meta, body = value.split(b"\n", 1)
+    status_code, headers = orjson.loads(meta)
+    return Response(content=body, status_code=status_code, headers=headers)
+
+
+class ResponseCache:
+    """
+    Caches the rendered responses of read endpoints, invalidated by tag on writes.
+
+    Keys are the endpoint plus its path and query arguments. Each write handler
+    calls `invalidate` with the tags of the data it changed; with the memory
+    backend that only reaches the current process, so other workers may serve
+    a stale page until its TTL runs out.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+        # Bumped on invalidation so a response computed across a write is not stored
+        self.generations: dict[str, int] = defaultdict(int)
+        self.pending: dict[str, asyncio.Future] = {}
+
+    def cached(
+        self, tags: Iterable[str], ttl: float | None = None
+    ) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+        """
+        Decorates a route endpoint so its 200 responses are served from the cache.
+
+        Concurrent misses on the same key share a single call to the endpoint.
+        """
+        tags = tuple(tags)
+
+        def decorator(endpoint):
+            name = f"{endpoint.__module__}.{endpoint.__name__}"
+
+            @functools.wraps(endpoint)
+            async def wrapper(**kwargs):
+                if not self.enabled:
+                    return await endpoint(**kwargs)
+
+                key = cache_variant.get() + name + "?" + urlencode(
+                    sorted(
+                        (param, value)
+                        for param, value in kwargs.items()
+                        if isinstance(value, KEY_TYPES)
+                    )
+                )
+                value = await self.backend.get(key)
+                if value is not None:
+                    self.hits[name] += 1
+                    return unpack(value)
+
+                self.misses[name] += 1
+                leader = self.pending.get(key)
+                if leader is not None:
+                    try:
+                        return unpack(await asyncio.shield(leader))
+                    except asyncio.CancelledError:
+                        # The request computing it went away; compute it here instead
+                        if not leader.cancelled():
+                            raise
+                        return await endpoint(**kwargs)
+
+                future = asyncio.get_running_loop().create_future()
+                self.pending[key] = future
+                try:
+                    generations = [self.generations[tag] for tag in tags]
+                    response = await endpoint(**kwargs)
+                    if not isinstance(response, Response):
+                        response = MongoJSONResponse(response)
+                    value = pack(response)
+                    current = [self.generations[tag] for tag in tags]
+                    if response.status_code == 200 and generations == current:
+                        await self.backend.set(key, value, ttl or self.ttl, tags)
+                    future.set_result(value)
+                    return response
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+                    # Waiters re-raise it; mark it retrieved for the no-waiter case
+                    future.exception()
+                    raise
+                finally:
+                    del self.pending[key]
+
+            return wrapper
+
+        return decorator
+
+    async def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            self.generations[tag] += 1
+        try:
+            await self.backend.invalidate(tags)
+        except Exception as e:
+            logger.error(f"Could not invalidate cache tags {tags}: {str(e)}")
+
+    def stats(self) -> dict:
+        routes = sorted(self.hits.keys() | self.misses.keys())
+        return {
+            **self.backend.size(),
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "routes": {
+                route: {"hits": self.hits[route], "misses": self.misses[route]}
+                for route in routes
+            },
+        }
+
+
+response_cache = ResponseCache(
+    MemoryBackend(
+        max_entries=settings.CACHE_MAX_ENTRIES, max_bytes=settings.CACHE_MAX_BYTES
+    ),
+    ttl=settings.CACHE_TTL,
+    enabled=settings.CACHE_ENABLED,
+)
@@ -1,6 +1,7 @@
+import os
 from typing import Any, Annotated, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import BeforeValidator, computed_field, AnyHttpUrl
+from pydantic import BeforeValidator, Field, computed_field, AnyHttpUrl
 from dotenv import load_dotenv
 
 
@@ -53,5 +54,123 @@ class Settings(BaseSettings):
     S3_SECRET_KEY: str
     BUCKET_NAME: str
 
+    # MongoDB client and connection pool
+    MONGO_DB_NAME: str = "hasken_rayuwa"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 10
+    MONGO_MAX_IDLE_TIME_MS: int | None = 300_000
+    MONGO_CONNECT_TIMEOUT_MS: int = 10_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 10_000
+    MONGO_SOCKET_TIMEOUT_MS: int | None = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int | None = None
+    # Wire compression offered to the server, in order of preference
+    MONGO_COMPRESSORS: str = "zstd,zlib"
+    # Read preference per router (see `get_db_for`); unlisted routers read the primary
+    MONGO_READ_PREFERENCES: dict[str, str] = {
+        "exports": "secondaryPreferred",
+        "rollups": "secondaryPreferred",
+    }
+    MONGO_MAX_STALENESS_SECONDS: int = -1
+    # Commands at least this slow go to the slow-command log
+    MONGO_SLOW_COMMAND_MS: float = 100.0
+    # Send a Server-Timing header with DB, serialization and total time
+    SERVER_TIMING: bool = True
+
+    # Shared by the workers to merge their metrics; unset for a single worker
+    METRICS_DIR: str | None = None
+    METRICS_FLUSH_INTERVAL: float = 15.0
+
+    # Token bucket per client and route, by path template: [requests per second, burst]
+    RATE_LIMITS: dict[str, tuple[float, int]] = {
+        "/api/v1/auth": (0.2, 10),
+        "/api/v1/upload": (0.1, 5),
+        "/api/v1/filmshow-upload": (0.1, 5),
+        "/api/v1/discipleship-upload": (0.1, 5),
+        "/api/v1/exports/{source}": (0.2, 5),
+        "/api/v1/states_data": (5.0, 20),
+        "/api/v1/rollups": (5.0, 20),
+        "/api/v1/users/contact": (0.05, 5),
+        "/api/v1/users/volunteer": (0.05, 5),
+    }
+    # Buckets kept per worker; the least recently seen clients are forgotten first
+    RATE_LIMIT_MAX_CLIENTS: int = 10_000
+    # Heavy routes per worker: [requests running at once, requests allowed to wait]
+    CONCURRENCY_LIMITS: dict[str, tuple[int, int]] = {
+        "/api/v1/upload": (2, 8),
+        "/api/v1/filmshow-upload": (2, 8),
+        "/api/v1/discipleship-upload": (2, 8),
+        "/api/v1/exports/{source}": (2, 4),
+        "/api/v1/states_data": (8, 32),
+        "/api/v1/rollups": (8, 32),
+    }
+    # A queued request is shed with a 503 after waiting this long for a slot
+    CONCURRENCY_QUEUE_TIMEOUT: float = 5.0
+
+    # YouTube metadata for new links, fetched off the event loop and cached by video id
+    YOUTUBE_FETCH_TIMEOUT: float = 10.0
+    YOUTUBE_FETCH_WORKERS: int = 4
+    # Links left without a title are retried in batches this often
+    YOUTUBE_BACKFILL_INTERVAL: float = 600.0
+    YOUTUBE_BACKFILL_BATCH_SIZE: int = 20
+
+    # Images are resized and re-encoded, without EXIF, before they go to Cloudinary
+    IMAGE_MAX_WIDTH: int = 1600
+    IMAGE_MAX_HEIGHT: int = 1600
+    IMAGE_QUALITY: int = 82
+    IMAGE_MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    # Uploads processed at once per worker; the rest wait for a slot
+    IMAGE_UPLOAD_CONCURRENCY: int = 4
+    # How often new Cloudinary images are pulled into the local index that /images lists
+    IMAGE_SYNC_INTERVAL: float = 300.0
+    IMAGE_SYNC_PAGE_SIZE: int = 500
+
+    # Form submissions are journaled to WRITE_BEHIND_DIR and written to MongoDB in
+    # batches of up to WRITE_BEHIND_MAX_BATCH, at least every WRITE_BEHIND_MAX_DELAY seconds
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_DIR: str = "journal"
+    WRITE_BEHIND_MAX_BATCH: int = 500
+    WRITE_BEHIND_MAX_DELAY: float = 1.0
+
+    # Signed session tokens issued by /auth. The key is required and must be the same on
+    # every worker, e.g. `python -c "import secrets; print(secrets.token_urlsafe(32))"`
+    AUTH_SECRET_KEY: str = Field(min_length=32)
+    AUTH_TOKEN_TTL: int = 3600
+    AUTH_TOKEN_CACHE_SIZE: int = 1024
+    AUTH_REVOCATION_SYNC_INTERVAL: float = 5.0
+
+    # On-demand profiling of single requests by an admin (X-Profile: 1 or ?profile=1)
+    PROFILING_ENABLED: bool = False
+    PROFILE_INTERVAL: float = 0.001
+    PROFILE_DIR: str = "profiles"
+
+    ENSURE_INDEXES_ON_STARTUP: bool = True
+    STATES_TOTALS_TTL: float = 300.0
+
+    # Spreadsheet ingestion
+    UPLOAD_BATCH_SIZE: int = 1000
+    UPLOAD_STREAMING: bool = True
+    UPLOAD_SPOOL_MAX_SIZE: int = 8 * 1024 * 1024
+    INGEST_WORKERS: int = min(4, os.cpu_count() or 1)
+    INGEST_MAX_QUEUED: int = 50
+    INGEST_SHUTDOWN_TIMEOUT: float = 60.0
+    PARSE_WORKERS: int = min(4, os.cpu_count() or 1)
+    PARSE_MAX_PENDING: int = 4
+
+    # Response cache for read endpoints
+    CACHE_ENABLED: bool = True
+    CACHE_TTL: float = 30.0
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Cache-Control per conditional GET route; others revalidate every time
+    CACHE_CONTROL: dict[str, str] = {
+        "blogs": "public, max-age=60",
+        "blog": "public, max-age=300",
+        "links": "public, max-age=300",
+        "states": "public, max-age=3600",
+    }
+
+    # Rows fetched and written per batch by the /exports endpoints
+    EXPORT_BATCH_SIZE: int = 1000
+
 
 settings = Settings()  # type: ignore
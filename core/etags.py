@@ -0,0 +1,83 @@
+import functools
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request, Response, status
+
+from core.cache import cache_variant, response_cache
+from core.config import settings
+from core.responses import MongoJSONResponse
+
+
+async def collection_version(db, name: str) -> int:
+    """
+    Returns the write counter of a collection; 0 if it was never written through the API.
+    """
+    doc = await db.versions_collection.find_one({"_id": name})
+    return doc["version"] if doc else 0
+
+
+async def mark_changed(db, *names: str) -> None:
+    """
+    Records a write to the named collections.
+
+    Bumps their version counters, which changes the ETags served for them, and
+    drops the cached responses tagged with the same names.
+    """
+    for name in names:
+        await db.versions_collection.update_one(
+            {"_id": name}, {"$inc": {"version": 1}}, upsert=True
+        )
+    await response_cache.invalidate(*names)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def conditional(
+    name: str, route: str
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """
+    Decorates a GET endpoint over collection `name` with ETag and Cache-Control headers.
+
+    The ETag is the collection's version counter, so a matching `If-None-Match`
+    is answered with 304 before any document is read. `Cache-Control` comes
+    from `settings.CACHE_CONTROL[route]`. The endpoint must take `request` and `db`.
+    """
+
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            version = await collection_version(kwargs["db"], name)
+            etag = f'"{name}-{version}"'
+            headers = {
+                "ETag": etag,
+                "Cache-Control": settings.CACHE_CONTROL.get(route, "no-cache"),
+            }
+            if etag_matches(kwargs["request"], etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            # Cached responses are kept per version, so a write seen by another
+            # worker is never answered with this worker's older copy
+            token = cache_variant.set(etag)
+            try:
+                response = await endpoint(**kwargs)
+            finally:
+                cache_variant.reset(token)
+
+            if not isinstance(response, Response):
+                response = MongoJSONResponse(response)
+            if response.status_code == status.HTTP_200_OK:
+                response.headers.update(headers)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,116 @@
+import asyncio
+import csv
+import io
+from enum import Enum
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator
+
+import orjson
+
+# Sheet header -> document field, in the order the upload routes read them
+ColumnLayout = dict[str, str]
+RowBatches = AsyncIterator[list[tuple]]
+
+# Size of the chunks an XLSX workbook is streamed back in once it is saved
+XLSX_CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _cell(value):
+    # Spreadsheet cells hold plain values; anything else is written as text
+    if isinstance(value, Enum):
+        return value.value
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+async def row_batches(cursor, columns: ColumnLayout, batch_size: int) -> RowBatches:
+    """
+    Groups the documents of a Mongo cursor into batches of rows in `columns` order.
+
+    Only one batch is held at a time; the cursor is advanced as the response
+    is consumed, so a slow client slows the query rather than buffering it.
+    """
+    fields = list(columns.values())
+    batch = []
+    async for doc in cursor:
+        batch.append(tuple(_cell(doc.get(field)) for field in fields))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def csv_stream(batches: RowBatches, columns: ColumnLayout) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(columns.keys())
+    yield flush()
+    async for batch in batches:
+        writer.writerows(batch)
+        yield flush()
+
+
+async def ndjson_stream(
+    batches: RowBatches, columns: ColumnLayout
+) -> AsyncIterator[bytes]:
+    headers = list(columns.keys())
+    async for batch in batches:
+        yield b"".join(
+            orjson.dumps(dict(zip(headers, row)), default=str) + b"\n" for row in batch
+        )
+
+
+async def xlsx_stream(
+    batches: RowBatches, columns: ColumnLayout, title: str
+) -> AsyncIterator[bytes]:
+    """
+    Writes the rows into a write-only workbook and streams the saved file.
+
+    A write-only worksheet spools its rows to a temporary file as they are
+    appended, so memory stays bounded; the zip container can only be written
+    once the last row is in, so the first bytes follow the end of the query.
+    """
+    from openpyxl import Workbook
+
+    loop = asyncio.get_running_loop()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(list(columns.keys()))
+
+    def append(batch: list[tuple]) -> None:
+        for row in batch:
+            sheet.append(row)
+
+    async for batch in batches:
+        await loop.run_in_executor(None, append, batch)
+
+    with SpooledTemporaryFile(max_size=XLSX_CHUNK_SIZE * 16) as output:
+        await loop.run_in_executor(None, workbook.save, output)
+        output.seek(0)
+        while chunk := await loop.run_in_executor(None, output.read, XLSX_CHUNK_SIZE):
+            yield chunk
+
+
+def export_stream(
+    format: str, batches: RowBatches, columns: ColumnLayout, title: str
+) -> AsyncIterator[bytes]:
+    if format == "csv":
+        return csv_stream(batches, columns)
+    if format == "ndjson":
+        return ndjson_stream(batches, columns)
+    return xlsx_stream(batches, columns, title)
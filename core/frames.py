@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from models.states import States
+
+
+# Spreadsheet spellings of a state, keyed by their title-cased form
+STATE_ALIASES = {
+    **{state.value.title(): state for state in States},
+    "Federal Capital Territory": States.FCT,
+    "Abuja": States.FCT,
+}
+
+
+def map_states(series: pd.Series) -> pd.Series:
+    """
+    Maps a column of state names onto `States`, accepting the FCT aliases.
+
+    Raises:
+        ValueError: If any value is not a known state.
+    """
+    cleaned = series.astype(str).str.strip().str.title()
+    states = cleaned.map(STATE_ALIASES)
+    invalid = states.isna()
+    if invalid.any():
+        raise ValueError(f"Invalid state: {cleaned[invalid].iloc[0]}")
+    return states
+
+
+def nullable_int(series: pd.Series) -> pd.Series:
+    """
+    Casts a numeric column to ints, keeping blank cells as None.
+    """
+    values = pd.to_numeric(series)
+    return _none_for_na(pd.Series(np.trunc(values), index=series.index).astype("Int64"))
+
+
+def required_int(series: pd.Series, name: str) -> pd.Series:
+    """
+    Casts a numeric column to ints, rejecting blank cells.
+    """
+    values = nullable_int(series)
+    if values.isna().any():
+        raise ValueError(f"{name} must not be empty")
+    return values
+
+
+def optional(series: pd.Series) -> pd.Series:
+    """
+    Keeps a column as-is with blank cells as None.
+    """
+    return _none_for_na(series)
+
+
+def optional_str(series: pd.Series) -> pd.Series:
+    """
+    Casts a column to strings with blank cells as None.
+
+    Blank cells make pandas read a column of whole numbers as floats; those
+    go through `Int64` so that 12 becomes "12" rather than "12.0".
+    """
+    if pd.api.types.is_float_dtype(series):
+        filled = series.dropna()
+        if (filled == np.trunc(filled)).all():
+            series = series.astype("Int64")
+    return _none_for_na(series.astype(str).where(series.notna()))
+
+
+def format_dates(series: pd.Series) -> pd.Series:
+    """
+    Formats a date column as YYYY/MM/DD strings, with blank cells and NaT as None.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        dates = series.dt.strftime("%Y/%m/%d")
+    else:
+        dates = series.astype(str).str.split(" ").str[0].str.replace("-", "/")
+    return _none_for_na(dates.where(series.notna()))
+
+
+def upper(series: pd.Series) -> pd.Series:
+    """
+    Upper-cases a text column.
+    """
+    return series.astype(str).str.upper()
+
+
+def to_records(columns: dict[str, pd.Series]) -> list[dict]:
+    """
+    Assembles normalized columns into the per-row dicts handed to the writer.
+    """
+    frame = pd.DataFrame(columns).astype(object)
+    return frame.to_dict(orient="records")
+
+
+def _none_for_na(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.notna(), None)
@@ -0,0 +1,267 @@
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable
+
+from pymongo import UpdateOne
+
+from core.config import settings
+from core.metrics import (
+    image_upload_bytes,
+    image_upload_duration,
+    image_uploads_in_progress,
+    image_uploads_waiting,
+)
+from core.storage import cloudinary
+
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_image(data: bytes, max_width: int, max_height: int, quality: int) -> bytes:
+    """
+    Shrinks an image to fit `max_width` x `max_height` and re-encodes it without EXIF.
+
+    The EXIF orientation is applied to the pixels first, since the tag that
+    carried it is dropped. Photos become progressive JPEGs at `quality`;
+    images with transparency stay PNG. Animated images are returned as they
+    are, because re-encoding would keep only the first frame.
+
+    Raises:
+        ValueError: If `data` is not an image Pillow can read.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise ValueError("Unsupported image format")
+    if getattr(image, "is_animated", False):
+        return data
+
+    # Lets the JPEG decoder scale down while decoding instead of after; the
+    # bound is square because the EXIF rotation has not been applied yet
+    bound = max(max_width, max_height)
+    image.draft(None, (bound, bound))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    # The colour profile is kept: without it wide-gamut phone photos look washed out
+    icc_profile = image.info.get("icc_profile")
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image.save(output, format="PNG", optimize=True, icc_profile=icc_profile)
+    else:
+        image.convert("RGB").save(
+            output,
+            format="JPEG",
+            quality=quality,
+            optimize=True,
+            progressive=True,
+            icc_profile=icc_profile,
+        )
+    return output.getvalue()
+
+
+def send_to_cloudinary(data: bytes) -> dict:
+    return cloudinary().uploader.upload(io.BytesIO(data), resource_type="image")
+
+
+class ImageUploader:
+    """
+    Resizes and uploads images on a bounded thread pool, `concurrency` at a time.
+
+    Pillow and the Cloudinary SDK are both blocking, so the whole pipeline
+    runs off the event loop. Uploads over the limit wait for a slot before
+    their bytes are handed to the pool.
+    """
+
+    def __init__(self, concurrency: int, send: Callable[[bytes], dict] = send_to_cloudinary):
+        self.concurrency = concurrency
+        self.send = send
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor: ThreadPoolExecutor | None = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="image-upload"
+            )
+        return self.executor
+
+    async def upload(self, data: bytes) -> dict:
+        """
+        Returns Cloudinary's upload result for the resized image.
+
+        Raises:
+            ValueError: If `data` is not a supported image.
+        """
+        image_uploads_waiting.labels().inc()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            image_uploads_waiting.labels().dec()
+
+        started = time.perf_counter()
+        image_uploads_in_progress.labels().inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor(), self._process, data)
+        finally:
+            self.semaphore.release()
+            image_uploads_in_progress.labels().dec()
+            image_upload_duration.labels().observe(time.perf_counter() - started)
+
+    def _process(self, data: bytes) -> dict:
+        prepared = prepare_image(
+            data,
+            max_width=settings.IMAGE_MAX_WIDTH,
+            max_height=settings.IMAGE_MAX_HEIGHT,
+            quality=settings.IMAGE_QUALITY,
+        )
+        image_upload_bytes.labels("received").inc(len(data))
+        image_upload_bytes.labels("uploaded").inc(len(prepared))
+        logger.info(f"Resized an image from {len(data)} to {len(prepared)} bytes")
+        return self.send(prepared)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+def image_doc(resource: dict) -> dict:
+    """
+    The fields of a Cloudinary resource (or upload result) kept in `db.images_collection`.
+    """
+    return {
+        "url": resource["secure_url"],
+        "created_at": datetime.fromisoformat(resource["created_at"]),
+        "format": resource.get("format"),
+        "width": resource.get("width"),
+        "height": resource.get("height"),
+        "bytes": resource.get("bytes"),
+    }
+
+
+async def index_image(db, resource: dict) -> None:
+    await db.images_collection.update_one(
+        {"_id": resource["public_id"]}, {"$set": image_doc(resource)}, upsert=True
+    )
+
+
+def list_cloudinary_images(start_at: datetime | None, cursor: str | None, page_size: int) -> dict:
+    """
+    One page of image resources created at or after `start_at`, oldest first.
+    """
+    options = {
+        "type": "upload",
+        "resource_type": "image",
+        "max_results": page_size,
+        "direction": "asc",
+    }
+    if start_at is not None:
+        options["start_at"] = start_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if cursor:
+        options["next_cursor"] = cursor
+    return cloudinary().api.resources(**options)
+
+
+# `db.sync_state_collection` document holding how far the Cloudinary listing was read
+SYNC_STATE_ID = "cloudinary_images"
+
+
+class ImageIndexSync:
+    """
+    Keeps `db.images_collection` in step with the images stored in Cloudinary.
+
+    `GET /images` pages through that index, so listing never calls the
+    Cloudinary Admin API, which is slow and rate limited. Every `interval`
+    seconds the images created since the last sync are fetched, oldest
+    first; uploads through `/images` are indexed as they happen.
+
+    The sync resumes from its own watermark in `db.sync_state_collection`
+    rather than from the newest indexed image: write-through uploads would
+    otherwise move the starting point past images added in the Cloudinary
+    console in the meantime. Images deleted in the Cloudinary console stay
+    listed until the index is dropped and rebuilt.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        page_size: int,
+        fetch: Callable[[datetime | None, str | None, int], dict] = list_cloudinary_images,
+    ):
+        self.interval = interval
+        self.page_size = page_size
+        self.fetch = fetch
+        self.task: asyncio.Task | None = None
+
+    async def run_once(self, db) -> int:
+        """
+        Indexes the images created since the last sync; returns how many were written.
+        """
+        state = await db.sync_state_collection.find_one({"_id": SYNC_STATE_ID})
+        # start_at is inclusive: the images at the watermark come back and are upserted again
+        start_at = state["synced_until"] if state else None
+
+        loop = asyncio.get_running_loop()
+        indexed = 0
+        cursor = None
+        while True:
+            page = await loop.run_in_executor(
+                None, self.fetch, start_at, cursor, self.page_size
+            )
+            docs = {
+                resource["public_id"]: image_doc(resource)
+                for resource in page.get("resources", [])
+            }
+            if docs:
+                await db.images_collection.bulk_write(
+                    [
+                        UpdateOne({"_id": public_id}, {"$set": doc}, upsert=True)
+                        for public_id, doc in docs.items()
+                    ],
+                    ordered=False,
+                )
+                indexed += len(docs)
+                # Pages come oldest first, so an interrupted sync resumes after this one
+                await db.sync_state_collection.update_one(
+                    {"_id": SYNC_STATE_ID},
+                    {"$max": {"synced_until": max(doc["created_at"] for doc in docs.values())}},
+                    upsert=True,
+                )
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+        return indexed
+
+    async def start(self, db) -> None:
+        self.task = asyncio.create_task(self._run(db), name="image-index-sync")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                indexed = await self.run_once(db)
+                if indexed:
+                    logger.info(f"Indexed {indexed} Cloudinary images")
+            except Exception as e:
+                logger.error(f"Cloudinary image index sync failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+image_uploader = ImageUploader(concurrency=settings.IMAGE_UPLOAD_CONCURRENCY)
+image_index_sync = ImageIndexSync(
+    interval=settings.IMAGE_SYNC_INTERVAL, page_size=settings.IMAGE_SYNC_PAGE_SIZE
+)
@@ -0,0 +1,286 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, BinaryIO, Callable, Iterator
+
+from fastapi import HTTPException, UploadFile
+
+from core.config import settings
+from db.bulk import batched, bulk_upsert
+
+# pandas and openpyxl are imported on first use; they dominate the app's import time
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Maps a DataFrame or a list of spreadsheet rows onto documents
+RecordMapper = Callable[["pd.DataFrame | list[dict]"], list[dict]]
+# (filename, batch counts) -> None
+BatchCallback = Callable[[str, dict], Awaitable[None]]
+
+_parse_pool: ProcessPoolExecutor | None = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used to parse workbooks, creating it on first use.
+
+    Its workers are spawned rather than forked: by the time the first upload
+    arrives the app runs threads (executors, the Mongo driver's monitors),
+    and forking a process with threads can deadlock the child on a lock
+    some other thread held.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=settings.PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=True, cancel_futures=True)
+        _parse_pool = None
+
+
+def iter_sheet_rows(fileobj: BinaryIO, key_fields: tuple[str, ...] = ()) -> Iterator[dict]:
+    """
+    Yields the rows of every worksheet as dicts keyed by each sheet's header row.
+
+    Sheets whose header lacks any of `key_fields` are skipped, the same rule
+    `parse_sheet` applies. The workbook is opened with openpyxl's read-only
+    reader, so rows are parsed lazily from the file and never held in memory
+    all at once.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(name).strip() if name is not None else None for name in header]
+            if not set(key_fields) <= set(header):
+                logger.info(f"Skipping sheet {sheet.title!r}: no key columns")
+                continue
+
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                yield {name: value for name, value in zip(header, row) if name is not None}
+    finally:
+        workbook.close()
+
+
+async def stream_excel_chunks(
+    file: UploadFile, chunk_size: int | None = None, key_fields: tuple[str, ...] = ()
+) -> AsyncIterator[list[dict]]:
+    """
+    Reads an uploaded workbook in chunks of at most `chunk_size` rows.
+
+    Parsing runs in the default executor and the next chunk is read while the
+    caller is still writing the current one, so at most two chunks are alive.
+    """
+    loop = asyncio.get_running_loop()
+    rows = iter_sheet_rows(file.file, key_fields)
+    chunks = batched(rows, chunk_size or settings.UPLOAD_BATCH_SIZE)
+
+    pending = loop.run_in_executor(None, next, chunks, None)
+    try:
+        while (chunk := await pending) is not None:
+            pending = loop.run_in_executor(None, next, chunks, None)
+            yield chunk
+    finally:
+        if not pending.done():
+            await asyncio.wait([pending])
+        rows.close()
+
+
+async def ingest_stream(
+    file: UploadFile,
+    collection,
+    to_records: RecordMapper,
+    key_fields: tuple[str, ...],
+    on_batch: Callable[[dict], Awaitable[None]] | None = None,
+) -> list[dict]:
+    """
+    Streams an uploaded workbook straight into `collection` with bulk upserts.
+
+    Parameters:
+        file (UploadFile): The uploaded workbook.
+        collection: The Motor collection to write to.
+        to_records (Callable): Maps a chunk of spreadsheet rows onto documents.
+        key_fields (tuple[str, ...]): The fields identifying a document.
+        on_batch (Callable, optional): Awaited with the counts of each finished batch.
+
+    Returns:
+        list[dict]: Per-batch matched/upserted/modified counts.
+    """
+    batches = []
+    async for chunk in stream_excel_chunks(file, key_fields=key_fields):
+        records = to_records(chunk)
+        for result in await bulk_upsert(
+            collection, records, key_fields, batch_size=len(records)
+        ):
+            result["batch"] = len(batches)
+            batches.append(result)
+            if on_batch:
+                await on_batch(result)
+    return batches
+
+
+def read_sheet_names(data: bytes) -> list[str]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def parse_sheet(
+    data: bytes, sheet_name: str, to_records: RecordMapper, key_fields: tuple[str, ...]
+) -> list[dict] | None:
+    """
+    Parses and normalizes one worksheet. Runs inside the parse process pool.
+
+    Returns:
+        list[dict] | None: The sheet's documents, or None if the sheet lacks the key columns.
+    """
+    import pandas as pd
+
+    df = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name)
+    df.columns = [str(column).strip() for column in df.columns]
+    if df.empty or not set(key_fields) <= set(df.columns):
+        return None
+    return to_records(df)
+
+
+async def read_excel_file(
+    data: bytes, sheet_name: str, to_records: RecordMapper, key_fields: tuple[str, ...]
+) -> list[dict] | None:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_parse_pool(), parse_sheet, data, sheet_name, to_records, key_fields
+    )
+
+
+async def ingest_parallel(
+    files: list[UploadFile],
+    collection,
+    to_records: RecordMapper,
+    key_fields: tuple[str, ...],
+    on_batch: BatchCallback | None = None,
+) -> list[dict]:
+    """
+    Parses every sheet of every workbook in the process pool and fans the
+    results into a single bulk writer.
+
+    At most `PARSE_WORKERS` workbooks are read and parsed at once, one sheet
+    at a time each, and at most `PARSE_MAX_PENDING` parsed sheets wait for
+    the writer, which bounds memory no matter how many files are uploaded
+    together.
+
+    Returns:
+        list[dict]: Per-file batch counts, or the error that stopped the file,
+        in upload order.
+    """
+    # Keyed by position: two uploads may share a filename
+    results = [{"file": file.filename, "batches": []} for file in files]
+    pending = asyncio.Queue(maxsize=settings.PARSE_MAX_PENDING)
+    file_slots = asyncio.Semaphore(settings.PARSE_WORKERS)
+    loop = asyncio.get_running_loop()
+
+    async def parse(index: int, file: UploadFile) -> None:
+        try:
+            # Taken before reading, so only the workbooks being parsed are in memory
+            async with file_slots:
+                data = await file.read()
+                sheet_names = await loop.run_in_executor(None, read_sheet_names, data)
+                for sheet_name in sheet_names:
+                    records = await read_excel_file(data, sheet_name, to_records, key_fields)
+                    if records is None:
+                        logger.info(
+                            f"Skipping sheet {sheet_name!r} of {file.filename}: no key columns"
+                        )
+                        continue
+                    await pending.put((index, records))
+        except Exception as e:
+            results[index] = {"file": file.filename, "error": _error_detail(e)}
+
+    async def write() -> None:
+        while (item := await pending.get()) is not None:
+            index, records = item
+            result = results[index]
+            if "error" in result:
+                continue
+            try:
+                for counts in await bulk_upsert(collection, records, key_fields):
+                    counts["batch"] = len(result["batches"])
+                    result["batches"].append(counts)
+                    if on_batch:
+                        await on_batch(result["file"], counts)
+            except Exception as e:
+                results[index] = {"file": result["file"], "error": _error_detail(e)}
+
+    writer = asyncio.create_task(write())
+    try:
+        await asyncio.gather(*(parse(index, file) for index, file in enumerate(files)))
+        await pending.put(None)
+        await writer
+    finally:
+        writer.cancel()
+
+    return results
+
+
+async def ingest_files(
+    files: list[UploadFile],
+    collection,
+    to_records: RecordMapper,
+    key_fields: tuple[str, ...],
+    on_batch: BatchCallback | None = None,
+) -> list[dict]:
+    """
+    Writes uploaded workbooks to `collection`.
+
+    A single workbook is streamed row by row when `UPLOAD_STREAMING` is on, which
+    keeps memory flat. Several workbooks (or any upload with streaming off) are
+    parsed in parallel in the process pool instead.
+
+    Returns:
+        list[dict]: Per-file batch counts, or the error that stopped the file.
+    """
+    parallel = len(files) > 1 and settings.PARSE_WORKERS > 1
+    if parallel or not settings.UPLOAD_STREAMING:
+        return await ingest_parallel(
+            files, collection, to_records, key_fields, on_batch
+        )
+
+    results = []
+    for file in files:
+        async def on_file_batch(counts: dict, filename=file.filename) -> None:
+            if on_batch:
+                await on_batch(filename, counts)
+
+        try:
+            batches = await ingest_stream(
+                file, collection, to_records, key_fields, on_batch=on_file_batch
+            )
+            results.append({"file": file.filename, "batches": batches})
+        except Exception as e:
+            results.append({"file": file.filename, "error": _error_detail(e)})
+    return results
+
+
+def _error_detail(e: Exception) -> str:
+    detail = e.detail if isinstance(e, HTTPException) else str(e)
+    return f"Error inserting data: {detail}"
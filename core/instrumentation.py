@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+slow_command_logger = logging.getLogger(f"{__name__}.slow_commands")
+
+# Where each command keeps its filter, for the slow-command log
+FILTER_FIELDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+}
+
+
+class RequestStats:
+    """
+    Database and serialization time spent on one request.
+
+    Motor runs commands on its thread pool with a copy of the request's
+    context, so the counters are shared by reference and guarded by a lock.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_ms = 0.0
+        self.commands = 0
+        self.serialize_ms = 0.0
+        self.lock = threading.Lock()
+
+    def add_command(self, duration_ms: float) -> None:
+        with self.lock:
+            self.db_ms += duration_ms
+            self.commands += 1
+
+    def add_serialization(self, duration_ms: float) -> None:
+        with self.lock:
+            self.serialize_ms += duration_ms
+
+    def server_timing(self) -> str:
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.db_ms:.2f};desc="{self.commands} commands", '
+            f"serialize;dur={self.serialize_ms:.2f}, "
+            f"total;dur={total_ms:.2f}"
+        )
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def record_serialization(duration_ms: float) -> None:
+    stats = request_stats.get()
+    if stats is not None:
+        stats.add_serialization(duration_ms)
+
+
+def shape(value):
+    """
+    Replaces the values in a filter with "?", keeping its fields and operators.
+    """
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            item = shape(item)
+            if item not in shapes:
+                shapes.append(item)
+        return shapes
+    return "?"
+
+
+def filter_shape(command_name: str, command: dict):
+    field = FILTER_FIELDS.get(command_name)
+    if field is None or field not in command:
+        return None
+    value = command[field]
+    if command_name in ("update", "delete"):
+        value = [statement.get("q", {}) for statement in value]
+    return shape(value)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Attributes every command's duration to the current request and logs slow commands.
+    """
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        # Started commands, kept until they finish for the slow-command log
+        self.commands: dict[tuple, dict] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.commands[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, "succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, "failed")
+
+    def _finished(self, event, outcome: str) -> None:
+        command = self.commands.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+
+        stats = request_stats.get()
+        if stats is not None:
+            stats.add_command(duration_ms)
+
+        if duration_ms >= self.slow_ms and command is not None:
+            slow_command_logger.warning(
+                f"Slow {event.command_name} {outcome} in {duration_ms:.1f} ms on "
+                f"{event.database_name}.{command.get(event.command_name)}: "
+                f"{filter_shape(event.command_name, command)}"
+            )
+
+
+command_timer = CommandTimer(slow_ms=settings.MONGO_SLOW_COMMAND_MS)
+
+
+class ServerTimingMiddleware:
+    """
+    Tracks each request's database commands and reports them in a `Server-Timing` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from tempfile import SpooledTemporaryFile
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, UploadFile
+
+from core.config import settings
+from core.profiling import current_profile, new_profiler, save_profile
+
+
+logger = logging.getLogger(__name__)
+
+# (files, db, on_batch) -> per-file batch counts or errors
+IngestHandler = Callable[..., Awaitable[list[dict]]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class IngestionJob:
+    """
+    A queued spreadsheet ingestion and the uploaded files it owns.
+
+    The job's progress is mirrored into `db.jobs_collection` so that any
+    worker process can answer status requests for it.
+    """
+
+    def __init__(self, kind: str, files: list[UploadFile], handler: IngestHandler, db):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.files = files
+        self.handler = handler
+        self.db = db
+        # Set when submitted from a profiled request
+        self.profile = False
+
+    async def save(self, fields: dict) -> None:
+        await self.db.jobs_collection.update_one(
+            {"_id": self.id}, {"$set": fields}, upsert=True
+        )
+
+    async def run(self) -> None:
+        started = time.perf_counter()
+        rows = 0
+        batches = 0
+
+        await self.save({"status": "running", "started_at": _now()})
+
+        async def on_batch(filename: str, counts: dict) -> None:
+            nonlocal rows, batches
+            rows += counts["rows"]
+            batches += 1
+            await self.save(
+                {
+                    "current_file": filename,
+                    "rows": rows,
+                    "batches": batches,
+                    "elapsed_seconds": round(time.perf_counter() - started, 3),
+                }
+            )
+
+        try:
+            results = await self.handler(self.files, self.db, on_batch)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            results = [{"file": file.filename, "error": detail} for file in self.files]
+        finally:
+            for file in self.files:
+                await file.close()
+
+        errors = [result for result in results if "error" in result]
+        for error in errors:
+            logger.error(
+                f"Ingestion job {self.id} failed on {error['file']}: {error['error']}"
+            )
+
+        elapsed = time.perf_counter() - started
+        await self.save(
+            {
+                "status": "failed" if errors else "succeeded",
+                "rows": rows,
+                "batches": batches,
+                "results": [result for result in results if "error" not in result],
+                "errors": errors,
+                "finished_at": _now(),
+                "elapsed_seconds": round(elapsed, 3),
+                "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+            }
+        )
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a fixed pool of asyncio workers fed by a bounded queue.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.queue: asyncio.Queue | None = None
+        self.tasks: list[asyncio.Task] = []
+        # Queue slots held by submissions still copying their files
+        self.reserved = 0
+        self.running: set[IngestionJob] = set()
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.max_queued)
+        self.tasks = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """
+        Waits for queued and in-flight jobs to finish, then stops the workers.
+
+        Jobs still queued or running after `timeout` are cancelled and marked
+        "interrupted", so their status does not claim they are still making progress.
+        """
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Stopping with {self.queue.qsize()} ingestion job(s) still queued"
+            )
+        unfinished = list(self.running)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        while not self.queue.empty():
+            job = self.queue.get_nowait()
+            for file in job.files:
+                await file.close()
+            unfinished.append(job)
+        for job in unfinished:
+            try:
+                await job.save({"status": "interrupted", "finished_at": _now()})
+            except Exception as e:
+                logger.error(f"Could not mark ingestion job {job.id} interrupted: {str(e)}")
+        self.queue = None
+        self.tasks = []
+        self.running = set()
+
+    async def submit(
+        self, kind: str, files: list[UploadFile], handler: IngestHandler, db
+    ) -> IngestionJob:
+        """
+        Copies the uploaded files out of the request and queues a job for them.
+
+        Raises:
+            JobQueueFull: If the queue is at capacity.
+        """
+        queue = self.queue
+        if queue is None or queue.qsize() + self.reserved >= self.max_queued:
+            raise JobQueueFull("Ingestion queue is full, try again later")
+
+        # Held across the awaits below, so concurrent submits cannot overfill the queue
+        self.reserved += 1
+        detached = []
+        try:
+            for file in files:
+                detached.append(await _detach(file))
+            job = IngestionJob(kind, detached, handler, db)
+            job.profile = current_profile.get() is not None
+            await job.save(
+                {
+                    "kind": kind,
+                    "status": "queued",
+                    "files": [file.filename for file in files],
+                    "rows": 0,
+                    "batches": 0,
+                    "results": [],
+                    "errors": [],
+                    "created_at": _now(),
+                }
+            )
+            queue.put_nowait(job)
+        except BaseException:
+            # The job never reached the queue, so nothing else will close its copies
+            for file in detached:
+                await file.close()
+            raise
+        finally:
+            self.reserved -= 1
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            self.running.add(job)
+            try:
+                if job.profile:
+                    await self._run_profiled(job)
+                else:
+                    await job.run()
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} crashed: {str(e)}")
+            finally:
+                self.running.discard(job)
+                self.queue.task_done()
+
+
+    async def _run_profiled(self, job: IngestionJob) -> None:
+        profiler = new_profiler(f"{job.kind} ingestion job {job.id}")
+        try:
+            async with profiler:
+                await job.run()
+        finally:
+            await save_profile(profiler)
+            await job.save({"profile_id": profiler.id})
+
+
+async def _detach(file: UploadFile) -> UploadFile:
+    """
+    Copies an upload into a file the job owns; request files are closed with the response.
+    """
+    spooled = SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_SIZE)
+    await file.seek(0)
+    await asyncio.get_running_loop().run_in_executor(
+        None, shutil.copyfileobj, file.file, spooled
+    )
+    spooled.seek(0)
+    return UploadFile(file=spooled, filename=file.filename)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+ingestion_jobs = JobManager(
+    workers=settings.INGEST_WORKERS, max_queued=settings.INGEST_MAX_QUEUED
+)
@@ -0,0 +1,550 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+from core.cache import response_cache
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _ValueChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return [list(self.counts), self.sum]
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children: dict[tuple, object] = {}
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            # setdefault keeps the first child if two threads race to create it
+            child = self.children.setdefault(values, self._child())
+        return child
+
+    def _child(self):
+        return _ValueChild()
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "labelnames": list(self.labelnames),
+            "samples": [
+                [list(labels), child.snapshot()]
+                for labels, child in list(self.children.items())
+            ],
+        }
+
+
+class Counter(Metric):
+    type = "counter"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    """
+    Prometheus-format metrics kept in process without a global lock.
+
+    Each labelled child carries its own lock, so updates from different
+    routes, and from Motor's threads, never contend with each other.
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        # Called before each snapshot to refresh values read from elsewhere
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        for collect in self.collectors:
+            collect()
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "Requests being handled", ("method", "route"))
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency per route template",
+        ("method", "route", "status"),
+    )
+)
+ingest_rows = registry.register(
+    Counter("ingest_rows_total", "Spreadsheet rows written by uploads", ("collection",))
+)
+ingest_batch_rows = registry.register(
+    Histogram(
+        "ingest_batch_rows",
+        "Rows per ingestion write batch",
+        ("collection",),
+        buckets=BATCH_BUCKETS,
+    )
+)
+ingest_batch_duration = registry.register(
+    Histogram(
+        "ingest_batch_duration_seconds",
+        "Time to write one ingestion batch",
+        ("collection",),
+    )
+)
+http_requests_rejected = registry.register(
+    Counter(
+        "http_requests_rejected_total",
+        "Requests turned away by the rate or concurrency limits",
+        ("route", "reason"),
+    )
+)
+http_requests_queued = registry.register(
+    Gauge("http_requests_queued", "Requests waiting for a concurrency slot", ("route",))
+)
+cache_requests = registry.register(
+    Counter("cache_requests_total", "Response cache lookups", ("route", "result"))
+)
+cache_entries = registry.register(Gauge("cache_entries", "Cached responses"))
+cache_bytes = registry.register(Gauge("cache_bytes", "Size of the cached responses"))
+mongo_pool_checkout = registry.register(
+    Histogram(
+        "mongo_pool_checkout_seconds",
+        "Wait for a pooled MongoDB connection",
+        ("address",),
+        buckets=CHECKOUT_BUCKETS,
+    )
+)
+mongo_pool_checkout_failures = registry.register(
+    Counter(
+        "mongo_pool_checkout_failures_total",
+        "Failed waits for a pooled MongoDB connection",
+        ("address", "reason"),
+    )
+)
+image_uploads_in_progress = registry.register(
+    Gauge("image_uploads_in_progress", "Images being resized and uploaded")
+)
+image_uploads_waiting = registry.register(
+    Gauge("image_uploads_waiting", "Images waiting for an upload slot")
+)
+image_upload_duration = registry.register(
+    Histogram(
+        "image_upload_duration_seconds",
+        "Time to resize and upload an image",
+        buckets=LATENCY_BUCKETS,
+    )
+)
+image_upload_bytes = registry.register(
+    Counter(
+        "image_upload_bytes_total",
+        "Image bytes received and sent to Cloudinary",
+        ("stage",),
+    )
+)
+write_behind_pending = registry.register(
+    Gauge("write_behind_pending", "Journaled form submissions not yet written to MongoDB")
+)
+write_behind_flushes = registry.register(
+    Counter(
+        "write_behind_flushes_total",
+        "Journal segments flushed to MongoDB",
+        ("result",),
+    )
+)
+write_behind_flush_entries = registry.register(
+    Histogram(
+        "write_behind_flush_entries",
+        "Submissions per journal flush",
+        buckets=BATCH_BUCKETS,
+    )
+)
+mongo_pool_in_use = registry.register(
+    Gauge("mongo_pool_connections_in_use", "Checked out MongoDB connections", ("address",))
+)
+
+
+def collect_cache() -> None:
+    stats = response_cache.stats()
+    for route, counts in stats["routes"].items():
+        cache_requests.labels(route, "hit").set(counts["hits"])
+        cache_requests.labels(route, "miss").set(counts["misses"])
+    cache_entries.labels().set(stats.get("entries", 0))
+    cache_bytes.labels().set(stats.get("bytes", 0))
+
+
+registry.collectors.append(collect_cache)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Records how long requests wait for a pooled connection; runs on Motor's threads.
+    """
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        address = _address(event.address)
+        mongo_pool_checkout.labels(address).observe(event.duration or 0.0)
+        mongo_pool_in_use.labels(address).inc()
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        address = _address(event.address)
+        mongo_pool_checkout.labels(address).observe(event.duration or 0.0)
+        mongo_pool_checkout_failures.labels(address, event.reason).inc()
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        mongo_pool_in_use.labels(_address(event.address)).dec()
+
+    # The remaining pool events are not measured
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+
+def _address(address: tuple) -> str:
+    return f"{address[0]}:{address[1]}"
+
+
+def instrument_route(app, method: str, route: str):
+    """
+    Wraps a route's ASGI app to track its in-flight requests and latency.
+    """
+    in_flight = http_requests_in_flight.labels(method, route)
+
+    async def instrumented(scope, receive, send):
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        in_flight.inc()
+        try:
+            await app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            http_request_duration.labels(method, route, status).observe(
+                time.perf_counter() - started
+            )
+
+    return instrumented
+
+
+def instrument_routes(app: FastAPI) -> None:
+    """
+    Instruments every API route, labelled by its path template, e.g. `/blogs/{blog_id}`.
+    """
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            method = ",".join(sorted(route.methods))
+            route.app = instrument_route(route.app, method, route.path_format)
+
+
+def render(snapshots: list[dict]) -> str:
+    """
+    Renders merged snapshots in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, metric in _merge(snapshots).items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in sorted(metric["samples"].items()):
+            pairs = list(zip(labelnames, labels))
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], math.inf], counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{name}_bucket{_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _merge(snapshots: list[dict]) -> dict:
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                labels = tuple(labels)
+                if labels not in target["samples"]:
+                    target["samples"][labels] = value
+                elif metric["type"] == "histogram":
+                    counts, total = target["samples"][labels]
+                    target["samples"][labels] = [
+                        [a + b for a, b in zip(counts, value[0])],
+                        total + value[1],
+                    ]
+                else:
+                    target["samples"][labels] += value
+    return merged
+
+
+def _as_snapshot(merged: dict) -> dict:
+    """
+    Turns the output of `_merge` back into the snapshot format workers write.
+    """
+    return {
+        name: {
+            **metric,
+            "samples": [[list(labels), value] for labels, value in metric["samples"].items()],
+        }
+        for name, metric in merged.items()
+    }
+
+
+def _read_snapshot(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsExporter:
+    """
+    Shares this worker's metrics with the others through snapshots in METRICS_DIR.
+
+    Snapshot files are named `<pid>-<start time>.json`, so a worker that
+    reuses the pid of an earlier one (the usual case after a container
+    restart) never overwrites its totals. The counters and histograms of a
+    worker that has exited are taken over by the first live worker to read
+    them, carried in its own snapshot from then on, and the file is removed.
+    """
+
+    def __init__(self, directory: str | None, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+        self.name: str | None = None
+        # Counters and histograms taken over from workers that have exited
+        self.inherited: dict = {}
+
+    @property
+    def path(self) -> str:
+        if self.name is None:
+            # Set on first use, in the worker process rather than a parent it forked from
+            self.name = f"{os.getpid()}-{time.time_ns()}"
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    def snapshot(self) -> dict:
+        return _as_snapshot(_merge([registry.snapshot(), self.inherited]))
+
+    def write(self) -> None:
+        path = self.path
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def read_all(self) -> list[dict]:
+        """
+        Returns a fresh snapshot of this worker and the last snapshot of every other live one.
+
+        Snapshots of workers that have exited are folded into this worker's
+        first, without their gauges, so that totals never go backwards.
+        """
+        if not self.directory:
+            return [registry.snapshot()]
+
+        own = os.path.basename(self.path)
+        snapshots = []
+        claimed = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            path = os.path.join(self.directory, filename)
+            pid = int(filename.removesuffix(".json").split("-")[0])
+            if pid != os.getpid() and process_alive(pid):
+                snapshot = _read_snapshot(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+                continue
+
+            # Renamed first, so that only one worker takes it over
+            claim = f"{path}.{self.name}.claimed"
+            try:
+                os.rename(path, claim)
+            except FileNotFoundError:
+                continue
+            claimed.append(claim)
+            snapshot = _read_snapshot(claim) or {}
+            kept = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+            self.inherited = _as_snapshot(_merge([self.inherited, kept]))
+
+        # Written before the claimed files go, so their totals are always on disk
+        self.write()
+        for claim in claimed:
+            os.remove(claim)
+        return [self.snapshot(), *snapshots]
+
+    async def start(self) -> None:
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self.task = asyncio.create_task(self._run(), name="metrics-exporter")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        self.write()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(None, self.write)
+            except OSError as e:
+                logger.error(f"Could not write metrics snapshot: {str(e)}")
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+metrics_exporter = MetricsExporter(
+    directory=settings.METRICS_DIR, interval=settings.METRICS_FLUSH_INTERVAL
+)
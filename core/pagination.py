@@ -0,0 +1,127 @@
+import base64
+import binascii
+
+from bson import json_util
+from fastapi import HTTPException, status
+
+# Header carrying the opaque cursor for the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+SortSpec = list[tuple[str, int]]
+
+
+def encode_cursor(doc: dict, sort: SortSpec) -> str:
+    """
+    Encodes the sort key values of the last document on a page as an opaque cursor.
+    """
+    values = [doc.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> list:
+    """
+    Decodes a cursor produced by `encode_cursor` for the same sort.
+
+    Raises:
+        HTTPException: If the cursor is malformed or was issued for another sort.
+    """
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return values
+
+
+def keyset_filter(sort: SortSpec, cursor: str | None) -> dict:
+    """
+    Builds the filter selecting documents that sort after the cursor.
+
+    For a sort on (a, b) this is `a > x OR (a == x AND b > y)`, with the
+    comparison flipped for descending keys, which an index on the sort keys
+    can answer without scanning the skipped documents.
+    """
+    if not cursor:
+        return {}
+
+    values = decode_cursor(cursor, sort)
+    clauses = []
+    for position, (field, direction) in enumerate(sort):
+        clause = {sort[i][0]: values[i] for i in range(position)}
+        clause.update(_after(field, direction, values[position]))
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def _after(field: str, direction: int, value) -> dict:
+    """
+    Selects the values of `field` that sort after `value`.
+
+    MongoDB sorts null and missing values before all others, but `$gt` and
+    `$lt` never match them, so they are selected explicitly where they come
+    next. `_id` is never null.
+    """
+    if direction > 0:
+        return {field: {"$ne": None} if value is None else {"$gt": value}}
+    if value is None or field == "_id":
+        # Nothing sorts below null, so `$lt: None` correctly matches nothing
+        return {field: {"$lt": value}}
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def with_cursor(query: dict, sort: SortSpec, cursor: str | None) -> dict:
+    """
+    Combines a query with the keyset filter for `cursor`.
+    """
+    after = keyset_filter(sort, cursor)
+    if not after:
+        return query
+    if not query:
+        return after
+    return {"$and": [query, after]}
+
+
+def next_cursor(docs: list[dict], sort: SortSpec, limit: int) -> str | None:
+    """
+    Returns the cursor for the page after `docs`, or None on the last page.
+
+    Callers fetch `limit + 1` documents; the extra one only signals that
+    another page exists and is dropped from `docs`.
+    """
+    if len(docs) <= limit:
+        return None
+    del docs[limit:]
+    return encode_cursor(docs[-1], sort)
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort: SortSpec,
+    limit: int,
+    cursor: str | None = None,
+    skip: int = 0,
+    projection: dict | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Fetches one page of `collection` in `sort` order.
+
+    Pages can be addressed by `skip` or by the opaque `cursor` returned with
+    the previous page; cursor pages cost the same at any depth.
+
+    Returns:
+        tuple[list[dict], str | None]: The page and the cursor for the next page.
+
+    Raises:
+        ValueError: If `limit` is less than 1.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    find = collection.find(with_cursor(query, sort, cursor), projection).sort(sort)
+    if skip:
+        find = find.skip(skip)
+    docs = await find.limit(limit + 1).to_list(length=limit + 1)
+    return docs, next_cursor(docs, sort, limit)
@@ -0,0 +1,259 @@
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from types import FrameType
+from urllib.parse import parse_qs
+
+from core.auth import InvalidToken, is_admin, verify_token
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# The profiler sampling the current request; ingestion jobs it submits are profiled too
+current_profile: ContextVar["Profiler | None"] = ContextVar("current_profile", default=None)
+
+
+class Profiler:
+    """
+    Samples the stack of one asyncio task from a background thread.
+
+    Each sample is the task's await chain, from its outermost coroutine to
+    the awaitable it is suspended on (a Motor future, an executor future),
+    so time spent waiting on the database or on `read_excel_file` in the
+    parse pool is attributed to the await that caused it. While the task
+    is running, the synchronous frames below its innermost coroutine are
+    sampled from the event loop thread as well.
+    """
+
+    def __init__(self, name: str, interval: float):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.interval = interval
+        self.frames: list[dict] = []
+        self.frame_index: dict[tuple, int] = {}
+        self.samples: list[list[int]] = []
+        self.weights: list[float] = []
+        self.task: asyncio.Task | None = None
+        self.thread_id: int | None = None
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.stopped = threading.Event()
+        self.sampler: threading.Thread | None = None
+
+    async def __aenter__(self) -> "Profiler":
+        self.task = asyncio.current_task()
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.sampler = threading.Thread(
+            target=self._sample_loop, name=f"profiler-{self.id[:8]}", daemon=True
+        )
+        self.sampler.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.stopped.set()
+        await asyncio.get_running_loop().run_in_executor(None, self.sampler.join)
+        self.elapsed = time.perf_counter() - self.started
+
+    def _sample_loop(self) -> None:
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            stack = self._stack()
+            if stack:
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+
+    def _stack(self) -> list[int]:
+        stack = []
+        coro = self.task.get_coro()
+        innermost = None
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None)
+            if frame is None:
+                frame = getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            stack.append(self._frame_id(frame))
+            innermost = frame
+            awaited = (
+                getattr(coro, "cr_await", None)
+                or getattr(coro, "ag_await", None)
+                or getattr(coro, "gi_yieldfrom", None)
+            )
+            if awaited is None:
+                # Running right now: add the synchronous calls it is making
+                if getattr(coro, "cr_running", False):
+                    stack.extend(self._running_frames(innermost))
+                break
+            if not hasattr(awaited, "cr_frame") and not hasattr(awaited, "gi_frame"):
+                stack.append(self._awaitable_id(awaited))
+                break
+            coro = awaited
+        return stack
+
+    def _running_frames(self, coroutine_frame: FrameType) -> list[int]:
+        frame = sys._current_frames().get(self.thread_id)
+        frames = []
+        while frame is not None and frame is not coroutine_frame:
+            frames.append(frame)
+            frame = frame.f_back
+        if frame is None:
+            return []
+        return [self._frame_id(frame) for frame in reversed(frames)]
+
+    def _frame_id(self, frame: FrameType) -> int:
+        code = frame.f_code
+        return self._intern(
+            (code.co_qualname, code.co_filename, code.co_firstlineno)
+        )
+
+    def _awaitable_id(self, awaitable) -> int:
+        # `await future` suspends on the future's iterator, not the future itself
+        name = type(awaitable).__name__.removesuffix("Iter")
+        return self._intern((f"<await {name}>", "", 0))
+
+    def _intern(self, key: tuple) -> int:
+        index = self.frame_index.get(key)
+        if index is None:
+            index = self.frame_index[key] = len(self.frames)
+            name, file, line = key
+            self.frames.append({"name": name, "file": file, "line": line})
+        return index
+
+    def speedscope(self) -> dict:
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": settings.TITLE,
+            "shared": {"frames": self.frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(self.weights),
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }
+            ],
+        }
+
+    def save(self) -> str:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = profile_path(self.id)
+        with open(path, "w") as f:
+            json.dump(self.speedscope(), f)
+        return path
+
+
+def profile_path(profile_id: str) -> str:
+    """
+    Raises:
+        ValueError: If `profile_id` is not an id issued by `Profiler`.
+    """
+    if not PROFILE_ID.match(profile_id):
+        raise ValueError("Invalid profile id")
+    return os.path.join(settings.PROFILE_DIR, f"{profile_id}.speedscope.json")
+
+
+def new_profiler(name: str) -> Profiler:
+    return Profiler(name, interval=settings.PROFILE_INTERVAL)
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER.lower().encode() and value not in (b"", b"0", b"false"):
+            return True
+    query = scope.get("query_string", b"")
+    if b"profile" not in query:
+        return False
+    values = parse_qs(query.decode("latin-1")).get("profile", [])
+    return any(value not in ("", "0", "false") for value in values)
+
+
+def _admin_request(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name != b"authorization":
+            continue
+        scheme, _, encoded = value.decode("latin-1").partition(" ")
+        if scheme.lower() == "bearer":
+            try:
+                verify_token(encoded)
+            except InvalidToken:
+                return False
+            return True
+        if scheme.lower() != "basic":
+            return False
+        try:
+            username, _, password = base64.b64decode(encoded).decode().partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+        return is_admin(username, password)
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when an admin asks for it with `X-Profile: 1` or `?profile=1`.
+
+    The speedscope profile is written to `PROFILE_DIR` and its id returned in
+    `X-Profile-Id`; fetch it from `/profiles/{id}`. Only added to the app when
+    `PROFILING_ENABLED` is set, so it costs nothing otherwise.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not _wants_profile(scope)
+            or not _admin_request(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = new_profiler(f"{scope['method']} {scope['path']}")
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.lower().encode(), profiler.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profiler)
+        try:
+            async with profiler:
+                await self.app(scope, receive, send_with_profile_id)
+        finally:
+            current_profile.reset(token)
+            await save_profile(profiler)
+
+
+async def save_profile(profiler: Profiler) -> None:
+    try:
+        path = await asyncio.get_running_loop().run_in_executor(None, profiler.save)
+        logger.info(
+            f"Profiled {profiler.name}: {len(profiler.samples)} samples in "
+            f"{profiler.elapsed:.3f}s, written to {path}"
+        )
+    except OSError as e:
+        logger.error(f"Could not save profile {profiler.id}: {str(e)}")
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from core.config import settings
+from core.metrics import http_requests_queued, http_requests_rejected
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage for the token buckets.
+
+    The in-memory backend limits each worker separately; a shared store
+    (e.g. Redis running `take` as one atomic script) can replace it to
+    enforce the limits across all workers without changing the callers.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Takes a token from `key`'s bucket.
+
+        Returns 0 when a token was available, or else the seconds until the
+        next one will be.
+        """
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Token buckets for at most `max_keys` keys, least recently used evicted first.
+
+    An evicted bucket starts full again, which only ever favours the client.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> (tokens, refilled_at)
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, refilled_at = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - refilled_at) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """
+    Lets `limit` requests run at once and up to `queue` more wait for a slot.
+
+    Requests beyond that, or that wait longer than `timeout` seconds, are
+    shed. The limit is per worker, like the MongoDB pool it protects.
+    """
+
+    def __init__(self, limit: int, queue: int, timeout: float):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if self.waiting >= self.queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self.semaphore.release()
+
+
+rate_limit_backend: RateLimitBackend = MemoryRateLimitBackend(
+    max_keys=settings.RATE_LIMIT_MAX_CLIENTS
+)
+
+
+def client_id(scope) -> str:
+    """
+    The client's address; run uvicorn with `--proxy-headers` behind a proxy.
+    """
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def reject(scope, receive, send, status_code: int, detail: str, retry_after: float):
+    response = JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+    await response(scope, receive, send)
+
+
+def limit_route(
+    app,
+    route: str,
+    rate: tuple[float, int] | None,
+    concurrency: tuple[int, int] | None,
+    backend: RateLimitBackend,
+):
+    """
+    Wraps a route's ASGI app with its per-client rate limit and concurrency limit.
+
+    Over the rate limit a client gets a 429; once the route's slots and queue
+    are full every client gets a 503. Both carry `Retry-After`.
+    """
+    limiter = (
+        ConcurrencyLimiter(*concurrency, timeout=settings.CONCURRENCY_QUEUE_TIMEOUT)
+        if concurrency
+        else None
+    )
+    queued = http_requests_queued.labels(route)
+
+    async def limited(scope, receive, send):
+        if rate is not None:
+            wait = await backend.take(f"{route}|{client_id(scope)}", *rate)
+            if wait:
+                http_requests_rejected.labels(route, "rate").inc()
+                await reject(scope, receive, send, 429, "Too many requests", wait)
+                return
+
+        if limiter is None:
+            await app(scope, receive, send)
+            return
+
+        queued.inc()
+        try:
+            admitted = await limiter.acquire()
+        finally:
+            queued.dec()
+        if not admitted:
+            http_requests_rejected.labels(route, "concurrency").inc()
+            logger.warning(f"Shed a request to {route}: all {limiter.limit} slots busy")
+            await reject(
+                scope, receive, send, 503, "Server is busy, try again later", limiter.timeout
+            )
+            return
+        try:
+            await app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    return limited
+
+
+def limit_routes(app: FastAPI, backend: RateLimitBackend | None = None) -> None:
+    """
+    Applies `RATE_LIMITS` and `CONCURRENCY_LIMITS` to the routes they name by path template.
+    """
+    backend = backend or rate_limit_backend
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        rate = settings.RATE_LIMITS.get(route.path_format)
+        concurrency = settings.CONCURRENCY_LIMITS.get(route.path_format)
+        if rate or concurrency:
+            route.app = limit_route(route.app, route.path_format, rate, concurrency, backend)
@@ -0,0 +1,73 @@
+import time
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from bson import Decimal128, ObjectId, json_util
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from core.instrumentation import record_serialization
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    Encodes MongoDB documents straight to JSON bytes with orjson.
+
+    ObjectId and Decimal128 become strings; datetimes, dates and enums are
+    handled natively by orjson. Returning this response from a route skips
+    FastAPI's `response_model` validation and `jsonable_encoder` pass, so
+    use it only for documents this app wrote itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        body = self.dumps(content)
+        record_serialization((time.perf_counter() - started) * 1000)
+        return body
+
+    def dumps(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ExtendedJSONResponse(MongoJSONResponse):
+    """
+    Like `MongoJSONResponse`, but in MongoDB relaxed Extended JSON
+    (`{"$oid": ...}`, `{"$date": ...}`), the format `bson.json_util.dumps` emits.
+    """
+
+    def dumps(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=json_util.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+
+
+@lru_cache(maxsize=None)
+def _model_defaults(model: type[BaseModel]) -> tuple:
+    return tuple(
+        (field.alias or name, field.default_factory, field.default)
+        for name, field in model.model_fields.items()
+        if not field.is_required()
+    )
+
+
+def with_defaults(doc: dict, model: type[BaseModel]) -> dict:
+    """
+    Fills in the optional fields of `model` missing from `doc` without validating it.
+
+    This gives a trusted document the same keys the model would serialize.
+    """
+    for key, factory, default in _model_defaults(model):
+        if key not in doc:
+            doc[key] = factory() if factory is not None else default
+    return doc
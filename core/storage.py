@@ -0,0 +1,25 @@
+from functools import lru_cache
+from types import ModuleType
+
+from core.config import settings
+
+
+@lru_cache(maxsize=None)
+def cloudinary() -> ModuleType:
+    """
+    Returns the Cloudinary SDK, importing and configuring it on first use.
+
+    Only image uploads and listings need it, so the app starts without
+    paying for its import.
+    """
+    import cloudinary
+    import cloudinary.api
+    import cloudinary.uploader
+
+    cloudinary.config(
+        cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+        api_key=settings.CLOUDINARY_API_KEY,
+        api_secret=settings.CLOUDINARY_API_SECRET,
+        secure=True,
+    )
+    return cloudinary
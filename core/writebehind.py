@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable
+
+from bson import json_util
+from pymongo.errors import ConnectionFailure
+
+from core.config import settings
+from core.metrics import (
+    process_alive,
+    write_behind_flush_entries,
+    write_behind_flushes,
+    write_behind_pending,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# (db, submissions of one kind in journal order) -> None; must be idempotent,
+# because a segment is replayed in full if the worker dies mid-flush
+FlushHandler = Callable[..., Awaitable[None]]
+
+JOURNAL_SUFFIX = ".journal"
+# Shown to clients instead of the OSError, which names local paths
+JOURNAL_UNAVAILABLE = "Submissions cannot be recorded right now, try again later"
+
+
+class Segment:
+    """
+    One journal file and the submissions appended to it since it was opened.
+    """
+
+    def __init__(self, path: str, entries: list[dict] | None = None):
+        self.path = path
+        self.entries = entries if entries is not None else []
+        self.file = None
+
+    def append(self, data: bytes) -> None:
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def load(cls, path: str) -> "Segment":
+        entries = []
+        with open(path, "rb") as f:
+            for number, line in enumerate(f, start=1):
+                try:
+                    entries.append(json_util.loads(line))
+                except ValueError:
+                    # A line torn by a crash was never acknowledged
+                    logger.warning(f"Skipping unreadable line {number} of {path}")
+        return cls(path, entries)
+
+
+class WriteBehindBuffer:
+    """
+    Acknowledges writes once they are fsynced to a local journal and applies
+    them to MongoDB in batches.
+
+    Submissions that arrive while the journal is being synced are written
+    with the next fsync together, so a burst costs a few disk syncs instead
+    of one MongoDB round trip each. The current segment is flushed once it
+    holds `max_batch` submissions or every `max_delay` seconds; each kind of
+    submission goes to its registered handler, which deduplicates the batch
+    and writes it with one `bulk_write`.
+
+    Each worker journals to its own segments, named after its pid. On
+    startup, segments left behind by this pid or by dead workers are
+    claimed and replayed. Until `start` is called, or when write-behind is
+    disabled, submissions are written straight through.
+    """
+
+    def __init__(self, directory: str, max_batch: int, max_delay: float, enabled: bool = True):
+        self.directory = directory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.enabled = enabled
+        self.handlers: dict[str, FlushHandler] = {}
+        self.db = None
+        self.segment: Segment | None = None
+        self.sequence = 0
+        # Segments closed for writing whose submissions are not in MongoDB yet
+        self.unflushed: list[Segment] = []
+        self.pending: list[tuple[dict, asyncio.Future]] = []
+        self.journal_lock = asyncio.Lock()
+        self.flush_lock = asyncio.Lock()
+        self.full = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def register(self, kind: str, handler: FlushHandler) -> None:
+        self.handlers[kind] = handler
+
+    async def enqueue(self, db, kind: str, doc: dict) -> None:
+        """
+        Returns once `doc` is durable in the journal, or written to `db` if not started.
+
+        Raises:
+            OSError: If the journal could not be written; nothing was acknowledged.
+        """
+        if self.task is None:
+            await self.handlers[kind](db, [doc])
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(({"kind": kind, "doc": doc}, future))
+        await self._write_pending()
+        await future
+
+    async def _write_pending(self) -> None:
+        async with self.journal_lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            data = b"".join(json_util.dumps(entry).encode() + b"\n" for entry, _ in batch)
+            segment = self.segment
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, segment.append, data)
+            except OSError as e:
+                logger.error(f"Could not write to {segment.path}: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            segment.entries.extend(entry for entry, _ in batch)
+            write_behind_pending.labels().inc(len(batch))
+            # A request cancelled while waiting has a cancelled future; its entry is
+            # journaled all the same
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            if len(segment.entries) >= self.max_batch:
+                self.full.set()
+
+    def _new_segment(self) -> Segment:
+        self.sequence += 1
+        name = f"{os.getpid()}-{self.sequence:08d}{JOURNAL_SUFFIX}"
+        return Segment(os.path.join(self.directory, name))
+
+    def _claim_orphans(self) -> list[Segment]:
+        """
+        Takes over the segments of this pid and of workers that are no longer running.
+        """
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(JOURNAL_SUFFIX):
+                continue
+            pid = int(name.split("-", 1)[0])
+            if pid != os.getpid() and process_alive(pid):
+                continue
+            path = os.path.join(self.directory, name)
+            claimed = self._new_segment().path
+            try:
+                # Atomic, so two workers starting together cannot both claim it
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            segments.append(Segment.load(claimed))
+        return segments
+
+    async def flush(self) -> None:
+        """
+        Closes the current segment and writes every unflushed segment, oldest first.
+
+        A segment that fails because MongoDB could not be reached is kept and
+        retried on the next flush. Any other error, such as a `BulkWriteError`
+        for a document MongoDB rejects, would fail again on every retry, so
+        the segment is renamed to `.failed` for inspection instead of blocking
+        the segments after it.
+        """
+        async with self.flush_lock:
+            # Entries whose request was cancelled before it took the journal lock
+            await self._write_pending()
+            async with self.journal_lock:
+                if self.segment.entries:
+                    self.segment.close()
+                    self.unflushed.append(self.segment)
+                    self.segment = self._new_segment()
+
+            while self.unflushed:
+                segment = self.unflushed[0]
+                try:
+                    await self._apply(segment.entries)
+                    segment.remove()
+                    write_behind_flushes.labels("ok").inc()
+                except ConnectionFailure as e:
+                    write_behind_flushes.labels("retry").inc()
+                    logger.error(f"Could not flush {segment.path}, will retry: {str(e)}")
+                    return
+                except Exception as e:
+                    write_behind_flushes.labels("failed").inc()
+                    logger.error(f"Rejected journal segment {segment.path}: {str(e)}")
+                    segment.close()
+                    os.replace(segment.path, f"{segment.path}.failed")
+                self.unflushed.pop(0)
+                write_behind_pending.labels().dec(len(segment.entries))
+                write_behind_flush_entries.labels().observe(len(segment.entries))
+
+    async def _apply(self, entries: list[dict]) -> None:
+        by_kind: dict[str, list[dict]] = {}
+        for entry in entries:
+            by_kind.setdefault(entry["kind"], []).append(entry["doc"])
+        for kind, docs in by_kind.items():
+            await self.handlers[kind](self.db, docs)
+
+    async def start(self, db) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.db = db
+        self.unflushed = self._claim_orphans()
+        replayed = sum(len(segment.entries) for segment in self.unflushed)
+        if replayed:
+            logger.info(f"Replaying {replayed} journaled submissions")
+            write_behind_pending.labels().inc(replayed)
+        self.segment = self._new_segment()
+        await self.flush()
+        self.task = asyncio.create_task(self._run(), name="write-behind")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        await self.flush()
+        # Whatever could not be written stays in the journal for the next start
+        for segment in self.unflushed:
+            segment.close()
+        self.segment.remove()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {str(e)}")
+
+
+write_behind = WriteBehindBuffer(
+    directory=settings.WRITE_BEHIND_DIR,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+    max_delay=settings.WRITE_BEHIND_MAX_DELAY,
+    enabled=settings.WRITE_BEHIND_ENABLED,
+)
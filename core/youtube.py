@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+from core.config import settings
+from core.etags import mark_changed
+
+
+logger = logging.getLogger(__name__)
+
+VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+# Path prefixes that are followed by the video id, e.g. /shorts/<id>
+ID_PATHS = ("/embed/", "/shorts/", "/live/", "/v/")
+
+
+class VideoNotFound(Exception):
+    pass
+
+
+class MetadataUnavailable(Exception):
+    pass
+
+
+def video_id(url: str) -> str | None:
+    """
+    Returns the video id of a YouTube URL, so every form of a link shares one id.
+
+    Handles youtu.be short links, watch?v= URLs and the embed, shorts and live
+    paths; returns None for anything else.
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host == "youtu.be":
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host in YOUTUBE_HOSTS:
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            for prefix in ID_PATHS:
+                if parsed.path.startswith(prefix):
+                    candidate = parsed.path[len(prefix):].split("/")[0]
+                    break
+    if candidate and VIDEO_ID.match(candidate):
+        return candidate
+    return None
+
+
+class MetadataSource(ABC):
+    """
+    Fetches a video's title and description; called on a worker thread.
+    """
+
+    @abstractmethod
+    def fetch(self, video_id: str) -> dict:
+        """
+        Raises:
+            VideoNotFound: If there is no such video.
+        """
+
+
+class PytubeSource(MetadataSource):
+    def fetch(self, video_id: str) -> dict:
+        from pytube import YouTube, exceptions as pytube_exceptions
+
+        try:
+            video = YouTube(f"https://www.youtube.com/watch?v={video_id}")
+            return {"title": video.title, "description": video.description}
+        except pytube_exceptions.VideoUnavailable as e:
+            raise VideoNotFound(str(e))
+
+
+class VideoMetadata:
+    """
+    YouTube titles and descriptions, cached in `db.youtube_metadata_collection` by video id.
+
+    Fetches run on a small dedicated thread pool with a timeout, so a slow
+    YouTube neither blocks the event loop nor ties up the default executor.
+    A fetch that times out keeps its thread until the source returns; the
+    pool size bounds how many can pile up. Concurrent requests for the same
+    video in this worker share one fetch.
+    """
+
+    def __init__(self, source: MetadataSource, timeout: float, workers: int):
+        self.source = source
+        self.timeout = timeout
+        self.workers = workers
+        self.executor: ThreadPoolExecutor | None = None
+        self.pending: dict[str, asyncio.Future] = {}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="youtube-metadata"
+            )
+        return self.executor
+
+    async def get(self, db, video_id: str) -> dict:
+        """
+        Returns `{"title", "description"}` for a video, from the cache when possible.
+
+        Raises:
+            VideoNotFound: If the source reports that the video does not exist.
+            MetadataUnavailable: If the source failed or did not answer in time.
+        """
+        cached = await db.youtube_metadata_collection.find_one({"_id": video_id})
+        if cached is not None:
+            return {"title": cached["title"], "description": cached["description"]}
+
+        pending = self.pending.get(video_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The caller fetching it went away; fetch it here instead
+                if not pending.cancelled():
+                    raise
+                return await self.get(db, video_id)
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[video_id] = future
+        try:
+            metadata = await self._fetch(video_id)
+            await db.youtube_metadata_collection.update_one(
+                {"_id": video_id},
+                {"$set": {**metadata, "fetched_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+            future.set_result(metadata)
+            return metadata
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so an unawaited future does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self.pending[video_id]
+
+    async def _fetch(self, video_id: str) -> dict:
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor(), self.source.fetch, video_id),
+                self.timeout,
+            )
+        except VideoNotFound:
+            raise
+        except asyncio.TimeoutError:
+            raise MetadataUnavailable(
+                f"YouTube did not answer within {self.timeout:g}s for {video_id}"
+            )
+        except Exception as e:
+            raise MetadataUnavailable(f"Could not fetch YouTube metadata for {video_id}: {str(e)}")
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+class MetadataBackfill:
+    """
+    Fills in the titles of YouTube links created while YouTube was unreachable.
+
+    Every `interval` seconds, up to `batch_size` links without a title are
+    looked up through `VideoMetadata`. A link whose lookup fails is not
+    retried for another `interval`.
+    """
+
+    def __init__(self, metadata: VideoMetadata, interval: float, batch_size: int):
+        self.metadata = metadata
+        self.interval = interval
+        self.batch_size = batch_size
+        self.task: asyncio.Task | None = None
+
+    async def run_once(self, db) -> int:
+        """
+        Backfills one batch; returns how many links got their metadata.
+        """
+        retry_before = datetime.now(timezone.utc) - timedelta(seconds=self.interval)
+        cursor = db.links_collection.find(
+            {
+                "media_type": "youtube",
+                "title": None,
+                "$or": [
+                    {"metadata_attempted_at": None},
+                    {"metadata_attempted_at": {"$lt": retry_before}},
+                ],
+            },
+            {"url": 1},
+        ).limit(self.batch_size)
+
+        filled = 0
+        async for link in cursor:
+            update = {"metadata_attempted_at": datetime.now(timezone.utc)}
+            found = video_id(link["url"])
+            if found is not None:
+                try:
+                    update.update(await self.metadata.get(db, found))
+                    filled += 1
+                except (VideoNotFound, MetadataUnavailable) as e:
+                    logger.warning(f"Could not backfill link {link['_id']}: {str(e)}")
+            await db.links_collection.update_one({"_id": link["_id"]}, {"$set": update})
+
+        if filled:
+            await mark_changed(db, "links")
+            logger.info(f"Backfilled YouTube metadata for {filled} links")
+        return filled
+
+    async def start(self, db) -> None:
+        self.task = asyncio.create_task(self._run(db), name="youtube-backfill")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        self.metadata.shutdown()
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                await self.run_once(db)
+            except Exception as e:
+                logger.error(f"YouTube metadata backfill failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+video_metadata = VideoMetadata(
+    PytubeSource(),
+    timeout=settings.YOUTUBE_FETCH_TIMEOUT,
+    workers=settings.YOUTUBE_FETCH_WORKERS,
+)
+metadata_backfill = MetadataBackfill(
+    video_metadata,
+    interval=settings.YOUTUBE_BACKFILL_INTERVAL,
+    batch_size=settings.YOUTUBE_BACKFILL_BATCH_SIZE,
+)
@@ -0,0 +1,125 @@
+import time
+from itertools import islice
+from typing import Awaitable, Callable, Iterable
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from core.config import settings
+from core.metrics import ingest_batch_duration, ingest_batch_rows, ingest_rows
+from db.rollups import apply_rollups, plain, tracked_fields
+
+
+def batched(iterable: Iterable, size: int):
+    """
+    Yield successive lists of at most `size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def bulk_upsert(
+    collection,
+    records: Iterable[dict],
+    key_fields: tuple[str, ...],
+    batch_size: int | None = None,
+    on_batch: Callable[[dict], Awaitable[None]] | None = None,
+) -> list[dict]:
+    """
+    Upsert records into a MongoDB collection with unordered `bulk_write` batches.
+
+    Each record is matched on `key_fields` and written with `$set`, so an
+    existing document is updated in place and a missing one is inserted.
+
+    Parameters:
+        collection: The Motor collection to write to.
+        records (Iterable[dict]): The documents to upsert.
+        key_fields (tuple[str, ...]): The fields identifying a document.
+        batch_size (int, optional): Operations per `bulk_write` call.
+            Defaults to `settings.UPLOAD_BATCH_SIZE`.
+        on_batch (Callable, optional): Awaited with the counts of each finished batch.
+
+    Collections with rollups registered in `db.rollups.ROLLUPS` get their
+    rollups updated from the documents each batch replaced.
+
+    Returns:
+        list[dict]: Per-batch counts of rows, matched, upserted and modified documents.
+    """
+    batch_size = batch_size or settings.UPLOAD_BATCH_SIZE
+    tracked = tracked_fields(collection.name)
+    rows = ingest_rows.labels(collection.name)
+    batch_rows = ingest_batch_rows.labels(collection.name)
+    batch_duration = ingest_batch_duration.labels(collection.name)
+    results = []
+
+    for index, batch in enumerate(batched(records, batch_size)):
+        started = time.perf_counter()
+        if tracked is not None:
+            current = await _current_docs(collection, batch, key_fields, tracked)
+        operations = [
+            UpdateOne(
+                {field: record[field] for field in key_fields},
+                {"$set": record},
+                upsert=True,
+            )
+            for record in batch
+        ]
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            counts = result.bulk_api_result
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            raise ValueError(
+                f"Batch {index} failed for {len(errors)} row(s): {errors[:1]}"
+            ) from e
+
+        if tracked is not None:
+            await _apply_batch_rollups(collection, batch, key_fields, current)
+
+        rows.inc(len(batch))
+        batch_rows.observe(len(batch))
+        batch_duration.observe(time.perf_counter() - started)
+        results.append(_batch_counts(index, len(batch), counts))
+        if on_batch:
+            await on_batch(results[-1])
+
+    return results
+
+
+async def _current_docs(
+    collection, batch: list[dict], key_fields: tuple[str, ...], tracked: dict
+) -> dict[tuple, dict]:
+    """
+    Fetches the documents a batch is about to overwrite, keyed by natural key.
+    """
+    query = {"$or": [{field: record[field] for field in key_fields} for record in batch]}
+    projection = {**tracked, **{field: 1 for field in key_fields}, "_id": 0}
+    return {
+        tuple(plain(doc.get(field)) for field in key_fields): doc
+        async for doc in collection.find(query, projection)
+    }
+
+
+async def _apply_batch_rollups(
+    collection, batch: list[dict], key_fields: tuple[str, ...], current: dict
+) -> None:
+    changes = []
+    for record in batch:
+        key = tuple(plain(record[field]) for field in key_fields)
+        before = current.get(key)
+        after = {**(before or {}), **record}
+        changes.append((before, after))
+        # A key repeated within the batch replaces the row written before it
+        current[key] = after
+    await apply_rollups(collection.database, collection.name, changes)
+
+
+def _batch_counts(index: int, rows: int, counts: dict) -> dict:
+    return {
+        "batch": index,
+        "rows": rows,
+        "matched": counts.get("nMatched", 0),
+        "upserted": counts.get("nUpserted", 0),
+        "modified": counts.get("nModified", 0),
+    }
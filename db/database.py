@@ -1,41 +1,112 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+import asyncio
+import logging
+
 from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+from core.config import settings
+from core.instrumentation import command_timer
+from core.metrics import pool_metrics
+
+
+logger = logging.getLogger(__name__)
+
+# The app's client, created and closed by the FastAPI lifespan
+_client: AsyncIOMotorClient | None = None
+
+
+def get_db_client(**options) -> AsyncIOMotorClient:
+    """
+    Creates a Motor client with the pool, timeout and compression settings.
+    """
+    return AsyncIOMotorClient(
+        settings.MONGO_URL,
+        appname=settings.TITLE,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        compressors=settings.MONGO_COMPRESSORS,
+        event_listeners=[command_timer, pool_metrics],
+        **options,
+    )
 
 
-load_dotenv()
+async def connect_db() -> AsyncIOMotorDatabase:
+    """
+    Creates the app's client and warms its connection pool.
+    """
+    global _client
+    if _client is None:
+        _client = get_db_client()
+        await warm_pool(_client, settings.MONGO_MIN_POOL_SIZE)
+    return _client[settings.MONGO_DB_NAME]
+
 
-def get_db_client():
-    MONGO_URL = os.getenv("MONGO_URL")
-    client = AsyncIOMotorClient(MONGO_URL)
-    return client
+def close_db() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
 
-# Get database
-db = get_db_client().hasken_rayuwa
 
+async def warm_pool(client: AsyncIOMotorClient, connections: int) -> None:
+    """
+    Opens `connections` pooled connections up front with concurrent pings.
 
-# Collections
-states_collection = db.states
-filmshow_collection = db.filmshows
-discipleship_collection = db.discipleships
-users_collection = db.users
-links_collection = db.links
-blogs_collection = db.blogs
+    Without this the first requests after a start pay for server selection
+    and the TCP/TLS/auth handshakes. A failure is logged, not raised, so an
+    unreachable database cannot keep the app from starting.
+    """
+    try:
+        await asyncio.gather(
+            *(client.admin.command("ping") for _ in range(max(connections, 1)))
+        )
+    except PyMongoError as e:
+        logger.error(f"Could not warm the MongoDB connection pool: {str(e)}")
+
+
+def database() -> AsyncIOMotorDatabase:
+    if _client is None:
+        raise RuntimeError("The database client is not connected")
+    return _client[settings.MONGO_DB_NAME]
+
+
+def read_preference(name: str):
+    return make_read_preference(
+        read_pref_mode_from_name(name), None, settings.MONGO_MAX_STALENESS_SECONDS
+    )
 
-# Type definitions for MongoDB ObjectId handling
-# PyObjectId = Annotated[str, BeforeValidator(str)]
-# ObjectId = Annotated[
-#     bson.ObjectId,
-#     BeforeValidator(lambda x: bson.ObjectId(x) if isinstance(x, str) else x),
-# ]
 
 # Database helper functions
 async def get_db():
-    try:
+    """
+    Yields the database with the client's defaults: reads and writes on the primary.
+    """
+    yield database()
+
+
+def get_db_for(router: str):
+    """
+    Builds a `get_db` for a router whose reads may go to the members named in
+    `settings.MONGO_READ_PREFERENCES[router]`, e.g. secondaries for analytics.
+    """
+    mode = settings.MONGO_READ_PREFERENCES.get(router)
+    preference = read_preference(mode) if mode else None
+
+    async def get_router_db():
+        db = database()
+        if preference is not None:
+            db = db.with_options(read_preference=preference)
         yield db
-    finally:
-        pass
+
+    return get_router_db
+
 
 async def get_or_create_entity(collection, filter_query, data):
     """
@@ -55,4 +126,4 @@ async def update_instance(collection, id, data):
         {"_id": ObjectId(id)},
         {"$set": data}
     )
-    return update_result
\ No newline at end of file
+    return update_result
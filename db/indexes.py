@@ -0,0 +1,190 @@
+"""
+Declared indexes for every collection, ensured on startup.
+
+Usage:
+    python -m db.indexes diff      # compare declared indexes with the database
+    python -m db.indexes ensure    # create any missing indexes
+"""
+import asyncio
+import logging
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from core.config import settings
+from db.database import get_db_client
+
+logger = logging.getLogger(__name__)
+
+
+# Keyed by the collection attribute the routes use, e.g. `db.states_collection`
+INDEXES: dict[str, list[IndexModel]] = {
+    "states_collection": [
+        # Upload upsert key; its State prefix also serves /states_data filters
+        IndexModel(
+            [("State", ASCENDING), ("Village", ASCENDING)],
+            name="state_village",
+            unique=True,
+        ),
+    ],
+    "filmshow_collection": [
+        IndexModel(
+            [
+                ("Team", ASCENDING),
+                ("State", ASCENDING),
+                ("Ward", ASCENDING),
+                ("Village", ASCENDING),
+                ("Date", ASCENDING),
+            ],
+            name="natural_key",
+            unique=True,
+        ),
+        IndexModel([("Month", ASCENDING)], name="month"),
+    ],
+    "discipleship_collection": [
+        IndexModel(
+            [
+                ("Team", ASCENDING),
+                ("State", ASCENDING),
+                ("Ward", ASCENDING),
+                ("Village", ASCENDING),
+                ("Month", ASCENDING),
+            ],
+            name="natural_key",
+            unique=True,
+        ),
+        IndexModel([("Month", ASCENDING)], name="month"),
+    ],
+    "links_collection": [
+        IndexModel([("url", ASCENDING)], name="url", unique=True),
+        IndexModel([("media_type", ASCENDING), ("_id", ASCENDING)], name="media_type"),
+    ],
+    "blogs_collection": [
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="date"),
+    ],
+    "rollups_collection": [
+        IndexModel(
+            [
+                ("source", ASCENDING),
+                ("State", ASCENDING),
+                ("LGA", ASCENDING),
+                ("Month", ASCENDING),
+            ],
+            name="source_state_lga_month",
+        ),
+        IndexModel([("source", ASCENDING), ("Month", ASCENDING)], name="source_month"),
+    ],
+    "jobs_collection": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "users_collection": [
+        # Upsert key for the contact and volunteer forms
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+        # /users?group= filters on both flags and pages in _id order
+        IndexModel(
+            [("is_contact", ASCENDING), ("is_volunteer", ASCENDING), ("_id", ASCENDING)],
+            name="groups",
+        ),
+    ],
+    "contact_messages_collection": [
+        IndexModel([("email", ASCENDING), ("created_at", DESCENDING)], name="email"),
+    ],
+    "images_collection": [
+        # /images lists newest first; the sync also reads the newest created_at
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at"),
+    ],
+    "revoked_tokens_collection": [
+        # Drops each revocation once its token has expired anyway
+        IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+    ],
+}
+
+
+def _spec(index: dict) -> dict:
+    """
+    Reduces an index document to the options that matter for a diff.
+    """
+    key = index["key"]
+    fields = key.items() if hasattr(key, "items") else key
+    return {
+        "key": [(field, int(direction)) for field, direction in fields],
+        "unique": bool(index.get("unique", False)),
+        "expireAfterSeconds": index.get("expireAfterSeconds"),
+    }
+
+
+async def ensure_indexes(db) -> None:
+    """
+    Creates every declared index that is missing.
+
+    A failing index (for example a unique index over existing duplicates) is
+    logged and skipped so it cannot keep the app from starting. If MongoDB
+    cannot be reached at all, the rest are skipped too rather than waiting
+    out the server selection timeout once per index; run
+    `python -m db.indexes ensure` once it is back.
+    """
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        for model in models:
+            try:
+                await collection.create_indexes([model])
+            except ConnectionFailure as e:
+                logger.error(f"Could not reach MongoDB to ensure indexes: {str(e)}")
+                return
+            except PyMongoError as e:
+                logger.error(
+                    f"Could not create index {model.document['name']} "
+                    f"on {collection_name}: {str(e)}"
+                )
+
+
+async def diff_indexes(db) -> dict[str, dict[str, list[str]]]:
+    """
+    Compares the declared indexes with those in the database.
+
+    Returns:
+        dict: Per collection, the index names that are missing, changed or undeclared.
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        existing.pop("_id_", None)
+        declared = {model.document["name"]: model.document for model in models}
+
+        report[collection_name] = {
+            "missing": sorted(set(declared) - set(existing)),
+            "changed": sorted(
+                name
+                for name in set(declared) & set(existing)
+                if _spec(declared[name]) != _spec(existing[name])
+            ),
+            "undeclared": sorted(set(existing) - set(declared)),
+        }
+    return report
+
+
+async def _main(command: str) -> int:
+    db = get_db_client()[settings.MONGO_DB_NAME]
+
+    if command == "ensure":
+        await ensure_indexes(db)
+
+    report = await diff_indexes(db)
+    drift = False
+    for collection_name, changes in report.items():
+        for kind, names in changes.items():
+            for name in names:
+                drift = drift or kind != "undeclared"
+                print(f"{collection_name}: {kind} index {name}")
+    if not drift:
+        print("All declared indexes are present")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("diff", "ensure"):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
@@ -0,0 +1,114 @@
+"""
+Copies users from the old SQLite tables (users, contact, volunteer) into
+`users_collection` with their membership flags, and the contact messages
+into `contact_messages_collection`. Safe to run more than once: users are
+upserted by email and messages already copied are skipped.
+
+Usage:
+    python -m db.migrate_users path/to/database.db
+"""
+import asyncio
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from core.config import settings
+from db.bulk import batched
+from db.database import get_db_client
+
+FLAGS = ("is_contact", "is_volunteer")
+
+
+def read_users(path: str) -> tuple[dict[str, dict], list[dict]]:
+    """
+    Returns the users keyed by lower-cased email, and the contact messages.
+    """
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    users: dict[str, dict] = {}
+
+    def user(email: str, fullname: str) -> dict:
+        email = email.strip().lower()
+        return users.setdefault(
+            email,
+            {"email": email, "fullname": fullname, "is_contact": False, "is_volunteer": False},
+        )
+
+    try:
+        for row in connection.execute("SELECT fullname, email FROM users"):
+            user(row["email"], row["fullname"])
+
+        messages = []
+        for row in connection.execute("SELECT fullname, contact_email, message FROM contact"):
+            user(row["contact_email"], row["fullname"])["is_contact"] = True
+            messages.append(
+                {
+                    "email": row["contact_email"].strip().lower(),
+                    "fullname": row["fullname"],
+                    "message": row["message"],
+                }
+            )
+
+        for row in connection.execute(
+            "SELECT fullname, volunteer_email, phone_number, address FROM volunteer"
+        ):
+            volunteer = user(row["volunteer_email"], row["fullname"])
+            volunteer.update(
+                is_volunteer=True, phone_number=row["phone_number"], address=row["address"]
+            )
+    finally:
+        connection.close()
+    return users, messages
+
+
+def user_update(doc: dict, now: datetime) -> UpdateOne:
+    """
+    Upserts a migrated user; a flag is only ever set, so one the live forms set since is kept.
+    """
+    unset_flags = {flag: False for flag in FLAGS if not doc[flag]}
+    fields = {field: value for field, value in doc.items() if field not in unset_flags}
+    return UpdateOne(
+        {"email": doc["email"]},
+        {
+            "$set": {**fields, "updated_at": now},
+            "$setOnInsert": {**unset_flags, "created_at": now},
+        },
+        upsert=True,
+    )
+
+
+async def migrate(db, path: str) -> tuple[int, int]:
+    users, messages = read_users(path)
+    now = datetime.now(timezone.utc)
+
+    for batch in batched(list(users.values()), settings.UPLOAD_BATCH_SIZE):
+        await db.users_collection.bulk_write(
+            [user_update(doc, now) for doc in batch],
+            ordered=False,
+        )
+
+    for batch in batched(messages, settings.UPLOAD_BATCH_SIZE):
+        await db.contact_messages_collection.bulk_write(
+            [
+                UpdateOne(message, {"$setOnInsert": {"created_at": now}}, upsert=True)
+                for message in batch
+            ],
+            ordered=False,
+        )
+    return len(users), len(messages)
+
+
+async def _main(path: str) -> int:
+    db = get_db_client()[settings.MONGO_DB_NAME]
+    users, messages = await migrate(db, path)
+    print(f"Migrated {users} users and {messages} contact messages")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
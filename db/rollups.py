@@ -0,0 +1,251 @@
+"""
+Pre-aggregated State/LGA/Month totals kept in step with every write.
+
+Usage:
+    python -m db.rollups verify    # recompute from scratch and report drift
+    python -m db.rollups rebuild   # recompute from scratch and replace the rollups
+"""
+import asyncio
+import math
+import sys
+from enum import Enum
+
+from pymongo import UpdateOne
+
+from core.config import settings
+from db.database import get_db_client
+
+
+# Keyed by the collection attribute the routes use, e.g. `db.filmshow_collection`.
+# `group` maps rollup fields onto the source document fields they come from.
+ROLLUPS = {
+    "states_collection": {
+        "source": "states",
+        "group": {"State": "State", "LGA": "Lga"},
+        "metrics": (
+            "Estimated_Christian_Population",
+            "Estimated_Muslim_Population",
+            "Estimated_Traditional_Religion_Population",
+            "Estimated_Total_Population",
+            "Converts",
+            "Film_Attendance",
+        ),
+    },
+    "filmshow_collection": {
+        "source": "filmshows",
+        "group": {"State": "State", "LGA": "LGA", "Month": "Month"},
+        "metrics": (
+            "Population",
+            "Attendance",
+            "SD_Cards",
+            "Audio_Bibles",
+            "People_Saved",
+        ),
+    },
+    "discipleship_collection": {
+        "source": "discipleships",
+        "group": {"State": "State", "LGA": "LGA", "Month": "Month"},
+        "metrics": (
+            "Population",
+            "Attendance",
+            "SD_Cards",
+            "Manuals_Given",
+            "Bibles_Given",
+        ),
+    },
+}
+
+
+def tracked_fields(collection_name: str) -> dict | None:
+    """
+    Returns the projection of fields a rollup needs, or None if the collection has none.
+    """
+    spec = ROLLUPS.get(collection_name)
+    if spec is None:
+        return None
+    return {field: 1 for field in (*spec["group"].values(), *spec["metrics"])}
+
+
+def plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _number(value) -> int | float:
+    # Blank and non-numeric cells count as zero, as `$sum` treats them
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return 0
+    if isinstance(value, float) and math.isnan(value):
+        return 0
+    return value
+
+
+def _summable(metric: str) -> dict:
+    # `$sum` would turn the whole total into NaN; count NaN as zero like `_number`.
+    # MongoDB compares NaN as equal to NaN, unlike Python.
+    return {"$cond": [{"$eq": [f"${metric}", float("nan")]}, 0, f"${metric}"]}
+
+
+def rollup_id(spec: dict, doc: dict) -> dict:
+    return {
+        "source": spec["source"],
+        **{field: plain(doc.get(source)) for field, source in spec["group"].items()},
+    }
+
+
+def rollup_deltas(spec: dict, changes: list[tuple[dict | None, dict | None]]) -> dict:
+    """
+    Folds (before, after) document pairs into `$inc` deltas per rollup key.
+
+    An insert is (None, doc), a delete is (doc, None) and an update is (old, new).
+    """
+    deltas = {}
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            key = rollup_id(spec, doc)
+            inc = deltas.setdefault(
+                tuple(key.items()), {"count": 0, **{m: 0 for m in spec["metrics"]}}
+            )
+            inc["count"] += sign
+            for metric in spec["metrics"]:
+                inc[metric] += sign * _number(doc.get(metric))
+    return deltas
+
+
+async def apply_rollups(
+    db, collection_name: str, changes: list[tuple[dict | None, dict | None]]
+) -> None:
+    """
+    Applies the rollup deltas for a set of writes with a single `bulk_write`.
+    """
+    spec = ROLLUPS.get(collection_name)
+    if spec is None or not changes:
+        return
+
+    operations = []
+    for key, inc in rollup_deltas(spec, changes).items():
+        inc = {field: value for field, value in inc.items() if value}
+        if not inc:
+            continue
+        key = dict(key)
+        operations.append(
+            UpdateOne(
+                {"_id": key},
+                {"$inc": inc, "$setOnInsert": dict(key)},
+                upsert=True,
+            )
+        )
+    if operations:
+        await db.rollups_collection.bulk_write(operations, ordered=False)
+
+
+async def track(db, collection_name: str, before: dict | None, after: dict | None):
+    """
+    Applies the rollup delta of a single insert, update or delete.
+    """
+    await apply_rollups(db, collection_name, [(before, after)])
+
+
+async def delete_rollups(db, collection_name: str, match: dict) -> None:
+    """
+    Deletes whole rollups, for a delete that removes every document they cover.
+    """
+    spec = ROLLUPS[collection_name]
+    await db.rollups_collection.delete_many({"source": spec["source"], **match})
+
+
+async def compute_rollups(db, collection_name: str) -> dict[tuple, dict]:
+    """
+    Recomputes the rollups of one collection from its documents.
+    """
+    spec = ROLLUPS[collection_name]
+    pipeline = [
+        {
+            "$group": {
+                # A missing field would be left out of the group key, where
+                # `rollup_id` stores it as None
+                "_id": {
+                    field: {"$ifNull": [f"${source}", None]}
+                    for field, source in spec["group"].items()
+                },
+                "count": {"$sum": 1},
+                **{metric: {"$sum": _summable(metric)} for metric in spec["metrics"]},
+            }
+        }
+    ]
+    rollups = {}
+    async for row in db[collection_name].aggregate(pipeline):
+        group = row.pop("_id")
+        # Same fields in the same order as `rollup_id`, so both produce one key
+        key = {"source": spec["source"], **{field: group.get(field) for field in spec["group"]}}
+        rollups[tuple(key.items())] = {**key, **row, "_id": key}
+    return rollups
+
+
+async def verify_rollups(db, collection_name: str) -> list[str]:
+    """
+    Compares the stored rollups of a collection with a fresh recomputation.
+
+    Returns:
+        list[str]: One line per rollup key whose stored totals have drifted.
+    """
+    spec = ROLLUPS[collection_name]
+    expected = await compute_rollups(db, collection_name)
+    stored = {
+        tuple(doc["_id"].items()): doc
+        async for doc in db.rollups_collection.find({"source": spec["source"]})
+    }
+
+    drift = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, {})
+        have = stored.get(key, {})
+        for field in ("count", *spec["metrics"]):
+            if want.get(field, 0) != have.get(field, 0):
+                drift.append(
+                    f"{dict(key)} {field}: stored {have.get(field, 0)}, "
+                    f"expected {want.get(field, 0)}"
+                )
+    return drift
+
+
+async def rebuild_rollups(db, collection_name: str) -> int:
+    """
+    Replaces the stored rollups of a collection with a fresh recomputation.
+
+    Returns:
+        int: The number of rollup documents written.
+    """
+    spec = ROLLUPS[collection_name]
+    rollups = list((await compute_rollups(db, collection_name)).values())
+    await db.rollups_collection.delete_many({"source": spec["source"]})
+    if rollups:
+        await db.rollups_collection.insert_many(rollups)
+    return len(rollups)
+
+
+async def _main(command: str) -> int:
+    db = get_db_client()[settings.MONGO_DB_NAME]
+
+    drifted = False
+    for collection_name in ROLLUPS:
+        if command == "rebuild":
+            written = await rebuild_rollups(db, collection_name)
+            print(f"{collection_name}: rebuilt {written} rollup(s)")
+            continue
+
+        drift = await verify_rollups(db, collection_name)
+        drifted = drifted or bool(drift)
+        for line in drift:
+            print(f"{collection_name}: {line}")
+        if not drift:
+            print(f"{collection_name}: rollups match")
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("verify", "rebuild"):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
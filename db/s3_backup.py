@@ -3,8 +3,6 @@ import os
 import shutil
 import tarfile
 from pathlib import Path
-import boto3
-from botocore.client import Config
 from core.config import settings
 import logging
 import tempfile
@@ -13,6 +11,20 @@ import platform
 
 logger = logging.getLogger(__name__)
 
+
+def s3_client(**options):
+    """
+    Creates an S3 client; boto3 is imported here so only backups pay for it.
+    """
+    import boto3
+
+    return boto3.client(
+        's3',
+        aws_access_key_id=settings.S3_ACCESS_KEY,
+        aws_secret_access_key=settings.S3_SECRET_KEY,
+        **options,
+    )
+
 def backup_sqlite_to_s3():
     # Configuration
     aws_bucket = settings.BUCKET_NAME
@@ -42,16 +54,15 @@ def backup_sqlite_to_s3():
             logger.info(f"Created archive: {archive_path}")
             
             # Upload to S3
-            s3_client = boto3.client(
-                's3',
-                 region_name="eu-north-1",
-                aws_access_key_id=settings.S3_ACCESS_KEY,
-                aws_secret_access_key=settings.S3_SECRET_KEY,
+            from botocore.client import Config
+
+            client = s3_client(
+                region_name="eu-north-1",
                 config=Config(signature_version="s3v4"),
             )
             
             s3_key = f"{aws_folder}/{today}/{archive_name}"
-            s3_client.upload_file(str(archive_path), aws_bucket, s3_key)
+            client.upload_file(str(archive_path), aws_bucket, s3_key)
             
             logger.info(f"Uploaded {archive_name} to S3 bucket {aws_bucket}")
         
@@ -66,14 +77,10 @@ def restore_from_s3():
     db_path = Path(settings.LOCAL_DATABASE_URL.replace("sqlite:///", ""))
     
     try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.S3_ACCESS_KEY,
-            aws_secret_access_key=settings.S3_SECRET_KEY
-        )
+        client = s3_client()
         
         # List objects in the bucket to find the latest backup
-        response = s3_client.list_objects_v2(Bucket=aws_bucket, Prefix=aws_folder)
+        response = client.list_objects_v2(Bucket=aws_bucket, Prefix=aws_folder)
         if 'Contents' in response:
             latest_backup = max(response['Contents'], key=lambda x: x['LastModified'])
             latest_key = latest_backup['Key']
@@ -83,7 +90,7 @@ def restore_from_s3():
             temp_dir.mkdir(exist_ok=True)
             temp_file = temp_dir / "latest_backup.tar.gz"
             
-            s3_client.download_file(aws_bucket, latest_key, str(temp_file))
+            client.download_file(aws_bucket, latest_key, str(temp_file))
             
             # Extract the backup
             with tarfile.open(temp_file, "r:gz") as tar:
@@ -105,15 +112,11 @@ def restore_from_s3():
 
 def ensure_db_exists():
     db_path = Path(settings.LOCAL_DATABASE_URL.replace("sqlite:///", ""))
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=settings.S3_ACCESS_KEY,
-        aws_secret_access_key=settings.S3_SECRET_KEY
-    )
+    client = s3_client()
     
     try:
         # Check if there are any backups in S3
-        response = s3_client.list_objects_v2(Bucket=settings.BUCKET_NAME, Prefix='database_backups')
+        response = client.list_objects_v2(Bucket=settings.BUCKET_NAME, Prefix='database_backups')
         
         if 'Contents' in response and len(response['Contents']) > 0:
             logger.info("Existing backups found in S3. Attempting to restore.")
@@ -1,5 +1,18 @@
-import cloudinary
+from contextlib import asynccontextmanager
+from core.auth import revoked_tokens
 from core.config import settings
+from core.instrumentation import ServerTimingMiddleware
+from core.ingestion import shutdown_parse_pool
+from core.images import image_index_sync, image_uploader
+from core.jobs import ingestion_jobs
+from core.metrics import instrument_routes, metrics_exporter
+from core.profiling import PROFILE_ID_HEADER, ProfilingMiddleware
+from core.pagination import NEXT_CURSOR_HEADER
+from core.ratelimit import limit_routes
+from core.writebehind import write_behind
+from core.youtube import metadata_backfill
+from db.database import close_db, connect_db
+from db.indexes import ensure_indexes
 from fastapi import FastAPI, status
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,9 +24,38 @@ from routes.discipleship import discipleship_router
 from routes.links import link_router
 from routes.blogs import blog_router
 from routes.auth import auth_router
-# from routes.users import users_router
-
-
+from routes.jobs import jobs_router
+from routes.rollups import rollups_router
+from routes.exports import exports_router
+from routes.cache import cache_router
+from routes.metrics import metrics_router
+from routes.profiles import profiles_router
+from routes.users import users_router
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = await connect_db()
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes(db)
+    await ingestion_jobs.start()
+    await write_behind.start(db)
+    await metrics_exporter.start()
+    await revoked_tokens.start(db)
+    await metadata_backfill.start(db)
+    await image_index_sync.start(db)
+    yield
+    # Let queued uploads finish before the worker goes away
+    await ingestion_jobs.stop(timeout=settings.INGEST_SHUTDOWN_TIMEOUT)
+    await write_behind.stop()
+    shutdown_parse_pool()
+    image_uploader.shutdown()
+    await metrics_exporter.stop()
+    await revoked_tokens.stop()
+    await metadata_backfill.stop()
+    await image_index_sync.stop()
+    close_db()
 
 
 app = FastAPI(
@@ -21,6 +63,7 @@ app = FastAPI(
     docs_url="/api/docs",
     description=settings.DESCRIPTION,
     version="/api/v1",
+    lifespan=lifespan,
 )
 
 # Routers
@@ -30,7 +73,15 @@ app.include_router(filmshow_router, prefix="/api/v1")
 app.include_router(discipleship_router, prefix="/api/v1")
 app.include_router(link_router, prefix="/api/v1")
 app.include_router(blog_router, prefix="/api/v1")
-# app.include_router(users_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
+app.include_router(rollups_router, prefix="/api/v1")
+app.include_router(exports_router, prefix="/api/v1")
+app.include_router(cache_router, prefix="/api/v1")
+app.include_router(profiles_router, prefix="/api/v1")
+app.include_router(users_router, prefix="/api/v1")
+app.include_router(metrics_router)
+limit_routes(app)
+instrument_routes(app)
 
 # Add CORS middleware
 app.add_middleware(
@@ -45,17 +96,13 @@ app.add_middleware(
     allow_methods=["*"],
     # allow_headers=["Content-Type", "Authorization"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_ID_HEADER],
 )
+app.add_middleware(ServerTimingMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
 
-
-cloudinary.config(
-    cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-    api_key=settings.CLOUDINARY_API_KEY,
-    api_secret=settings.CLOUDINARY_API_SECRET,
-    secure=True,
-)
-
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
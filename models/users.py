@@ -1,28 +1,33 @@
-from uuid import UUID, uuid4
-from pydantic import EmailStr
-from pydantic_extra_types.phone_numbers import PhoneNumber
-from sqlmodel import Field, SQLModel, Column, Text
-
-class User(SQLModel, table=True):
-    __tablename__ = 'users'
-    
-    id: UUID = Field(default_factory=uuid4, primary_key=True)
-    fullname: str = Field(...)
-    email: EmailStr | None = Field(sa_column=Column("email", Text, nullable=False, unique=True))
-
-class ContactUser(SQLModel, table=True):
-    __tablename__ = 'contact'
-    
-    id: UUID = Field(default_factory=uuid4, primary_key=True)
-    fullname: str = Field(...)
-    email: EmailStr = Field(sa_column=Column("contact_email", Text, nullable=False))
-    message: str = Field(default="message")
-
-class VolunteerUser(SQLModel, table=True):
-    __tablename__ = 'volunteer'
-    
-    id: UUID = Field(default_factory=uuid4, primary_key=True)
-    fullname: str = Field(...)
-    email: EmailStr = Field(sa_column=Column("volunteer_email", Text, nullable=False))
-    phone_number: PhoneNumber | None = Field(default="phone_number")
-    address: str = Field(default="address")
+from datetime import datetime, timezone
+from typing import Annotated
+
+from pydantic import BaseModel, BeforeValidator, Field
+
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+
+class User(BaseModel):
+    """
+    One person in `users_collection`, whichever forms they filled in.
+
+    `is_contact` and `is_volunteer` are set as the forms are submitted, so
+    listing a group is a single indexed query.
+    """
+
+    id: PyObjectId = Field(alias="_id")
+    email: str
+    fullname: str
+    is_contact: bool = False
+    is_volunteer: bool = False
+    phone_number: str | None = None
+    address: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class ContactMessage(BaseModel):
+    id: PyObjectId = Field(alias="_id")
+    email: str
+    fullname: str
+    message: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
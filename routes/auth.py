@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends
-from core.auth import authenticate_user, logout_user
+from core.auth import login_user, logout_user
 
 auth_router = router = APIRouter(tags=["Auth"])
 
 @router.post("/auth")
-def login(credentials: dict = Depends(authenticate_user)) -> dict:
-    return {"message": "user logged in successfully"}
+def login(token: dict = Depends(login_user)) -> dict:
+    return {"message": "user logged in successfully", **token}
 
 
 @router.post('/logout')
-def logout(username: str = Depends(logout_user)):
-    return {"message": "user logged out successfully"}
\ No newline at end of file
+async def logout(username: str = Depends(logout_user)):
+    return {"message": "user logged out successfully"}
@@ -1,34 +1,52 @@
 from datetime import datetime, timezone
+from core.cache import response_cache
+from core.etags import conditional, mark_changed
+from core.pagination import NEXT_CURSOR_HEADER, paginate
+from core.responses import MongoJSONResponse
 from db.database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from typing import Dict, Any
 from bson import ObjectId
 from fastapi.responses import JSONResponse
 
 blog_router = router = APIRouter(tags=["Blogs"])
 
+BLOG_SORT = [("date", -1), ("_id", -1)]
+
 
 @router.get("/blogs")
+@conditional("blogs", route="blogs")
+@response_cache.cached(tags=("blogs",))
 async def read_blogs(
+    request: Request,
     # visibility: str | None = Query(None),
-    skip: int = 0,
-    limit: int = 20,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
     db=Depends(get_db),
 ):
     """
     Retrieves a list of blogs from the database based on the specified criteria.
+
+    Blogs are returned newest first. Pass the `X-Next-Cursor` header of a page
+    as `cursor` to fetch the next one.
     """
     try:
-        cursor = db.blogs_collection.find({}).skip(skip).limit(limit)
-        blogs = await cursor.to_list(length=limit)
-        return blogs
+        blogs, next_page = await paginate(
+            db.blogs_collection, {}, BLOG_SORT, limit, cursor=cursor, skip=skip
+        )
+        headers = {NEXT_CURSOR_HEADER: next_page} if next_page else None
+        return MongoJSONResponse(blogs, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 # Get blog by ID
 @router.get("/blogs/{blog_id}")
-async def read_blog(blog_id: str, db=Depends(get_db)):
+@conditional("blogs", route="blog")
+async def read_blog(request: Request, blog_id: str, db=Depends(get_db)):
     """
     Retrieves a single blog entry from the database based on the specified ID.
     """
@@ -38,7 +56,7 @@ async def read_blog(blog_id: str, db=Depends(get_db)):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Blog not found"
             )
-        return blog
+        return MongoJSONResponse(blog)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -66,6 +84,7 @@ async def create_blog(
         }
 
         result = await db.blogs_collection.insert_one(blog_doc)
+        await mark_changed(db, "blogs")
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={"message": "Blog created successfully", "id": str(result.inserted_id)},
@@ -114,6 +133,7 @@ async def update_blog(
 
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="Blog update failed")
+        await mark_changed(db, "blogs")
 
         return await db.blogs_collection.find_one({"_id": blog_id})
     except Exception as e:
@@ -137,6 +157,7 @@ async def delete_blog(
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Blog not found"
             )
+        await mark_changed(db, "blogs")
 
         return {"message": "Blog deleted successfully"}
     except Exception as e:
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+
+from core.cache import response_cache
+
+cache_router = router = APIRouter(tags=["Cache"])
+
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> dict:
+    """
+    Retrieves the size of this worker's response cache and its hit/miss counters.
+    """
+    return {"status": "success", "data": response_cache.stats()}
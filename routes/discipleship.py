@@ -1,121 +1,118 @@
-import asyncio
 from fastapi import APIRouter, Depends, HTTPException
+from core.cache import response_cache
+from core.etags import mark_changed
+from core.ingestion import ingest_files
+from core.pagination import NEXT_CURSOR_HEADER, paginate
+from core.responses import MongoJSONResponse, with_defaults
+from core.jobs import JobQueueFull, ingestion_jobs
 from db.database import get_db
+from db.rollups import track
 from models.discipleship import DiscipleshipReport
 from schemas.discipleship import DiscipleshipReportCreate, DiscipleshipReportUpdate
-from typing import List
+from typing import TYPE_CHECKING, List
 from fastapi.responses import JSONResponse
 from fastapi import (
     UploadFile,
     File,
+    Query,
     status,
 )
-import os
-from pathlib import Path as FilePath
-import uuid
-import pandas as pd
-from models.states import States
 from bson import ObjectId
 
-discipleship_router = router = APIRouter(tags=["Discipleship Report"])
-
-
-UPLOAD_DIRECTORY = "./discipleshipuploads"
-
-# Ensure the upload directory exists
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
-
-
-async def save_file(file: UploadFile) -> FilePath:
-    file_path = FilePath(UPLOAD_DIRECTORY) / f"{uuid.uuid4()}.xlsx"
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-    return file_path
+if TYPE_CHECKING:
+    import pandas as pd
 
-
-async def delete_file(file_path: FilePath) -> None:
-    os.remove(file_path)
-
-
-async def read_excel_file(file_path: FilePath) -> pd.DataFrame:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, pd.read_excel, file_path)
+discipleship_router = router = APIRouter(tags=["Discipleship Report"])
 
 
-async def process_file(df: pd.DataFrame, db) -> None:
+DISCIPLESHIP_KEY_FIELDS = ("Team", "State", "Ward", "Village", "Month")
+REPORT_SORT = [("_id", 1)]
+
+# Sheet header -> document field, as `discipleship_records` reads an upload
+DISCIPLESHIP_COLUMNS = {
+    "Team": "Team",
+    "State": "State",
+    "LGA": "LGA",
+    "Ward": "Ward",
+    "Village": "Village",
+    "Population": "Population",
+    "UPG": "UPG",
+    "Attendance": "Attendance",
+    "S.D Cards": "SD_Cards",
+    "Manuals Given": "Manuals_Given",
+    "Bibles Given": "Bibles_Given",
+    "Month": "Month",
+}
+
+
+def discipleship_records(df: "pd.DataFrame | list[dict]") -> list[dict]:
+    """
+    Normalizes a discipleship sheet column by column into documents.
+    """
+    import pandas as pd
+    from core.frames import (
+        map_states,
+        nullable_int,
+        optional,
+        optional_str,
+        required_int,
+        to_records,
+        upper,
+    )
+
+    df = pd.DataFrame(df)
+    return to_records(
+        {
+            "Team": df["Team"],
+            "State": map_states(df["State"]),
+            "LGA": optional_str(df["LGA"]),
+            "Ward": df["Ward"],
+            "Village": df["Village"],
+            "Population": nullable_int(df["Population"]),
+            "UPG": optional(df["UPG"]),
+            "Attendance": required_int(df["Attendance"], "Attendance"),
+            "SD_Cards": nullable_int(df["S.D Cards"]),
+            "Manuals_Given": nullable_int(df["Manuals Given"]),
+            "Bibles_Given": nullable_int(df["Bibles Given"]),
+            "Month": upper(df["Month"]),
+        }
+    )
+
+
+async def ingest(files: List[UploadFile], db, on_batch=None) -> list[dict]:
+    """
+    Writes uploaded workbooks to the database; run by the ingestion job workers.
+    """
     try:
-        for _, record in df.iterrows():
-
-            # Handle different variations of FCT
-            state = record["State"].strip().title()
-            if state in ["Federal Capital Territory", "FCT", "Abuja"]:
-                state = States.FCT
-            else:
-                try:
-                    state = States(state)
-                except ValueError:
-                    raise ValueError(f"Invalid state: {state}")
-
-            record_data = {
-                "Team": record["Team"],
-                "State": state or record["State"],
-                "LGA": str(record["LGA"]) if pd.notna(record["LGA"]) else None,
-                "Ward": record["Ward"],
-                "Village": record["Village"],
-                "Population": (
-                    int(record["Population"])
-                    if pd.notna(record["Population"])
-                    else None
-                ),
-                "UPG": record["UPG"] if pd.notna(record["UPG"]) else None,
-                "Attendance": int(record["Attendance"]),  # This should not be null
-                "SD_Cards": (
-                    int(record["S.D Cards"]) if pd.notna(record["S.D Cards"]) else None
-                ),
-                "Manuals_Given": (
-                    int(record["Manuals Given"])
-                    if pd.notna(record["Manuals Given"])
-                    else None
-                ),
-                "Bibles_Given": (
-                    int(record["Bibles Given"])
-                    if pd.notna(record["Bibles Given"])
-                    else None
-                ),
-                "Month": record["Month"].upper(),
-            }
-
-            # Update existing record or insert new one
-            await db.discipleship_collection.update_one(
-                {
-                    "Team": record["Team"],
-                    "State": state or record["State"],
-                    "Ward": record["Ward"],
-                    "Village": record["Village"],
-                    "Month": record["Month"].upper(),
-                },
-                {"$set": record_data},
-                upsert=True,
-            )
-
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Error inserting data: {str(e)}")
+        return await ingest_files(
+            files,
+            db.discipleship_collection,
+            discipleship_records,
+            DISCIPLESHIP_KEY_FIELDS,
+            on_batch=on_batch,
+        )
+    finally:
+        await mark_changed(db, "discipleships")
 
 
-@router.post("/discipleship-upload")
+@router.post("/discipleship-upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_files(files: List[UploadFile] = File(...), db=Depends(get_db)):
 
     try:
-        for file in files:
-            file_path = await save_file(file)
-            df = await read_excel_file(file_path)
-            await process_file(df, db)
-        await delete_file(file_path)
+        job = await ingestion_jobs.submit("discipleship", files, ingest, db)
+
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "message": "File(s) uploaded and queued for processing.",
+                "job_id": job.id,
+            },
+        )
 
+    except JobQueueFull as e:
         return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={"message": "File(s) uploaded and data saved successfully."},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": str(e)},
         )
 
     except Exception as e:
@@ -136,6 +133,8 @@ async def create_discipleship_report(
     try:
         report_dict = report.model_dump()
         await db.discipleship_collection.insert_one(report_dict)
+        await track(db, "discipleship_collection", None, report_dict)
+        await mark_changed(db, "discipleships")
         return DiscipleshipReport(**report_dict)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -143,12 +142,26 @@ async def create_discipleship_report(
 
 @router.get("/discipleship-reports/", response_model=List[DiscipleshipReport])
 async def get_all_discipleship_reports(
-    skip: int = 0, limit: int = 100, db=Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    db=Depends(get_db),
 ):
     try:
-        cursor = db.discipleship_collection.find().skip(skip).limit(limit)
-        reports = await cursor.to_list(length=limit)
-        return [DiscipleshipReport(**report) for report in reports]
+        reports, next_page = await paginate(
+            db.discipleship_collection,
+            {},
+            REPORT_SORT,
+            limit,
+            cursor=cursor,
+            skip=skip,
+        )
+        headers = {NEXT_CURSOR_HEADER: next_page} if next_page else None
+        return MongoJSONResponse(
+            [with_defaults(report, DiscipleshipReport) for report in reports], headers=headers
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -167,6 +180,7 @@ async def get_discipleship_report(report_id: str, db=Depends(get_db)):
 @router.get(
     "/discipleship-report/month/{month}", response_model=List[DiscipleshipReport]
 )
+@response_cache.cached(tags=("discipleships",))
 async def get_discipleship_reports_by_month(month: str, db=Depends(get_db)):
     try:
         cursor = db.discipleship_collection.find({"Month": month.upper()})
@@ -175,7 +189,9 @@ async def get_discipleship_reports_by_month(month: str, db=Depends(get_db)):
             raise HTTPException(
                 status_code=404, detail=f"No reports found for month: {month}"
             )
-        return [DiscipleshipReport(**report) for report in reports]
+        return MongoJSONResponse(
+            [with_defaults(report, DiscipleshipReport) for report in reports]
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -189,16 +205,18 @@ async def update_discipleship_report(
     try:
         update_data = {k: v for k, v in report_update.dict(exclude_unset=True).items()}
 
-        result = await db.discipleship_collection.update_one(
+        db_report = await db.discipleship_collection.find_one_and_update(
             {"_id": ObjectId(report_id)}, {"$set": update_data}
         )
 
-        if result.matched_count == 0:
+        if not db_report:
             raise HTTPException(status_code=404, detail="Report not found")
 
         updated_report = await db.discipleship_collection.find_one(
             {"_id": ObjectId(report_id)}
         )
+        await track(db, "discipleship_collection", db_report, updated_report)
+        await mark_changed(db, "discipleships")
         return DiscipleshipReport(**updated_report)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -207,12 +225,15 @@ async def update_discipleship_report(
 @router.delete("/discipleship-report/{report_id}", response_model=dict)
 async def delete_discipleship_report(report_id: str, db=Depends(get_db)):
     try:
-        result = await db.discipleship_collection.delete_one(
+        deleted = await db.discipleship_collection.find_one_and_delete(
             {"_id": ObjectId(report_id)}
         )
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Report not found")
 
+        await track(db, "discipleship_collection", deleted, None)
+        await mark_changed(db, "discipleships")
+
         return {"message": "Report deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
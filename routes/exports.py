@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+from typing import Literal
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from core.config import settings
+from core.exports import MEDIA_TYPES, export_stream, row_batches
+from db.database import get_db_for
+from routes.discipleship import DISCIPLESHIP_COLUMNS
+from routes.filmshow import FILMSHOW_COLUMNS
+from routes.states import STATE_COLUMNS
+
+exports_router = router = APIRouter(tags=["Exports"])
+
+get_db = get_db_for("exports")
+
+
+def created_in(year: int) -> dict:
+    """
+    Matches documents inserted during `year`, by the timestamp in their ObjectId.
+    """
+    start = datetime(year, 1, 1, tzinfo=timezone.utc)
+    end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    return {
+        "_id": {"$gte": ObjectId.from_datetime(start), "$lt": ObjectId.from_datetime(end)}
+    }
+
+
+def dated_in(year: int) -> dict:
+    """
+    Matches reports whose YYYY/MM/DD `Date` falls in `year`.
+    """
+    return {"Date": {"$regex": f"^{year:04d}/"}}
+
+
+# Keyed by the `source` names the rollups use
+EXPORTS = {
+    "filmshows": {
+        "collection": "filmshow_collection",
+        "columns": FILMSHOW_COLUMNS,
+        "month": True,
+        "year": dated_in,
+    },
+    "discipleships": {
+        "collection": "discipleship_collection",
+        "columns": DISCIPLESHIP_COLUMNS,
+        "month": True,
+        "year": created_in,
+    },
+    "states": {
+        "collection": "states_collection",
+        "columns": STATE_COLUMNS,
+        "month": False,
+        "year": created_in,
+    },
+}
+
+
+def export_query(
+    spec: dict, state: str | None, month: str | None, year: int | None
+) -> dict:
+    query = {}
+    if state:
+        query["State"] = state
+    if month:
+        if not spec["month"]:
+            raise ValueError("This source cannot be filtered by month")
+        query["Month"] = month.upper()
+    if year:
+        query.update(spec["year"](year))
+    return query
+
+
+@router.get("/exports/{source}")
+async def export_data(
+    source: Literal["filmshows", "discipleships", "states"],
+    format: Literal["csv", "ndjson", "xlsx"] = "csv",
+    state: str | None = Query(None),
+    month: str | None = Query(None),
+    year: int | None = Query(None, ge=1, le=9998),
+    db=Depends(get_db),
+):
+    """
+    Streams a whole collection as CSV, NDJSON or XLSX in the upload column layout.
+
+    Rows are read from a single cursor in `_id` order and written out batch by
+    batch, so exports of any size run in bounded memory.
+    """
+    spec = EXPORTS[source]
+    try:
+        query = export_query(spec, state, month, year)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    columns = spec["columns"]
+    cursor = (
+        db[spec["collection"]]
+        .find(query, {"_id": 0, **{field: 1 for field in columns.values()}})
+        .sort("_id", 1)
+        .batch_size(settings.EXPORT_BATCH_SIZE)
+    )
+    batches = row_batches(cursor, columns, settings.EXPORT_BATCH_SIZE)
+
+    return StreamingResponse(
+        export_stream(format, batches, columns, title=source),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{source}.{format}"'
+        },
+    )
@@ -1,133 +1,130 @@
 # from datetime import datetime
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
+from core.cache import response_cache
+from core.etags import mark_changed
+from core.ingestion import ingest_files
+from core.pagination import NEXT_CURSOR_HEADER, paginate
+from core.responses import MongoJSONResponse, with_defaults
+from core.jobs import JobQueueFull, ingestion_jobs
+from core.writebehind import JOURNAL_UNAVAILABLE, write_behind
 from db.database import get_db
+from db.rollups import apply_rollups, delete_rollups, track
 from models.filmshow import FilmShowReport
 from schemas.filmshow import FilmShowReportCreate, FilmShowReportUpdate
-from typing import List
+from typing import TYPE_CHECKING, List
 from fastapi import (
     UploadFile,
     File,
+    Query,
     status,
 )
 from bson import ObjectId
-import os
-from pathlib import Path as FilePath
-import uuid
-import pandas as pd
-import asyncio
-from models.states import States
+from pymongo import UpdateOne
+from pymongo.errors import ConnectionFailure
 
 
-filmshow_router = router = APIRouter(tags=["Film Show Report"])
-
-
-UPLOAD_DIRECTORY = "./filmshowuploads"
-
-# Ensure the upload directory exists
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
-
+if TYPE_CHECKING:
+    import pandas as pd
 
-async def save_file(file: UploadFile) -> FilePath:
-    file_path = FilePath(UPLOAD_DIRECTORY) / f"{uuid.uuid4()}.xlsx"
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-    return file_path
+logger = logging.getLogger(__name__)
 
-
-async def delete_file(file_path: FilePath) -> None:
-    os.remove(file_path)
+filmshow_router = router = APIRouter(tags=["Film Show Report"])
 
 
-async def read_excel_file(file_path: FilePath) -> pd.DataFrame:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, pd.read_excel, file_path)
+FILMSHOW_KEY_FIELDS = ("Team", "State", "Ward", "Village", "Date")
+REPORT_SORT = [("_id", 1)]
+DUPLICATE_REPORT = "A film show report for this team, village and date already exists"
+
+# Sheet header -> document field, as `filmshow_records` reads an upload
+FILMSHOW_COLUMNS = {
+    "Team": "Team",
+    "State": "State",
+    "LGA": "LGA",
+    "Ward": "Ward",
+    "Village": "Village",
+    "Population": "Population",
+    "UPG": "UPG",
+    "Attendance": "Attendance",
+    "S.D Cards": "SD_Cards",
+    "Audio Bibles": "Audio_Bibles",
+    "People Saved": "People_Saved",
+    "Date": "Date",
+    "Month": "Month",
+}
+
+
+def filmshow_records(df: "pd.DataFrame | list[dict]") -> list[dict]:
+    """
+    Normalizes a film show sheet column by column into documents.
+    """
+    import pandas as pd
+    from core.frames import (
+        format_dates,
+        map_states,
+        nullable_int,
+        optional,
+        optional_str,
+        required_int,
+        to_records,
+        upper,
+    )
+
+    df = pd.DataFrame(df)
+    return to_records(
+        {
+            "Team": df["Team"],
+            "State": map_states(df["State"]),
+            "LGA": optional_str(df["LGA"]),
+            "Ward": df["Ward"],
+            "Village": df["Village"],
+            "Population": nullable_int(df["Population"]),
+            "UPG": optional(df["UPG"]),
+            "Attendance": required_int(df["Attendance"], "Attendance"),
+            "SD_Cards": nullable_int(df["S.D Cards"]),
+            "Audio_Bibles": nullable_int(df["Audio Bibles"]),
+            "People_Saved": nullable_int(df["People Saved"]),
+            "Date": format_dates(df["Date"]),
+            "Month": upper(df["Month"]),
+        }
+    )
 
 
-async def process_file(df: pd.DataFrame, db) -> None:
+async def ingest(files: List[UploadFile], db, on_batch=None) -> list[dict]:
+    """
+    Writes uploaded workbooks to the database; run by the ingestion job workers.
+    """
     try:
-        for _, record in df.iterrows():
-            # Handle different variations of FCT
-            state = record["State"].strip().title()
-            if state in ["Federal Capital Territory", "FCT", "Abuja"]:
-                state = States.FCT
-            else:
-                try:
-                    state = States(state)
-                except ValueError:
-                    raise ValueError(f"Invalid state: {state}")
-
-            date_str = record["Date"]
-
-            # Convert date object to string
-            if isinstance(date_str, pd.Timestamp):
-                date_str = date_str.strftime("%Y-%m-%d").replace("-", "/")
-                print("hello world")
-            else:
-                date_str = str(date_str).split(" ")[0].replace("-", "/")
-
-            record_data = {
-                "Team": record["Team"],
-                "State": state or record["State"],
-                "LGA": str(record["LGA"]) if pd.notna(record["LGA"]) else None,
-                "Ward": record["Ward"],
-                "Village": record["Village"],
-                "Population": (
-                    int(record["Population"])
-                    if pd.notna(record["Population"])
-                    else None
-                ),
-                "UPG": record["UPG"] if pd.notna(record["UPG"]) else None,
-                "Attendance": int(record["Attendance"]),
-                "SD_Cards": (
-                    int(record["S.D Cards"]) if pd.notna(record["S.D Cards"]) else None
-                ),
-                "Audio_Bibles": (
-                    int(record["Audio Bibles"])
-                    if pd.notna(record["Audio Bibles"])
-                    else None
-                ),
-                "People_Saved": (
-                    int(record["People Saved"])
-                    if pd.notna(record["People Saved"])
-                    else None
-                ),
-                "Date": date_str,
-                "Month": record["Month"].upper(),
-            }
-
-            # Update existing record or insert new one
-            await db.filmshow_collection.update_one(
-                {
-                    "Team": record["Team"],
-                    "State": state or record["State"],
-                    "Ward": record["Ward"],
-                    "Village": record["Village"],
-                    "Date": date_str,
-                },
-                {"$set": record_data},
-                upsert=True,
-            )
-
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Error inserting data: {str(e)}")
+        return await ingest_files(
+            files,
+            db.filmshow_collection,
+            filmshow_records,
+            FILMSHOW_KEY_FIELDS,
+            on_batch=on_batch,
+        )
+    finally:
+        await mark_changed(db, "filmshows")
 
 
-@router.post("/filmshow-upload")
+@router.post("/filmshow-upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_files(files: List[UploadFile] = File(...), db=Depends(get_db)):
 
     try:
-        for file in files:
-            file_path = await save_file(file)
-            df = await read_excel_file(file_path)
-            await process_file(df, db)
+        job = await ingestion_jobs.submit("filmshow", files, ingest, db)
 
-        await delete_file(file_path)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "message": "File(s) uploaded and queued for processing.",
+                "job_id": job.id,
+            },
+        )
 
+    except JobQueueFull as e:
         return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={"message": "File(s) uploaded and data saved successfully."},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": str(e)},
         )
 
     except Exception as e:
@@ -138,45 +135,142 @@ async def upload_files(files: List[UploadFile] = File(...), db=Depends(get_db)):
         )
 
 
+# Natural keys of manually posted reports journaled by this worker but not written
+# yet. Only this worker's journal is covered: the same report posted to two workers
+# before either flushes gets two 201s, and the later insert is dropped with a warning.
+pending_report_keys: set[tuple] = set()
+
+
+def report_key(report: dict) -> tuple:
+    return tuple(report[field] for field in FILMSHOW_KEY_FIELDS)
+
+
+async def write_reports(db, reports: list[dict]) -> None:
+    """
+    Inserts a batch of manually posted reports whose natural key is still free.
+
+    Each report is upserted on its natural key with `$setOnInsert` only, so an
+    existing report is never overwritten and writing the same batch again is
+    a no-op. Only the reports actually inserted count towards the rollups.
+    """
+    first: dict[tuple, dict] = {}
+    for report in reports:
+        first.setdefault(report_key(report), report)
+    batch = list(first.values())
+    try:
+        result = await db.filmshow_collection.bulk_write(
+            [
+                UpdateOne(
+                    {field: report[field] for field in FILMSHOW_KEY_FIELDS},
+                    {"$setOnInsert": report},
+                    upsert=True,
+                )
+                for report in batch
+            ],
+            ordered=False,
+        )
+    except ConnectionFailure:
+        # The segment is retried, so its reports still hold their keys
+        raise
+    except Exception:
+        # The segment is set aside as .failed; the reports can be posted again
+        pending_report_keys.difference_update(first)
+        raise
+    pending_report_keys.difference_update(first)
+
+    inserted = [batch[index] for index in result.upserted_ids]
+    # Either replayed, or a report with the same key was uploaded after the route checked
+    skipped = len(reports) - len(inserted)
+    if skipped:
+        logger.warning(
+            f"{skipped} film show report(s) matched an existing report and were not written"
+        )
+    await apply_rollups(db, "filmshow_collection", [(None, report) for report in inserted])
+    await mark_changed(db, "filmshows")
+
+
+write_behind.register("filmshow", write_reports)
+
+
 # API for posting data manually
 @router.post("/film-show-report/", status_code=201, response_model=FilmShowReport)
 async def create_film_show_report(report: FilmShowReportCreate, db=Depends(get_db)):
-    """Create a new film show report manually."""
+    """
+    Create a new film show report manually.
+
+    The report is acknowledged once it is journaled and written to the
+    database with the next write-behind batch. A report whose natural key
+    already exists, or is waiting in this worker's journal, is rejected.
+    """
+    report_dict = report.model_dump(mode="json")
+    key = report_key(report_dict)
+    if key in pending_report_keys:
+        raise HTTPException(status_code=400, detail=DUPLICATE_REPORT)
+    # Reserved before the first await, so concurrent posts of one report cannot both pass
+    pending_report_keys.add(key)
     try:
-        report_dict = report.model_dump()
-        # report_dict["_id"] = str(ObjectId())
-        await db.filmshow_collection.insert_one(report_dict)
+        existing = await db.filmshow_collection.find_one(
+            dict(zip(FILMSHOW_KEY_FIELDS, key)), {"_id": 1}
+        )
+        if existing is not None:
+            raise HTTPException(status_code=400, detail=DUPLICATE_REPORT)
+        report_dict["_id"] = ObjectId()
+        await write_behind.enqueue(db, "filmshow", report_dict)
         return FilmShowReport(**report_dict)
+    except HTTPException:
+        pending_report_keys.discard(key)
+        raise
+    except OSError:
+        pending_report_keys.discard(key)
+        raise HTTPException(status_code=503, detail=JOURNAL_UNAVAILABLE)
     except Exception as e:
+        pending_report_keys.discard(key)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/film-show-reports/", response_model=List[FilmShowReport])
 async def get_all_film_show_reports(
-    skip: int = 0, limit: int = 100, db=Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    db=Depends(get_db),
 ):
-    """Fetch all film show reports."""
+    """Fetch all film show reports, by `skip` or by the `cursor` of the previous page."""
     try:
-        cursor = db.filmshow_collection.find().skip(skip).limit(limit)
-        reports = await cursor.to_list(length=limit)
-        return [FilmShowReport(**report) for report in reports]
+        reports, next_page = await paginate(
+            db.filmshow_collection,
+            {},
+            REPORT_SORT,
+            limit,
+            cursor=cursor,
+            skip=skip,
+        )
+        headers = {NEXT_CURSOR_HEADER: next_page} if next_page else None
+        return MongoJSONResponse(
+            [with_defaults(report, FilmShowReport) for report in reports], headers=headers
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 # API for fetching all data in a particular month
 @router.get("/film-show-reports/{month}", response_model=List[FilmShowReport])
+@response_cache.cached(tags=("filmshows",))
 async def get_film_show_reports_by_month(month: str, db=Depends(get_db)):
     """Fetch all film show reports for a particular month."""
     month = month.upper()
     try:
-        cursor = db.filmshows.find({"Month": month})
+        cursor = db.filmshow_collection.find({"Month": month})
         reports = await cursor.to_list(length=None)
         if not reports:
             raise HTTPException(
                 status_code=404, detail=f"No reports found for month: {month}"
             )
-        return [FilmShowReport(**report) for report in reports]
+        return MongoJSONResponse(
+            [with_defaults(report, FilmShowReport) for report in reports]
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -217,6 +311,8 @@ async def update_film_show_report(
         updated_report = await db.filmshow_collection.find_one(
             {"_id": ObjectId(report_id)}
         )
+        await track(db, "filmshow_collection", db_report, updated_report)
+        await mark_changed(db, "filmshows")
 
         return FilmShowReport(**updated_report)
     except Exception as e:
@@ -228,10 +324,15 @@ async def update_film_show_report(
 async def delete_film_show_report(report_id: str, db=Depends(get_db)):
     """Delete a film show report."""
     try:
-        result = await db.filmshow_collection.delete_one({"_id": ObjectId(report_id)})
+        deleted = await db.filmshow_collection.find_one_and_delete(
+            {"_id": ObjectId(report_id)}
+        )
         
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Report not found")
+
+        await track(db, "filmshow_collection", deleted, None)
+        await mark_changed(db, "filmshows")
             
         return {"message": "Report deleted successfully"}
     except Exception as e:
@@ -251,11 +352,13 @@ async def delete_film_show_reports_by_month(month: str, db=Depends(get_db)):
             raise HTTPException(status_code=404, detail=f"No reports found for month: {month}")
         
         result = await db.filmshow_collection.delete_many({"Month": month})
+        # Month is part of the rollup key, so the month's rollups go with it
+        await delete_rollups(db, "filmshow_collection", {"Month": month})
+        await mark_changed(db, "filmshows")
         
         return {
             "message": f"All reports for month {month} deleted successfully",
             "count": result.deleted_count
         }
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
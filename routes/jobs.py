@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from db.database import get_db
+
+jobs_router = router = APIRouter(tags=["Ingestion Jobs"])
+
+
+def _job_out(job: dict) -> dict:
+    job["id"] = job.pop("_id")
+    return job
+
+
+@router.get("/jobs")
+async def list_jobs(
+    kind: str | None = None,
+    status: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_db),
+) -> dict:
+    """
+    Retrieves the most recent ingestion jobs, optionally filtered by kind and status.
+    """
+    try:
+        query = {}
+        if kind:
+            query["kind"] = kind
+        if status:
+            query["status"] = status
+
+        cursor = (
+            db.jobs_collection.find(query, {"results": 0})
+            .sort("created_at", -1)
+            .limit(limit)
+        )
+        jobs = await cursor.to_list(length=limit)
+        return {"status": "success", "data": [_job_out(job) for job in jobs]}
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, db=Depends(get_db)) -> dict:
+    """
+    Retrieves the progress, row counts, errors and timing of an ingestion job.
+    """
+    job = await db.jobs_collection.find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {"status": "success", "data": _job_out(job)}
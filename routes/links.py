@@ -1,27 +1,40 @@
+import logging
 from datetime import datetime
 from fastapi.responses import JSONResponse
 from pydantic import HttpUrl
-from pytube import YouTube, exceptions as pytube_exceptions
 from core.auth import authenticate_user
+from core.cache import response_cache
+from core.etags import conditional, mark_changed
+from core.pagination import NEXT_CURSOR_HEADER, paginate
+from core.responses import ExtendedJSONResponse
+from core.youtube import MetadataUnavailable, VideoNotFound, video_id, video_metadata
 from db.database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from bson import ObjectId
-from bson import json_util
-import json
 
 link_router = router = APIRouter(tags=["Links"])
 
+logger = logging.getLogger(__name__)
+
+LINK_SORT = [("_id", 1)]
+
 
 @router.get("/links")
+@conditional("links", route="links")
+@response_cache.cached(tags=("links",))
 async def read_links(
+    request: Request,
     media_type: str | None = Query(None),
-    skip: int = 0,
-    limit: int = 20,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
     db=Depends(get_db),
 ):
     """
     Retrieves a list of links from the database based on the specified criteria.
 
+    Pass the `X-Next-Cursor` header of a page as `cursor` to fetch the next one.
+
     Returns:
         list[Link]: A list of Link objects that match the specified criteria.
     """
@@ -30,14 +43,17 @@ async def read_links(
         if media_type:
             query["media_type"] = media_type
 
-        cursor = db.links_collection.find(query).skip(skip).limit(limit)
-        links = await cursor.to_list(length=limit)
-         # Convert MongoDB documents to JSON-serializable format
-        links_json = json.loads(json_util.dumps(links))
-        return links_json
+        links, next_page = await paginate(
+            db.links_collection, query, LINK_SORT, limit, cursor=cursor, skip=skip
+        )
+        headers = {NEXT_CURSOR_HEADER: next_page} if next_page else None
+        # Same wire format as bson.json_util.dumps, encoded in one pass
+        return ExtendedJSONResponse(links, headers=headers)
         
 
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -69,16 +85,26 @@ async def create_link(
         if url_str.startswith("https://youtu.be") or url_str.startswith(
             "https://www.youtube.com"
         ):
+            youtube_id = video_id(url_str)
+            if youtube_id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid YouTube URL"
+                )
+            media_type = "youtube"
             try:
-                video = YouTube(url_str)
-                media_type = "youtube"
-                title = video.title
-                description = video.description
-            except pytube_exceptions.PytubeError as e:
+                metadata = await video_metadata.get(db, youtube_id)
+                title = metadata["title"]
+                description = metadata["description"]
+            except VideoNotFound as e:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error accessing YouTube video details: {str(e)}",
                 )
+            except MetadataUnavailable as e:
+                # Saved without a title; the backfill fills it in once YouTube answers
+                logger.warning(str(e))
+                title = None
+                description = None
         elif url_str.startswith("https://spotifyanchor-web.app"):
             media_type = "spotify"
             title = None
@@ -99,6 +125,7 @@ async def create_link(
         }
 
         await db.links_collection.insert_one(link_doc)
+        await mark_changed(db, "links")
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={"message": "link data updated successfully."}
@@ -162,6 +189,7 @@ async def update_link(
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Link not found"
             )
+        await mark_changed(db, "links")
 
         return await db.links_collection.find_one({"_id": link_id})
     except Exception as e:
@@ -184,6 +212,7 @@ async def delete_link(
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Link not found"
             )
+        await mark_changed(db, "links")
 
         return {"link_id": link_id, "message": "Link deleted successfully"}
     except Exception as e:
@@ -0,0 +1,20 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics import metrics_exporter, render
+
+metrics_router = router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Exposes the metrics of every worker in the Prometheus text format.
+    """
+    loop = asyncio.get_running_loop()
+    snapshots = await loop.run_in_executor(None, metrics_exporter.read_all)
+    return PlainTextResponse(
+        render(snapshots), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,30 @@
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from core.auth import authenticate_user
+from core.profiling import profile_path
+
+profiles_router = router = APIRouter(tags=["Profiles"])
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, username: str = Depends(authenticate_user)):
+    """
+    Downloads a request or ingestion job profile in speedscope format.
+
+    Open it at https://www.speedscope.app.
+    """
+    try:
+        path = profile_path(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return FileResponse(
+        path,
+        media_type="application/json",
+        filename=f"{profile_id}.speedscope.json",
+    )
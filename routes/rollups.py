@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from db.database import get_db_for
+
+rollups_router = router = APIRouter(tags=["Rollups"])
+
+get_db = get_db_for("rollups")
+
+
+@router.get("/rollups")
+async def get_rollups(
+    source: str = Query(..., description="states, filmshows or discipleships"),
+    state: str | None = Query(None),
+    lga: str | None = Query(None),
+    month: str | None = Query(None),
+    db=Depends(get_db),
+) -> dict:
+    """
+    Retrieves the pre-aggregated totals per State, LGA and Month for a source collection.
+
+    Returns:
+        dict: A dictionary containing one totals document per State/LGA(/Month).
+    """
+    try:
+        query = {"source": source}
+        if state:
+            query["State"] = state
+        if lga:
+            query["LGA"] = lga
+        if month:
+            query["Month"] = month.upper()
+
+        cursor = db.rollups_collection.find(query, {"_id": 0}).sort(
+            [("State", 1), ("LGA", 1), ("Month", 1)]
+        )
+        rollups = await cursor.to_list(length=None)
+        return {"status": "success", "data": rollups}
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
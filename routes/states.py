@@ -1,11 +1,7 @@
 # routes/states.py
-import os
-import uuid
-import asyncio
-import pandas as pd
-from typing import List
+import time
+from typing import TYPE_CHECKING, List
 from bson import ObjectId
-from pathlib import Path as FilePath
 from schemas.states import StateDataInput, StateDataMultiUpdate
 from fastapi.responses import JSONResponse
 from fastapi import (
@@ -18,93 +14,162 @@ from fastapi import (
     status,
     Query,
     Depends,
+    Request,
 )
 
 
 # from core.auth import authenticate_user, logout_user
+from core.cache import response_cache
+from core.etags import collection_version, conditional, mark_changed
+from core.config import settings
+from core.ingestion import ingest_files
+from core.jobs import JobQueueFull, ingestion_jobs
+from core.responses import MongoJSONResponse
+from core.pagination import (
+    NEXT_CURSOR_HEADER,
+    keyset_filter,
+    next_cursor,
+    with_cursor,
+)
 from db.database import get_db
+from db.rollups import track
 from models.states import States
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 states_router = router = APIRouter(tags=["States"])
 
-UPLOAD_DIRECTORY = "./uploads"
+STATE_KEY_FIELDS = ("State", "Village")
+STATE_SORT = [("_id", 1)]
+
+# Sheet header -> document field, as `state_record` reads an upload
+STATE_COLUMNS = {
+    "State": "State",
+    "Village": "Village",
+    "L.G.A": "Lga",
+    "Ward": "Ward",
+    "Esti Christians population": "Estimated_Christian_Population",
+    "Esti Muslims": "Estimated_Muslim_Population",
+    "Esti Traditional People": "Estimated_Traditional_Religion_Population",
+    "Converts": "Converts",
+    "Esti population of the village": "Estimated_Total_Population",
+    "Film Attendance": "Film_Attendance",
+    "People Group": "People_Group",
+    "Practiced Religion": "Practiced_Religion",
+}
+
+TOTALS_STAGE = {
+    "$group": {
+        "_id": None,
+        "total_estimated_christian_population": {
+            "$sum": "$Estimated_Christian_Population"
+        },
+        "total_estimated_muslim_population": {
+            "$sum": "$Estimated_Muslim_Population"
+        },
+        "total_estimated_traditional_religion_population": {
+            "$sum": "$Estimated_Traditional_Religion_Population"
+        },
+        "total_converts": {"$sum": "$Converts"},
+        "total_estimated_total_population": {
+            "$sum": "$Estimated_Total_Population"
+        },
+        "total_film_attendance": {"$sum": "$Film_Attendance"},
+    }
+}
 
-# Ensure the upload directory exists
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+# /states_data totals per (`state` filter, states version), as (expires_at, totals).
+# Keyed by the version `mark_changed` bumps, so a write made through any worker
+# retires every worker's totals, and totals computed before a write can only be
+# stored under the version they were read at.
+_totals_cache: dict[tuple[str | None, int], tuple[float, dict]] = {}
 
 
-async def save_file(file: UploadFile) -> FilePath:
-    file_path = FilePath(UPLOAD_DIRECTORY) / f"{uuid.uuid4()}.xlsx"
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-    return file_path
+def cached_totals(state: str | None, version: int) -> dict | None:
+    entry = _totals_cache.get((state, version))
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
 
 
-async def delete_file(file_path: FilePath) -> None:
-    os.remove(file_path)
+def cache_totals(state: str | None, version: int, totals: dict) -> None:
+    for key in [key for key in _totals_cache if key[1] < version]:
+        del _totals_cache[key]
+    _totals_cache[(state, version)] = (time.monotonic() + settings.STATES_TOTALS_TTL, totals)
 
 
-async def read_excel_file(file_path: FilePath) -> pd.DataFrame:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, pd.read_excel, file_path)
+def invalidate_totals() -> None:
+    """
+    Drops cached totals; called after every write to the states collection.
+    """
+    _totals_cache.clear()
 
 
-async def process_file(df: pd.DataFrame, db) -> None:
+def state_record(record: dict) -> dict:
+    """
+    Maps a spreadsheet row onto a states document.
+    """
+    return {
+        "State": record["State"].capitalize(),
+        "Village": record["Village"],
+        "Lga": record["L.G.A"],
+        "Ward": record["Ward"],
+        "Estimated_Christian_Population": record["Esti Christians population"],
+        "Estimated_Muslim_Population": record["Esti Muslims"],
+        "Estimated_Traditional_Religion_Population": record[
+            "Esti Traditional People"
+        ],
+        "Converts": record["Converts"],
+        "Estimated_Total_Population": record["Esti population of the village"],
+        "Film_Attendance": record["Film Attendance"],
+        "People_Group": record["People Group"],
+        "Practiced_Religion": record["Practiced Religion"],
+    }
 
-    data_to_insert = df.to_dict(orient="records")
 
-    try:
-        for record in data_to_insert:
-            state = record["State"].capitalize()
-            village = record["Village"]
+def state_records(rows: "pd.DataFrame | list[dict]") -> list[dict]:
+    if not isinstance(rows, list):
+        rows = rows.to_dict(orient="records")
+    return [state_record(row) for row in rows]
 
-            existing_record = await db.states_collection.find_one(
-                {"State": state, "Village": village}
-            )
-
-            record_data = {
-                "Lga": record["L.G.A"],
-                "Ward": record["Ward"],
-                "Estimated_Christian_Population": record["Esti Christians population"],
-                "Estimated_Muslim_Population": record["Esti Muslims"],
-                "Estimated_Traditional_Religion_Population": record[
-                    "Esti Traditional People"
-                ],
-                "Converts": record["Converts"],
-                "Estimated_Total_Population": record["Esti population of the village"],
-                "Film_Attendance": record["Film Attendance"],
-                "People_Group": record["People Group"],
-                "Practiced_Religion": record["Practiced Religion"],
-            }
-
-            if existing_record:
-                await db.states_collection.update_one(
-                    {"_id": existing_record["_id"]}, {"$set": record_data}
-                )
-            else:
-                await db.states_collection.insert_one(
-                    {"State": state, "Village": village, **record_data}
-                )
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error inserting data: {str(e)}")
+async def ingest(files: List[UploadFile], db, on_batch=None) -> list[dict]:
+    """
+    Writes uploaded workbooks to the database; run by the ingestion job workers.
+    """
+    try:
+        return await ingest_files(
+            files,
+            db.states_collection,
+            state_records,
+            STATE_KEY_FIELDS,
+            on_batch=on_batch,
+        )
+    finally:
+        invalidate_totals()
+        await mark_changed(db, "states")
 
 
-@router.post("/upload")
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_files(files: List[UploadFile] = File(...), db=Depends(get_db)):
 
     try:
-        for file in files:
-            file_path = await save_file(file)
-            df = await read_excel_file(file_path)
-            await process_file(df, db)
-        
-        await delete_file(file_path)
+        job = await ingestion_jobs.submit("states", files, ingest, db)
 
         return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={"message": "File(s) uploaded and data saved successfully."},
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "message": "File(s) uploaded and queued for processing.",
+                "job_id": job.id,
+            },
+        )
+
+    except JobQueueFull as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": str(e)},
         )
 
     except Exception as e:
@@ -137,6 +202,9 @@ async def manual_input(
 
     try:
         await db.states_collection.insert_one(data)
+        await track(db, "states_collection", None, data)
+        invalidate_totals()
+        await mark_changed(db, "states")
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={"message": "Data saved successfully."},
@@ -150,71 +218,70 @@ async def manual_input(
 
 
 @router.get("/states_data")
+@conditional("states", route="states_data")
+@response_cache.cached(tags=("states",))
 async def states_list(
+    request: Request,
     state: str | None = Query(None),
-    skip: int = 0,
-    limit: int = 5,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(5, ge=1, le=100),
+    cursor: str | None = None,
     db=Depends(get_db),
 ) -> dict:
     """
     Retrieves a list of State from the database based on the specified criteria.
 
+    Pass the `next_cursor` of a page as `cursor` to fetch the next one.
+
     Returns:
         dict: A dictionary containing the list of State objects and their aggregate data.
     """
     try:
-        pipeline = []
         match_stage = {}
 
         if state:
             match_stage["State"] = state
-            pipeline.append({"$match": match_stage})
-
-        # Get paginated data
-        data_pipeline = pipeline.copy()
-        data_pipeline.extend([{"$skip": skip}, {"$limit": limit}])
-
-        cursor = db.states_collection.aggregate(data_pipeline)
-        data = await cursor.to_list(length=None)
-
-        # Get totals
-        totals_pipeline = []
-        if state:
-            totals_pipeline.append({"$match": {"State": state}})
 
-        totals_pipeline.append(
-            {
-                "$group": {
-                    "_id": None,
-                    "total_estimated_christian_population": {
-                        "$sum": "$Estimated_Christian_Population"
-                    },
-                    "total_estimated_muslim_population": {
-                        "$sum": "$Estimated_Muslim_Population"
-                    },
-                    "total_estimated_traditional_religion_population": {
-                        "$sum": "$Estimated_Traditional_Religion_Population"
-                    },
-                    "total_converts": {"$sum": "$Converts"},
-                    "total_estimated_total_population": {
-                        "$sum": "$Estimated_Total_Population"
-                    },
-                    "total_film_attendance": {"$sum": "$Film_Attendance"},
-                }
-            }
-        )
-        totals_cursor = db.states_collection.aggregate(totals_pipeline)
-        totals_list = await totals_cursor.to_list(length=None)
-        totals = totals_list[0] if totals_list else {}
+        page_stages = [
+            {"$match": keyset_filter(STATE_SORT, cursor)},
+            {"$sort": dict(STATE_SORT)},
+            {"$skip": skip},
+            {"$limit": limit + 1},
+        ]
+
+        version = await collection_version(db, "states")
+        totals = cached_totals(state, version)
+        if totals is None:
+            # One pass over the matched documents yields the page and the totals
+            pipeline = [
+                {"$match": match_stage},
+                {"$facet": {"data": page_stages, "totals": [TOTALS_STAGE]}},
+            ]
+            result = await db.states_collection.aggregate(pipeline).to_list(length=1)
+            data = result[0]["data"]
+            totals = result[0]["totals"][0] if result[0]["totals"] else {}
+            totals.pop("_id", None)
+            cache_totals(state, version, totals)
+        else:
+            page_stages[0] = {"$match": with_cursor(match_stage, STATE_SORT, cursor)}
+            data_cursor = db.states_collection.aggregate(page_stages)
+            data = await data_cursor.to_list(length=None)
 
-        if "_id" in totals:
-            del totals["_id"]
+        next_page = next_cursor(data, STATE_SORT, limit)
 
         # Convert str to string in response
         for item in data:
             item["id"] = str(item.pop("_id"))
 
-        return {"status": "success", "data": data, "totals": totals}
+        return MongoJSONResponse(
+            {
+                "status": "success",
+                "data": data,
+                "totals": totals,
+                "next_cursor": next_page,
+            },
+            headers={NEXT_CURSOR_HEADER: next_page} if next_page else None,
+        )
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -246,7 +313,9 @@ async def get_state_data(state_id: str, db = Depends(get_db)) -> dict:
 
 
 @router.get("/states")
-async def get_states(db = Depends(get_db)) -> dict:
+@conditional("states", route="states")
+@response_cache.cached(tags=("states",))
+async def get_states(request: Request, db = Depends(get_db)) -> dict:
     """
     Retrieves all States from the database.
 
@@ -289,6 +358,9 @@ async def edit_state_data(
             {"_id": ObjectId(state_id)},
             {"$set": updates}
         )
+        await track(db, "states_collection", state, {**state, **updates})
+        invalidate_totals()
+        await mark_changed(db, "states")
 
         if result.modified_count > 0:
             return JSONResponse(
@@ -314,10 +386,16 @@ async def delete_state_data(
     db = Depends(get_db),
 ):
     try:
-        result = await db.states_collection.delete_one({"_id": ObjectId(state_id)})
-        if result.deleted_count == 0:
+        deleted = await db.states_collection.find_one_and_delete(
+            {"_id": ObjectId(state_id)}
+        )
+        if not deleted:
             raise HTTPException(status_code=404, detail="State data not found")
 
+        await track(db, "states_collection", deleted, None)
+        invalidate_totals()
+        await mark_changed(db, "states")
+
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={"message": "State data deleted successfully."}
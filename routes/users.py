@@ -1,134 +1,230 @@
 #routes/users.py
-from sqlmodel import Session
-import cloudinary.uploader
-import cloudinary.api
-from db.database import get_db, get_or_create_entity
-from models.users import VolunteerUser, ContactUser, User
-from core.auth import authenticate_user, logout_user
-from fastapi import APIRouter, Depends, Form, File, HTTPException, UploadFile, Query
+from datetime import datetime, timezone
+from typing import Literal
+from bson import ObjectId
+from pymongo import UpdateOne
+from db.database import get_db
+from core.auth import authenticate_user
+from core.config import settings
+from core.images import image_uploader, index_image
+from core.pagination import NEXT_CURSOR_HEADER, paginate
+from core.responses import MongoJSONResponse
+from core.writebehind import JOURNAL_UNAVAILABLE, write_behind
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Query
 
 users_router = router = APIRouter(tags=["Users"])
 
+IMAGE_SORT = [("created_at", -1), ("_id", -1)]
+USER_SORT = [("_id", 1)]
+
+# `group` filter -> membership flags; each is answered by the `groups` index
+GROUP_QUERIES = {
+    "contact": {"is_contact": True, "is_volunteer": False},
+    "volunteer": {"is_contact": False, "is_volunteer": True},
+    "both": {"is_contact": True, "is_volunteer": True},
+}
+# Unfiltered /users lists members of any group; migrated users may be in neither.
+# Each branch is an equality on both flags, so the index merges them in _id order.
+MEMBER_QUERY = {"$or": list(GROUP_QUERIES.values())}
+
+
+def group_label(user: dict) -> str | None:
+    if user.get("is_contact") and user.get("is_volunteer"):
+        return "contact | volunteer"
+    if user.get("is_contact"):
+        return "contact"
+    if user.get("is_volunteer"):
+        return "volunteer"
+    return None
+
+
+def user_upsert(email: str, fullname: str, fields: dict, now: datetime) -> UpdateOne:
+    """
+    Creates or updates the user with `email`, setting `fields` (e.g. a membership flag).
+    """
+    on_insert = {"fullname": fullname, "created_at": now}
+    for flag in ("is_contact", "is_volunteer"):
+        if flag not in fields:
+            on_insert[flag] = False
+    return UpdateOne(
+        {"email": email},
+        {"$set": {**fields, "updated_at": now}, "$setOnInsert": on_insert},
+        upsert=True,
+    )
+
+
+async def write_contacts(db, contacts: list[dict]) -> None:
+    """
+    Writes a batch of contact form submissions; writing it again changes nothing.
+
+    A sender who wrote several times is upserted once, and a message sent
+    twice in a row (a double click) is stored once.
+    """
+    now = datetime.now(timezone.utc)
+    senders = {contact["email"]: contact["fullname"] for contact in contacts}
+    await db.users_collection.bulk_write(
+        [
+            user_upsert(email, fullname, {"is_contact": True}, now)
+            for email, fullname in senders.items()
+        ],
+        ordered=False,
+    )
+
+    messages = {}
+    for contact in contacts:
+        message = {field: value for field, value in contact.items() if field != "_id"}
+        messages.setdefault((contact["email"], contact["message"]), (contact["_id"], message))
+    # Keyed by the _id given at submission, so a replayed batch inserts nothing twice
+    await db.contact_messages_collection.bulk_write(
+        [
+            UpdateOne({"_id": message_id}, {"$setOnInsert": message}, upsert=True)
+            for message_id, message in messages.values()
+        ],
+        ordered=False,
+    )
+
+
+async def write_volunteers(db, volunteers: list[dict]) -> None:
+    """
+    Writes a batch of volunteer sign-ups; the latest details per email win.
+    """
+    now = datetime.now(timezone.utc)
+    latest = {volunteer["email"]: volunteer for volunteer in volunteers}
+    await db.users_collection.bulk_write(
+        [
+            user_upsert(
+                email,
+                volunteer["fullname"],
+                {
+                    "is_volunteer": True,
+                    "phone_number": volunteer["phone_number"],
+                    "address": volunteer["address"],
+                },
+                now,
+            )
+            for email, volunteer in latest.items()
+        ],
+        ordered=False,
+    )
+
+
+write_behind.register("contact", write_contacts)
+write_behind.register("volunteer", write_volunteers)
+
+
 @router.post('/users/contact')
-def create_contact(
-    fullname: str, 
-    email: str , 
-    message: str , 
-    db: Session = Depends(get_db)) -> dict:
-    
+async def create_contact(
+    fullname: str,
+    email: str,
+    message: str,
+    db=Depends(get_db)) -> dict:
+
     """
-    Creates a new contact message in the database.
+    Records a contact message and marks its sender as a contact.
+
+    The submission is acknowledged once it is journaled; it reaches the
+    database with the next write-behind batch.
 
     Returns:
-        Contact: The created contact object.
+        dict: A confirmation message.
     """
-    # existing_user = db.query(User).filter(User.email == email).first()
-    
-    # if not existing_user:
-    #     save_user = get_or_create_entity(
-    #         db, 
-    #         User, 
-    #         fullname=fullname, 
-    #         email=email
-    #     )
-    
-    contact = get_or_create_entity(
-        db, 
-        ContactUser, 
-        fullname=fullname, 
-        email=email, 
-        message=message
-    )
-    
-    print("contact created", contact)
-    
+    contact = {
+        "_id": ObjectId(),
+        "email": email.strip().lower(),
+        "fullname": fullname,
+        "message": message,
+        "created_at": datetime.now(timezone.utc),
+    }
+    try:
+        await write_behind.enqueue(db, "contact", contact)
+    except OSError:
+        raise HTTPException(status_code=503, detail=JOURNAL_UNAVAILABLE)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     return {'msg': "Contact User created"}
 
 @router.post('/users/volunteer')
-def user_volunteer(fullname: str, email: str , phone_number: str, address: str, db: Session = Depends(get_db)) -> dict:
-    
-    existing_user = db.query(User).filter(User.email == email).first()
-    
-    if not existing_user:
-        save_user = get_or_create_entity(
-            db, 
-            User, 
-            fullname=fullname, 
-            email=email
-        )
-        
-    volunteer = get_or_create_entity(
-        db, 
-        VolunteerUser, 
-        fullname=fullname, 
-        email=email, 
-        phone_number=phone_number, 
-        address=address
-        )
-    
+async def user_volunteer(fullname: str, email: str, phone_number: str, address: str, db=Depends(get_db)) -> dict:
+    volunteer = {
+        "email": email.strip().lower(),
+        "fullname": fullname,
+        "phone_number": phone_number,
+        "address": address,
+    }
+    try:
+        await write_behind.enqueue(db, "volunteer", volunteer)
+    except OSError:
+        raise HTTPException(status_code=503, detail=JOURNAL_UNAVAILABLE)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     return {'msg': "Volunteer User created"}
 
 @router.get('/users')
-def get_users(
-    db: Session = Depends(get_db),
-    skip: int = 0, 
-    limit: int = 20,
-    group: str | None = Query(None, description="Filter by group: contact, volunteer or both")
-) -> list[dict]:
+async def get_users(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    group: Literal["contact", "volunteer", "both"] | None = Query(None, description="Filter by group: contact, volunteer or both"),
+    username: str = Depends(authenticate_user),
+    db=Depends(get_db),
+):
     """
-    Retrieves a list of users from the database, comparing with contact and volunteer users, and returns the results with the specified format.
+    Retrieves a page of users with the group they belong to.
+
+    Pass the `X-Next-Cursor` header of a page as `cursor` to fetch the next one.
 
     Parameters:
-        db (Session, optional): The database session. Defaults to the result of the `get_db` dependency.
         skip (int): The number of records to skip in the query.
         limit (int): The maximum number of records to return.
         group (str, optional): Filter by group: contact, volunteer or both.
 
     Returns:
-        list[dict]: A list of user objects that match the specified criteria with group information.
+        list[dict]: The users' email, full name and group.
     """
-    
-    # Query to get all users from the User model
-    user_query = db.query(User).offset(skip).limit(limit).all()
-
-    # Query to get all contact users
-    contact_query = db.query(ContactUser).all()
-    contact_emails = {user.email for user in contact_query}
-
-    # Query to get all volunteer users
-    volunteer_query = db.query(VolunteerUser).all()
-    volunteer_emails = {user.email for user in volunteer_query}
-
-    # Prepare the results
-    results = []
-
-    for user in user_query:
-        email = user.email
-        fullname = user.fullname
-        if email in contact_emails and email in volunteer_emails:
-            if not group or group == 'both':
-                results.append({'email': email, 'fullname': fullname, 'group': 'contact | volunteer'})
-        elif email in contact_emails:
-            if not group or group == 'contact':
-                results.append({'email': email, 'fullname': fullname, 'group': 'contact'})
-        elif email in volunteer_emails:
-            if not group or group == 'volunteer':
-                results.append({'email': email, 'fullname': fullname, 'group': 'volunteer'})
-
-    return results
+    users, next_page = await paginate(
+        db.users_collection,
+        GROUP_QUERIES[group] if group else MEMBER_QUERY,
+        USER_SORT,
+        limit,
+        cursor=cursor,
+        skip=skip,
+        projection={"email": 1, "fullname": 1, "is_contact": 1, "is_volunteer": 1},
+    )
+    headers = {NEXT_CURSOR_HEADER: next_page} if next_page else None
+    return MongoJSONResponse(
+        [
+            {'email': user["email"], 'fullname': user["fullname"], 'group': group_label(user)}
+            for user in users
+        ],
+        headers=headers,
+    )
 
 @router.post('/images', tags=["Images"])
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(file: UploadFile = File(...), db=Depends(get_db)):
+    """
+    Resizes an image to the configured maximum size and uploads it to Cloudinary.
+    """
+    data = await file.read(settings.IMAGE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > settings.IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
     try:
-        upload_result = cloudinary.uploader.upload(file.file)
+        upload_result = await image_uploader.upload(data)
+        # Listed right away, without waiting for the next index sync
+        await index_image(db, upload_result)
         return {"url": upload_result['secure_url']}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get('/images', tags=["Images"])
-async def get_images(next_cursor: str = Query(None)):
+async def get_images(
+    next_cursor: str = Query(None), limit: int = Query(30, ge=1, le=100), db=Depends(get_db)
+):
     """
-    Retrieves images from Cloudinary with optional pagination parameters.
+    Retrieves images, newest first, from the local index of the Cloudinary images.
 
     Parameters:
         next_cursor (str, optional): The cursor for fetching the next set of images.
@@ -136,10 +232,12 @@ async def get_images(next_cursor: str = Query(None)):
     Returns:
         dict: A dictionary containing the image URLs and the next cursor.
     """
-    try:
-        resources = cloudinary.api.resources(type="upload", max_results=30, next_cursor=next_cursor)
-        image_urls = [resource["secure_url"] for resource in resources["resources"]]
-        next_cursor = resources.get("next_cursor")
-        return {"images": image_urls, "next_cursor": next_cursor}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to fetch images from Cloudinary")
\ No newline at end of file
+    images, next_cursor = await paginate(
+        db.images_collection,
+        {},
+        IMAGE_SORT,
+        limit,
+        cursor=next_cursor,
+        projection={"url": 1, "created_at": 1},
+    )
+    return {"images": [image["url"] for image in images], "next_cursor": next_cursor}
\ No newline at end of file
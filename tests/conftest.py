@@ -0,0 +1,20 @@
+import os
+
+# Settings are read at import time, so give the required ones harmless defaults
+for name, value in {
+    "MONGO_URL": "mongodb://localhost:27017",
+    "TITLE": "Hasken Rayuwa",
+    "DESCRIPTION": "Hasken Rayuwa API",
+    "API_VERSION": "v1",
+    "ADMIN_USERNAME": "admin",
+    "ADMIN_PASSWORD": "password",
+    "AUTH_SECRET_KEY": "test-secret-key-xxxxxxxxxxxxxxxxxxxxxxxx",
+    "CLOUDINARY_CLOUD_NAME": "test",
+    "CLOUDINARY_API_KEY": "test",
+    "CLOUDINARY_API_SECRET": "test",
+    "DOCS_URL": "/api/docs",
+    "S3_ACCESS_KEY": "test",
+    "S3_SECRET_KEY": "test",
+    "BUCKET_NAME": "test",
+}.items():
+    os.environ.setdefault(name, value)
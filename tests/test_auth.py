@@ -0,0 +1,132 @@
+import asyncio
+import base64
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from core.auth import (
+    InvalidToken,
+    RevocationList,
+    VerifiedTokens,
+    authenticate_user,
+    decode_token,
+    issue_token,
+    revoked_tokens,
+    verify_token,
+)
+from core.config import settings
+from db.database import get_db
+from routes.auth import auth_router
+
+
+class FakeRevocations:
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["_id"]] = {"_id": query["_id"], **update["$set"]}
+
+    async def _find(self, query):
+        for doc in self.docs.values():
+            if doc["expires_at"] > query["expires_at"]["$gt"]:
+                yield doc
+
+    def find(self, query, projection=None):
+        return self._find(query)
+
+
+class FakeDb:
+    def __init__(self):
+        self.revoked_tokens_collection = FakeRevocations()
+
+
+def basic(username: str, password: str) -> dict:
+    encoded = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {encoded}"}
+
+
+def make_client(db) -> TestClient:
+    app = FastAPI()
+    app.include_router(auth_router)
+
+    @app.get("/private")
+    async def private(username: str = Depends(authenticate_user)):
+        return {"username": username}
+
+    async def fake_db():
+        yield db
+
+    app.dependency_overrides[get_db] = fake_db
+    return TestClient(app)
+
+
+def test_tokens_are_rejected_when_tampered_with_or_expired():
+    token, claims = issue_token("admin")
+    assert decode_token(token) == claims
+
+    payload, _, signature = token.partition(".")
+    forged = base64.urlsafe_b64encode(b'{"sub":"root","exp":9999999999,"jti":"x"}')
+    with pytest.raises(InvalidToken):
+        decode_token(f"{forged.decode().rstrip('=')}.{signature}")
+    # Non-ASCII signatures are rejected rather than crashing the comparison
+    with pytest.raises(InvalidToken):
+        decode_token(f"{payload}.sïgnature")
+
+    expired, _ = issue_token("admin", ttl=-1)
+    with pytest.raises(InvalidToken, match="expired"):
+        verify_token(expired)
+
+
+def test_login_issues_a_token_that_logout_revokes():
+    client = make_client(FakeDb())
+
+    assert client.post(
+        "/auth", headers=basic(settings.ADMIN_USERNAME, "wrong")
+    ).status_code == 401
+    login = client.post(
+        "/auth", headers=basic(settings.ADMIN_USERNAME, settings.ADMIN_PASSWORD)
+    ).json()
+    assert login["token_type"] == "bearer"
+    bearer = {"Authorization": f"Bearer {login['access_token']}"}
+
+    assert client.get("/private", headers=bearer).json() == {
+        "username": settings.ADMIN_USERNAME
+    }
+    # Basic credentials are still accepted in place of a token
+    assert client.get(
+        "/private", headers=basic(settings.ADMIN_USERNAME, settings.ADMIN_PASSWORD)
+    ).status_code == 200
+
+    assert client.post("/logout", headers=bearer).status_code == 200
+    # Even though the token is still in the verified-token LRU
+    response = client.get("/private", headers=bearer)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    revoked_tokens.revoked.clear()
+
+
+def test_revocations_reach_other_workers_on_sync():
+    db = FakeDb()
+    token, claims = issue_token("admin")
+    asyncio.run(RevocationList(interval=5).revoke(db, claims))
+
+    other_worker = RevocationList(interval=5)
+    asyncio.run(other_worker.sync(db))
+    assert claims["jti"] in other_worker
+
+    # Expired revocations are dropped from the in-memory list
+    other_worker.add("old", int(time.time()) - 1)
+    other_worker.prune()
+    assert "old" not in other_worker
+
+
+def test_verified_tokens_lru_evicts_the_least_recently_used():
+    tokens = VerifiedTokens(max_entries=2)
+    tokens.put("a", {"jti": "a"})
+    tokens.put("b", {"jti": "b"})
+    tokens.get("a")
+    tokens.put("c", {"jti": "c"})
+    assert tokens.get("b") is None
+    assert tokens.get("a") == {"jti": "a"}
@@ -0,0 +1,44 @@
+import asyncio
+
+from pymongo.results import BulkWriteResult
+
+from db.bulk import batched, bulk_upsert
+
+
+class RecordingCollection:
+    """
+    Collects the operations handed to `bulk_write` and reports every row as upserted.
+    """
+
+    name = "recording_collection"
+
+    def __init__(self):
+        self.calls = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append((operations, ordered))
+        return BulkWriteResult(
+            {"nMatched": 0, "nUpserted": len(operations), "nModified": 0},
+            acknowledged=True,
+        )
+
+
+def test_batched_splits_into_bounded_lists():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_bulk_upsert_reports_per_batch_counts():
+    collection = RecordingCollection()
+    records = [{"State": "Kebbi", "Village": f"V{i}", "Converts": i} for i in range(5)]
+
+    results = asyncio.run(
+        bulk_upsert(collection, records, ("State", "Village"), batch_size=2)
+    )
+
+    assert [r["rows"] for r in results] == [2, 2, 1]
+    assert [r["upserted"] for r in results] == [2, 2, 1]
+    operations, ordered = collection.calls[0]
+    assert ordered is False
+    assert operations[0]._filter == {"State": "Kebbi", "Village": "V0"}
+    assert operations[0]._doc == {"$set": records[0]}
+    assert operations[0]._upsert is True
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from core.cache import CacheBackend, MemoryBackend, ResponseCache
+
+
+def make_app(cache: ResponseCache):
+    app = FastAPI()
+    calls = []
+
+    def get_db():
+        return object()
+
+    @app.get("/reports/{month}")
+    @cache.cached(tags=("reports",))
+    async def reports(month: str, limit: int = 10, db=Depends(get_db)):
+        calls.append((month, limit))
+        if month == "none":
+            raise HTTPException(status_code=404, detail="No reports")
+        return {"month": month, "limit": limit, "calls": len(calls)}
+
+    return app, calls
+
+
+def test_cached_route_serves_hits_until_its_tag_is_invalidated():
+    cache = ResponseCache(MemoryBackend(max_entries=10, max_bytes=1024), ttl=60)
+    app, calls = make_app(cache)
+    client = TestClient(app)
+
+    first = client.get("/reports/may")
+    assert client.get("/reports/may").json() == first.json() == {
+        "month": "may",
+        "limit": 10,
+        "calls": 1,
+    }
+    assert client.get("/reports/may?limit=5").json()["calls"] == 2
+    assert client.get("/reports/none").status_code == 404
+    assert client.get("/reports/none").status_code == 404
+
+    asyncio.run(cache.invalidate("reports"))
+    assert client.get("/reports/may").json()["calls"] == 5
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 5, 1)
+
+
+def test_memory_backend_evicts_least_recently_used_and_expired_entries():
+    backend = MemoryBackend(max_entries=2, max_bytes=1024)
+
+    async def scenario():
+        await backend.set("a", b"1", ttl=60, tags=("t",))
+        await backend.set("b", b"2", ttl=60, tags=("t",))
+        await backend.get("a")
+        await backend.set("c", b"3", ttl=-1, tags=("u",))
+        return [await backend.get(key) for key in "abc"]
+
+    assert asyncio.run(scenario()) == [b"1", None, None]
+    assert backend.size() == {"entries": 1, "bytes": 1}
+    assert asyncio.run(backend.invalidate(["t"])) == 1
+    assert backend.tags == {}
+
+
+def test_a_backend_missing_methods_cannot_be_created():
+    class GetOnly(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
@@ -0,0 +1,74 @@
+import asyncio
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from core.cache import MemoryBackend, ResponseCache, response_cache
+from core.etags import conditional, mark_changed
+
+
+class FakeVersions:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"], "version": 0})
+        doc["version"] += update["$inc"]["version"]
+
+
+class FakeDb:
+    def __init__(self):
+        self.versions_collection = FakeVersions()
+
+
+def make_app(db, cache: ResponseCache):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/blogs")
+    @conditional("blogs", route="blogs")
+    @cache.cached(tags=("blogs",))
+    async def read_blogs(request: Request, db=Depends(lambda: db)):
+        calls.append(1)
+        return {"calls": len(calls)}
+
+    return app, calls
+
+
+def test_conditional_get_answers_304_until_the_collection_changes():
+    db = FakeDb()
+    cache = ResponseCache(MemoryBackend(max_entries=10, max_bytes=1024), ttl=60)
+    app, calls = make_app(db, cache)
+    client = TestClient(app)
+
+    first = client.get("/blogs")
+    etag = first.headers["etag"]
+    assert etag == '"blogs-0"'
+    assert first.headers["cache-control"] == "public, max-age=60"
+
+    revalidated = client.get("/blogs", headers={"If-None-Match": f"W/{etag}"})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert len(calls) == 1
+
+    # A write through another worker: only the version in the database moves
+    asyncio.run(db.versions_collection.update_one({"_id": "blogs"}, {"$inc": {"version": 1}}))
+    changed = client.get("/blogs", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] == '"blogs-1"'
+    assert changed.json() == {"calls": 2}
+
+
+def test_mark_changed_bumps_version_and_drops_cached_responses():
+    db = FakeDb()
+
+    async def scenario():
+        await response_cache.backend.set("key", b"body", ttl=60, tags=("blogs",))
+        await mark_changed(db, "blogs")
+        return await response_cache.backend.get("key")
+
+    assert asyncio.run(scenario()) is None
+    assert db.versions_collection.docs["blogs"]["version"] == 1
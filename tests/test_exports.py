@@ -0,0 +1,86 @@
+import asyncio
+import io
+
+import orjson
+import pytest
+
+from core.exports import export_stream, row_batches
+from core.ingestion import iter_sheet_rows
+from models.states import States
+from routes.exports import EXPORTS, export_query
+from routes.filmshow import FILMSHOW_COLUMNS, filmshow_records
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+DOCS = [
+    {
+        "Team": "Paul",
+        "State": States.Kebbi,
+        "LGA": "Ngaski",
+        "Ward": "Kimo",
+        "Village": f"Village {i}",
+        "Population": 415,
+        "UPG": None,
+        "Attendance": 80,
+        "SD_Cards": 32,
+        "Audio_Bibles": None,
+        "People_Saved": 12,
+        "Date": "2024/05/01",
+        "Month": "MAY",
+    }
+    for i in range(5)
+]
+
+
+def export(format: str) -> bytes:
+    async def collect():
+        batches = row_batches(FakeCursor(DOCS), FILMSHOW_COLUMNS, batch_size=2)
+        stream = export_stream(format, batches, FILMSHOW_COLUMNS, title="filmshows")
+        return [chunk async for chunk in stream]
+
+    return b"".join(asyncio.run(collect()))
+
+
+def test_csv_export_uses_upload_headers():
+    lines = export("csv").decode().splitlines()
+
+    assert lines[0] == ",".join(FILMSHOW_COLUMNS)
+    assert lines[1] == "Paul,Kebbi,Ngaski,Kimo,Village 0,415,,80,32,,12,2024/05/01,MAY"
+    assert len(lines) == 6
+
+
+def test_ndjson_export_writes_one_object_per_row():
+    rows = [orjson.loads(line) for line in export("ndjson").splitlines()]
+
+    assert len(rows) == 5
+    assert rows[0]["S.D Cards"] == 32
+    assert rows[0]["State"] == "Kebbi"
+
+
+def test_xlsx_export_can_be_uploaded_again():
+    rows = list(iter_sheet_rows(io.BytesIO(export("xlsx"))))
+    records = filmshow_records(rows)
+
+    assert len(records) == 5
+    assert records[0]["SD_Cards"] == 32
+    assert records[4]["Village"] == "Village 4"
+
+
+def test_export_query_filters():
+    query = export_query(EXPORTS["filmshows"], "Kebbi", "may", 2024)
+
+    assert query == {"State": "Kebbi", "Month": "MAY", "Date": {"$regex": "^2024/"}}
+    assert set(export_query(EXPORTS["states"], None, None, 2024)["_id"]) == {"$gte", "$lt"}
+    with pytest.raises(ValueError):
+        export_query(EXPORTS["states"], None, "may", None)
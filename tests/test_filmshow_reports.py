@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import AutoReconnect
+from pymongo.results import BulkWriteResult
+
+from routes.filmshow import (
+    FILMSHOW_KEY_FIELDS,
+    create_film_show_report,
+    pending_report_keys,
+    report_key,
+    write_reports,
+)
+from schemas.filmshow import FilmShowReportCreate
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.operations = []
+
+    async def find_one(self, query, projection=None):
+        return next((doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())), None)
+
+    async def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+        upserted = {}
+        for index, operation in enumerate(operations):
+            if await self.find_one(operation._filter) is None:
+                doc = {**operation._filter, **operation._doc.get("$setOnInsert", {})}
+                self.docs.append(doc)
+                upserted[index] = doc["_id"]
+        return BulkWriteResult({"upserted": [{"index": i, "_id": v} for i, v in upserted.items()]}, True)
+
+    async def update_one(self, *args, **kwargs):
+        pass
+
+
+class FakeDb:
+    def __init__(self):
+        self.filmshow_collection = FakeCollection()
+        self.rollups_collection = FakeCollection()
+        self.versions_collection = FakeCollection()
+
+
+def report(**fields) -> dict:
+    return {
+        "Month": "MAY",
+        "State": "Plateau",
+        "LGA": "Jos North",
+        "Ward": "Ward 1",
+        "Village": "Tudun Wada",
+        "Team": "A",
+        "Attendance": 120,
+        "Date": "2024/05/01",
+        **fields,
+    }
+
+
+def test_existing_reports_are_never_overwritten():
+    db = FakeDb()
+    stored = {**report(Attendance=80), "_id": ObjectId()}
+    db.filmshow_collection.docs.append(dict(stored))
+    fresh = {**report(Village="Angwan Rogo"), "_id": ObjectId()}
+
+    batch = [{**report(), "_id": ObjectId()}, fresh]
+    asyncio.run(write_reports(db, batch))
+    # Replaying the batch inserts nothing and counts nothing twice
+    asyncio.run(write_reports(db, batch))
+
+    assert db.filmshow_collection.docs == [stored, fresh]
+    assert all(set(op._doc) == {"$setOnInsert"} for op in db.filmshow_collection.operations)
+    assert len(db.rollups_collection.operations) == 1
+
+
+def test_a_duplicate_report_is_rejected_up_front():
+    db = FakeDb()
+    db.filmshow_collection.docs.append({**report(), "_id": ObjectId()})
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(create_film_show_report(FilmShowReportCreate(**report()), db))
+    assert error.value.status_code == 400
+
+    created = asyncio.run(
+        create_film_show_report(FilmShowReportCreate(**report(Date="2024/05/02")), db)
+    )
+    # Written through, since the write-behind buffer is not started here
+    stored = db.filmshow_collection.docs[-1]
+    assert str(stored["_id"]) == str(created.id)
+    assert [stored[field] for field in FILMSHOW_KEY_FIELDS][-1] == "2024/05/02"
+
+
+def test_a_report_keeps_its_key_while_its_write_is_retried():
+    db = FakeDb()
+    posted = {**report(), "_id": ObjectId()}
+    pending_report_keys.add(report_key(posted))
+
+    async def unreachable(operations, ordered=True):
+        raise AutoReconnect("primary stepped down")
+
+    db.filmshow_collection.bulk_write = unreachable
+    with pytest.raises(AutoReconnect):
+        asyncio.run(write_reports(db, [posted]))
+
+    # Posting it again is still a duplicate, not a 201 for an _id never written
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(create_film_show_report(FilmShowReportCreate(**report()), db))
+    assert error.value.status_code == 400
+    pending_report_keys.clear()
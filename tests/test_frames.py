@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from core.frames import (
+    format_dates,
+    map_states,
+    nullable_int,
+    optional_str,
+    required_int,
+    to_records,
+)
+from models.states import States
+
+
+def test_map_states_accepts_fct_aliases():
+    states = map_states(pd.Series(["FCT", " abuja", "Federal Capital Territory", "kebbi"]))
+
+    assert list(states) == [States.FCT, States.FCT, States.FCT, States.Kebbi]
+
+
+def test_map_states_rejects_unknown_state():
+    with pytest.raises(ValueError, match="Invalid state: Atlantis"):
+        map_states(pd.Series(["Kano", "atlantis"]))
+
+
+def test_nullable_int_keeps_blanks_as_none():
+    assert list(nullable_int(pd.Series([415.0, None, 27.9]))) == [415, None, 27]
+
+
+def test_required_int_rejects_blanks():
+    with pytest.raises(ValueError, match="Attendance"):
+        required_int(pd.Series([1, None]), "Attendance")
+
+
+def test_format_dates_handles_timestamps_and_text():
+    assert list(format_dates(pd.to_datetime(pd.Series(["2024-05-01"])))) == ["2024/05/01"]
+    assert list(format_dates(pd.Series(["2024-05-01 00:00:00"]))) == ["2024/05/01"]
+
+
+def test_blank_dates_become_none():
+    dates = pd.to_datetime(pd.Series(["2024-05-01", None]))
+    assert list(format_dates(dates)) == ["2024/05/01", None]
+    assert list(format_dates(pd.Series(["2024-05-01", None]))) == ["2024/05/01", None]
+
+
+def test_optional_str_keeps_whole_numbers_whole():
+    assert list(optional_str(pd.Series([12.0, None, 7.0]))) == ["12", None, "7"]
+    assert list(optional_str(pd.Series([1.5, None]))) == ["1.5", None]
+    assert list(optional_str(pd.Series(["Ngaski", None]))) == ["Ngaski", None]
+
+
+def test_to_records_builds_plain_dicts():
+    records = to_records({"Population": nullable_int(pd.Series([1.0, None]))})
+
+    assert records == [{"Population": 1}, {"Population": None}]
+    assert type(records[0]["Population"]) is int
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timezone
+
+from core.images import ImageIndexSync, index_image
+
+
+class FakeImages:
+    def __init__(self):
+        self.docs = {}
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            await self.update_one(operation._filter, operation._doc, upsert=True)
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+
+class FakeSyncState:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"]})
+        for field, value in update["$max"].items():
+            doc[field] = max(doc.get(field, value), value)
+
+
+class FakeDb:
+    def __init__(self):
+        self.images_collection = FakeImages()
+        self.sync_state_collection = FakeSyncState()
+
+
+def resource(public_id: str, created_at: str) -> dict:
+    return {
+        "public_id": public_id,
+        "secure_url": f"https://res.cloudinary.com/demo/{public_id}.jpg",
+        "created_at": created_at,
+        "format": "jpg",
+        "width": 1600,
+        "height": 1200,
+        "bytes": 250_000,
+    }
+
+
+class FakeCloudinary:
+    def __init__(self, resources):
+        self.resources = resources
+        self.calls = []
+
+    def fetch(self, start_at, cursor, page_size):
+        self.calls.append((start_at, cursor))
+        matching = [
+            item
+            for item in self.resources
+            if start_at is None or datetime.fromisoformat(item["created_at"]) >= start_at
+        ]
+        offset = int(cursor or 0)
+        page = matching[offset:offset + page_size]
+        more = offset + page_size < len(matching)
+        return {"resources": page, "next_cursor": str(offset + page_size) if more else None}
+
+
+def test_sync_pages_through_new_images_and_resumes_from_the_newest():
+    db = FakeDb()
+    cloudinary = FakeCloudinary(
+        [resource(f"img{i}", f"2024-05-0{i}T10:00:00Z") for i in range(1, 6)]
+    )
+    sync = ImageIndexSync(interval=60, page_size=2, fetch=cloudinary.fetch)
+
+    assert asyncio.run(sync.run_once(db)) == 5
+    assert [call[1] for call in cloudinary.calls] == [None, "2", "4"]
+    assert db.images_collection.docs["img3"]["url"].endswith("/img3.jpg")
+
+    cloudinary.calls.clear()
+    cloudinary.resources.append(resource("img6", "2024-05-06T10:00:00Z"))
+    # Only the images at the watermark and the new one come back
+    assert asyncio.run(sync.run_once(db)) == 2
+    assert cloudinary.calls == [(datetime(2024, 5, 5, 10, tzinfo=timezone.utc), None)]
+
+
+def test_uploads_are_written_through_to_the_index():
+    db = FakeDb()
+    asyncio.run(index_image(db, resource("fresh", "2024-06-01T08:30:00Z")))
+    doc = db.images_collection.docs["fresh"]
+    assert doc["created_at"] == datetime(2024, 6, 1, 8, 30, tzinfo=timezone.utc)
+    assert doc["width"] == 1600
+
+
+def test_write_through_uploads_do_not_move_the_sync_watermark():
+    db = FakeDb()
+    cloudinary = FakeCloudinary([resource("img1", "2024-05-01T10:00:00Z")])
+    sync = ImageIndexSync(interval=60, page_size=10, fetch=cloudinary.fetch)
+    asyncio.run(sync.run_once(db))
+
+    # Added in the console, then overtaken by an upload through the API
+    console = resource("console", "2024-05-02T10:00:00Z")
+    uploaded = resource("uploaded", "2024-05-03T10:00:00Z")
+    cloudinary.resources += [console, uploaded]
+    asyncio.run(index_image(db, uploaded))
+
+    asyncio.run(sync.run_once(db))
+    assert "console" in db.images_collection.docs
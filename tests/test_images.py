@@ -0,0 +1,63 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+from core.images import ImageUploader, prepare_image
+
+
+def photo(width: int, height: int, orientation: int | None = None) -> bytes:
+    image = Image.new("RGB", (width, height), "navy")
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    if orientation:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+
+def test_prepare_image_resizes_rotates_and_strips_exif():
+    # Orientation 6: stored landscape, displayed rotated into portrait
+    prepared = prepare_image(photo(4000, 3000, orientation=6), 1600, 1600, quality=80)
+
+    image = Image.open(io.BytesIO(prepared))
+    assert image.format == "JPEG"
+    assert image.size == (1200, 1600)
+    assert not image.getexif()
+
+
+def test_prepare_image_rejects_non_images():
+    with pytest.raises(ValueError):
+        prepare_image(b"not an image", 1600, 1600, quality=80)
+
+
+def test_uploads_run_off_the_loop_at_most_concurrency_at_a_time():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def send(data: bytes) -> dict:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return {"secure_url": f"https://images.example/{len(data)}"}
+
+    uploader = ImageUploader(concurrency=2, send=send)
+
+    async def scenario():
+        return await asyncio.gather(*(uploader.upload(photo(800, 600)) for _ in range(6)))
+
+    results = asyncio.run(scenario())
+    uploader.shutdown()
+    assert len(results) == 6
+    assert peak == 2
@@ -0,0 +1,35 @@
+import asyncio
+
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+
+from db.indexes import INDEXES, ensure_indexes
+
+
+class FailingCollection:
+    def __init__(self, db, error):
+        self.db = db
+        self.error = error
+
+    async def create_indexes(self, models):
+        self.db.attempts += 1
+        raise self.error
+
+
+class FakeDb:
+    def __init__(self, error):
+        self.error = error
+        self.attempts = 0
+
+    def __getitem__(self, name):
+        return FailingCollection(self, self.error)
+
+
+def test_index_failures_do_not_stop_startup():
+    duplicates = FakeDb(OperationFailure("E11000 duplicate key"))
+    asyncio.run(ensure_indexes(duplicates))
+    assert duplicates.attempts == sum(len(models) for models in INDEXES.values())
+
+    # An unreachable server is given up on after the first index
+    unreachable = FakeDb(ServerSelectionTimeoutError("No servers found"))
+    asyncio.run(ensure_indexes(unreachable))
+    assert unreachable.attempts == 1
@@ -0,0 +1,103 @@
+import asyncio
+import io
+
+from openpyxl import Workbook
+from starlette.datastructures import UploadFile
+
+from core.ingestion import (
+    ingest_parallel,
+    iter_sheet_rows,
+    shutdown_parse_pool,
+    stream_excel_chunks,
+)
+
+
+def make_workbook(rows) -> io.BytesIO:
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def village_records(df) -> list[dict]:
+    return df.to_dict("records")
+
+
+class RecordingCollection:
+    name = "villages"
+
+    def __init__(self):
+        self.written = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.written.extend(operation._filter["Village"] for operation in operations)
+
+        class Result:
+            bulk_api_result = {"nUpserted": len(operations)}
+
+        return Result()
+
+
+def test_iter_sheet_rows_keys_rows_by_header_and_skips_blanks():
+    buffer = make_workbook(
+        [["State", "Village "], ["Kebbi", "Kimo"], [None, None], ["Sokoto", "Tambuwal"]]
+    )
+
+    assert list(iter_sheet_rows(buffer)) == [
+        {"State": "Kebbi", "Village": "Kimo"},
+        {"State": "Sokoto", "Village": "Tambuwal"},
+    ]
+
+
+def test_every_sheet_with_the_key_columns_is_read():
+    workbook = Workbook()
+    workbook.active.append(["Notes"])
+    workbook.active.append(["Filled in by the Kebbi team"])
+    for title, village in (("May", "Kimo"), ("June", "Tambuwal")):
+        sheet = workbook.create_sheet(title)
+        sheet.append(["State", "Village"])
+        sheet.append(["Kebbi", village])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    # The same sheets parse_sheet would keep, whichever path reads the upload
+    assert [row["Village"] for row in iter_sheet_rows(buffer, ("State", "Village"))] == [
+        "Kimo",
+        "Tambuwal",
+    ]
+
+
+def test_stream_excel_chunks_yields_bounded_chunks():
+    buffer = make_workbook([["Village"]] + [[f"V{i}"] for i in range(5)])
+    upload = UploadFile(file=buffer, filename="villages.xlsx")
+
+    async def collect():
+        return [chunk async for chunk in stream_excel_chunks(upload, chunk_size=2)]
+
+    chunks = asyncio.run(collect())
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[-1] == [{"Village": "V4"}]
+
+
+def test_uploads_sharing_a_filename_get_their_own_results():
+    uploads = [
+        UploadFile(file=make_workbook([["Village"], ["Kimo"]]), filename="report.xlsx"),
+        UploadFile(file=make_workbook([["Village"], ["Tambuwal"], ["Gudu"]]), filename="report.xlsx"),
+    ]
+    collection = RecordingCollection()
+
+    try:
+        results = asyncio.run(
+            ingest_parallel(uploads, collection, village_records, ("Village",))
+        )
+    finally:
+        shutdown_parse_pool()
+
+    assert [[batch["rows"] for batch in result["batches"]] for result in results] == [[1], [2]]
+    assert sorted(collection.written) == ["Gudu", "Kimo", "Tambuwal"]
@@ -0,0 +1,59 @@
+import logging
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.instrumentation import CommandTimer, ServerTimingMiddleware, filter_shape
+from core.responses import MongoJSONResponse
+
+
+def event(request_id: int, duration_ms: float = 0, command: dict | None = None):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name="find",
+        database_name="hasken_rayuwa",
+        command=command,
+        duration_micros=int(duration_ms * 1000),
+    )
+
+
+def test_filter_shape_hides_values():
+    command = {
+        "find": "states_collection",
+        "filter": {"State": "Kebbi", "Attendance": {"$gt": 10}, "Ward": {"$in": [1, 2]}},
+    }
+    assert filter_shape("find", command) == {
+        "State": "?",
+        "Attendance": {"$gt": "?"},
+        "Ward": {"$in": ["?"]},
+    }
+    assert filter_shape("update", {"updates": [{"q": {"_id": 1}}, {"q": {"_id": 2}}]}) == [
+        {"_id": "?"}
+    ]
+
+
+def test_commands_are_reported_in_server_timing_and_slow_log(caplog):
+    timer = CommandTimer(slow_ms=50)
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/states")
+    async def states():
+        for request_id, duration_ms in ((1, 10), (2, 60)):
+            command = {"find": "states_collection", "filter": {"State": "Kebbi"}}
+            timer.started(event(request_id, command=command))
+            timer.succeeded(event(request_id, duration_ms))
+        return MongoJSONResponse({"status": "success"})
+
+    with caplog.at_level(logging.WARNING):
+        response = TestClient(app).get("/states")
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith('db;dur=70.00;desc="2 commands", serialize;dur=')
+    assert "total;dur=" in timing
+    assert [record.getMessage() for record in caplog.records] == [
+        "Slow find succeeded in 60.0 ms on hasken_rayuwa.states_collection: {'State': '?'}"
+    ]
+    assert timer.commands == {}
@@ -0,0 +1,120 @@
+import asyncio
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+import core.jobs
+from core.jobs import JobManager, JobQueueFull
+
+
+class JobsCollection:
+    """
+    Applies the `$set`/`$push` updates the job manager issues to in-memory dicts.
+    """
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        doc = self.docs.setdefault(query["_id"], {})
+        doc.update(update.get("$set", {}))
+        for field, value in update.get("$push", {}).items():
+            doc.setdefault(field, []).append(value)
+
+
+class FakeDb:
+    def __init__(self):
+        self.jobs_collection = JobsCollection()
+
+
+async def ingest_ok(files, db, on_batch):
+    await on_batch(files[0].filename, {"batch": 0, "rows": 3})
+    return [{"file": files[0].filename, "batches": [{"batch": 0, "rows": 3}]}]
+
+
+async def ingest_broken(files, db, on_batch):
+    return [{"file": files[0].filename, "error": "Invalid state: Atlantis"}]
+
+
+def test_jobs_record_progress_and_drain_on_stop():
+    db = FakeDb()
+
+    async def run():
+        manager = JobManager(workers=2, max_queued=5)
+        await manager.start()
+        upload = UploadFile(file=io.BytesIO(b"xlsx"), filename="kebbi.xlsx")
+        ok = await manager.submit("states", [upload], ingest_ok, db)
+        upload = UploadFile(file=io.BytesIO(b"xlsx"), filename="bad.xlsx")
+        broken = await manager.submit("states", [upload], ingest_broken, db)
+        await manager.stop(timeout=5)
+        return ok.id, broken.id
+
+    ok_id, broken_id = asyncio.run(run())
+
+    ok = db.jobs_collection.docs[ok_id]
+    assert ok["status"] == "succeeded"
+    assert ok["rows"] == 3
+    assert ok["results"] == [{"file": "kebbi.xlsx", "batches": [{"batch": 0, "rows": 3}]}]
+
+    broken = db.jobs_collection.docs[broken_id]
+    assert broken["status"] == "failed"
+    assert broken["errors"] == [{"file": "bad.xlsx", "error": "Invalid state: Atlantis"}]
+
+
+def test_concurrent_submits_cannot_overfill_the_queue():
+    db = FakeDb()
+
+    async def run():
+        # No workers, so nothing leaves the queue
+        manager = JobManager(workers=0, max_queued=2)
+        await manager.start()
+        submitted = await asyncio.gather(
+            *(
+                manager.submit(
+                    "states", [UploadFile(file=io.BytesIO(b"xlsx"), filename=f"{n}.xlsx")], ingest_ok, db
+                )
+                for n in range(4)
+            ),
+            return_exceptions=True,
+        )
+        await manager.stop(timeout=0.01)
+        return submitted
+
+    submitted = asyncio.run(run())
+
+    assert [type(result) for result in submitted].count(JobQueueFull) == 2
+    # Jobs never run before shutdown are not left looking queued
+    assert [doc["status"] for doc in db.jobs_collection.docs.values()] == ["interrupted"] * 2
+
+
+def test_a_failed_submit_closes_the_copies_it_made(monkeypatch):
+    db = FakeDb()
+    copies = []
+
+    async def unreachable(query, update, upsert=False):
+        raise ConnectionError("jobs collection unreachable")
+
+    db.jobs_collection.update_one = unreachable
+
+    async def run():
+        manager = JobManager(workers=0, max_queued=2)
+        await manager.start()
+        upload = UploadFile(file=io.BytesIO(b"xlsx"), filename="kebbi.xlsx")
+        with pytest.raises(ConnectionError):
+            await manager.submit("states", [upload], ingest_ok, db)
+        await manager.stop(timeout=0.01)
+        return manager
+
+    detach = core.jobs._detach
+
+    async def recording_detach(file):
+        copies.append(await detach(file))
+        return copies[-1]
+
+    monkeypatch.setattr(core.jobs, "_detach", recording_detach)
+    manager = asyncio.run(run())
+
+    assert manager.reserved == 0
+    assert all(copy.file.closed for copy in copies) and copies
@@ -0,0 +1,91 @@
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsExporter,
+    http_request_duration,
+    instrument_routes,
+    registry,
+    render,
+)
+
+
+def test_render_merges_worker_snapshots():
+    requests = Counter("requests_total", "Requests", ("route",))
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.labels('/say/"hi"').inc()
+    latency.labels().observe(0.05)
+    latency.labels().observe(5)
+    snapshot = {
+        "requests_total": requests.snapshot(),
+        "latency_seconds": latency.snapshot(),
+    }
+
+    text = render([snapshot, snapshot])
+
+    assert 'requests_total{route="/say/\\"hi\\""} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_sum 10.1" in text
+    assert "latency_seconds_count 4" in text
+
+
+def test_exporter_drops_gauges_of_exited_workers(tmp_path):
+    in_flight = Gauge("dead_in_flight", "In flight")
+    rows = Counter("dead_rows_total", "Rows")
+    in_flight.labels().set(3)
+    rows.labels().inc(7)
+    # No process has this pid, so it stands for a worker that has exited
+    (tmp_path / "999999999.json").write_text(
+        json.dumps(
+            {"dead_in_flight": in_flight.snapshot(), "dead_rows_total": rows.snapshot()}
+        )
+    )
+
+    exporter = MetricsExporter(directory=str(tmp_path), interval=60)
+    text = render(exporter.read_all())
+
+    assert os.path.exists(exporter.path)
+    assert "dead_rows_total 7" in text
+    assert "dead_in_flight" not in text
+    # Taken over into this worker's snapshot, not merged again on the next read
+    assert not (tmp_path / "999999999.json").exists()
+    assert "dead_rows_total 7" in render(exporter.read_all())
+
+
+def test_a_restarted_worker_reusing_a_pid_keeps_the_old_totals(tmp_path):
+    rows = Counter("reused_rows_total", "Rows")
+    rows.labels().inc(5)
+    # Left by an earlier worker that had this pid, before a container restart
+    (tmp_path / f"{os.getpid()}-1.json").write_text(
+        json.dumps({"reused_rows_total": rows.snapshot()})
+    )
+
+    exporter = MetricsExporter(directory=str(tmp_path), interval=60)
+    exporter.write()
+    assert "reused_rows_total 5" in render(exporter.read_all())
+    assert os.listdir(tmp_path) == [os.path.basename(exporter.path)]
+
+
+def test_routes_are_labelled_by_path_template():
+    app = FastAPI()
+
+    @app.get("/blogs/{blog_id}")
+    async def read_blog(blog_id: str):
+        return {"id": blog_id}
+
+    instrument_routes(app)
+    client = TestClient(app)
+    client.get("/blogs/1")
+    client.get("/blogs/2")
+
+    child = http_request_duration.children[("GET", "/blogs/{blog_id}", "200")]
+    assert sum(child.snapshot()[0]) == 2
+    assert "http_request_duration_seconds_count" in render([registry.snapshot()])
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from core.pagination import encode_cursor, keyset_filter, next_cursor, paginate, with_cursor
+
+BLOG_SORT = [("date", -1), ("_id", -1)]
+
+
+def test_cursor_round_trips_bson_values():
+    doc = {"_id": ObjectId(), "date": datetime(2024, 5, 1, 12, 30)}
+
+    assert keyset_filter(BLOG_SORT, encode_cursor(doc, BLOG_SORT)) == {
+        "$or": [
+            {"$or": [{"date": {"$lt": doc["date"]}}, {"date": None}]},
+            {"date": doc["date"], "_id": {"$lt": doc["_id"]}},
+        ]
+    }
+
+
+def test_documents_without_a_sort_value_are_paged_through():
+    newest_dated = {"_id": ObjectId(), "date": datetime(2024, 5, 1)}
+    undated = {"_id": ObjectId(), "date": None}
+
+    # Undated blogs sort last, after every dated one
+    after_dated = keyset_filter(BLOG_SORT, encode_cursor(newest_dated, BLOG_SORT))
+    assert {"date": None} in after_dated["$or"][0]["$or"]
+    assert keyset_filter(BLOG_SORT, encode_cursor(undated, BLOG_SORT)) == {
+        "$or": [
+            {"date": {"$lt": None}},
+            {"date": None, "_id": {"$lt": undated["_id"]}},
+        ]
+    }
+    assert keyset_filter([("date", 1)], encode_cursor(undated, [("date", 1)])) == {
+        "date": {"$ne": None}
+    }
+
+
+def test_single_key_cursor_is_a_plain_range():
+    doc = {"_id": ObjectId()}
+    cursor = encode_cursor(doc, [("_id", 1)])
+
+    assert with_cursor({"media_type": "youtube"}, [("_id", 1)], cursor) == {
+        "$and": [{"media_type": "youtube"}, {"_id": {"$gt": doc["_id"]}}]
+    }
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException):
+        keyset_filter(BLOG_SORT, "not-a-cursor")
+    with pytest.raises(HTTPException):
+        keyset_filter(BLOG_SORT, encode_cursor({"_id": 1}, [("_id", 1)]))
+
+
+def test_next_cursor_trims_the_lookahead_document():
+    docs = [{"_id": i} for i in range(4)]
+
+    cursor = next_cursor(docs, [("_id", 1)], limit=3)
+
+    assert len(docs) == 3
+    assert keyset_filter([("_id", 1)], cursor) == {"_id": {"$gt": 2}}
+    assert next_cursor(docs, [("_id", 1)], limit=3) is None
+
+
+def test_paginate_rejects_empty_pages():
+    with pytest.raises(ValueError, match="limit"):
+        asyncio.run(paginate(collection=None, query={}, sort=[("_id", 1)], limit=0))
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from core.profiling import PROFILE_ID_HEADER, ProfilingMiddleware, profile_path
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/slow")
+    async def slow_endpoint():
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, time.sleep, 0.05)
+        started = time.perf_counter()
+        while time.perf_counter() - started < 0.02:
+            pass
+        return {"status": "success"}
+
+    return TestClient(app)
+
+
+def test_admin_request_is_profiled_to_speedscope(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+
+    response = make_client().get(
+        "/slow?profile=1", auth=(settings.ADMIN_USERNAME, settings.ADMIN_PASSWORD)
+    )
+
+    assert response.status_code == 200
+    with open(profile_path(response.headers[PROFILE_ID_HEADER])) as f:
+        profile = json.load(f)
+    names = [frame["name"] for frame in profile["shared"]["frames"]]
+    sampled = profile["profiles"][0]
+    assert "make_client.<locals>.slow_endpoint" in names
+    assert "<await Future>" in names
+    assert len(sampled["samples"]) == len(sampled["weights"]) > 0
+
+
+def test_profile_flag_is_ignored_without_admin_credentials(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+
+    response = make_client().get(
+        "/slow", headers={"X-Profile": "1"}, auth=("admin", "wrong")
+    )
+
+    assert response.status_code == 200
+    assert PROFILE_ID_HEADER not in response.headers
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.ratelimit import ConcurrencyLimiter, MemoryRateLimitBackend, limit_route
+
+
+def test_token_bucket_allows_a_burst_then_refills():
+    backend = MemoryRateLimitBackend(max_keys=10)
+
+    async def take_all():
+        return [await backend.take("client", rate=1.0, burst=3) for _ in range(4)]
+
+    waits = asyncio.run(take_all())
+    assert waits[:3] == [0, 0, 0]
+    assert 0.9 < waits[3] <= 1.0
+
+    # Another client has its own bucket
+    assert asyncio.run(backend.take("other", rate=1.0, burst=3)) == 0
+
+
+def test_rate_limited_route_answers_429_with_retry_after():
+    app = FastAPI()
+
+    @app.get("/heavy")
+    async def heavy():
+        return {"status": "success"}
+
+    route = app.routes[-1]
+    route.app = limit_route(
+        route.app, "/heavy", (0.5, 2), None, MemoryRateLimitBackend(max_keys=10)
+    )
+    client = TestClient(app)
+
+    assert [client.get("/heavy").status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get("/heavy")
+    assert response.headers["retry-after"] == "2"
+
+
+def test_concurrency_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, queue=1, timeout=0.05)
+        assert await limiter.acquire()
+
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # The slot is taken and the one queue place too
+        assert not await limiter.acquire()
+
+        limiter.release()
+        assert await queued
+        # Waiting out the timeout sheds the request as well
+        assert not await limiter.acquire()
+
+    asyncio.run(scenario())
+
+
+def test_overloaded_route_answers_503():
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/export")
+    async def export():
+        await release.wait()
+        return {"status": "success"}
+
+    route = app.routes[-1]
+    # One slot and no queue: a second request is shed immediately
+    route.app = limit_route(route.app, "/export", None, (1, 0), None)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/export"))
+            await asyncio.sleep(0.05)
+            shed = await client.get("/export")
+            release.set()
+            return (await first).status_code, shed
+
+    status, shed = asyncio.run(scenario())
+    assert status == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "5"
@@ -0,0 +1,62 @@
+import asyncio
+
+from db.rollups import ROLLUPS, compute_rollups, rollup_deltas
+from models.states import States
+
+FILMSHOWS = ROLLUPS["filmshow_collection"]
+
+
+def show(**fields):
+    return {"State": States.Kebbi, "LGA": "Ngaski", "Month": "MAY", **fields}
+
+
+def test_insert_update_and_delete_fold_into_deltas():
+    deltas = rollup_deltas(
+        FILMSHOWS,
+        [
+            (None, show(Attendance=80, SD_Cards=32)),
+            (show(Attendance=80), show(Attendance=95)),
+            (show(Attendance=10, People_Saved=4), None),
+        ],
+    )
+
+    key = (("source", "filmshows"), ("State", "Kebbi"), ("LGA", "Ngaski"), ("Month", "MAY"))
+    assert deltas[key]["count"] == 0
+    assert deltas[key]["Attendance"] == 80 + 15 - 10
+    assert deltas[key]["SD_Cards"] == 32
+    assert deltas[key]["People_Saved"] == -4
+
+
+def test_moving_a_report_between_months_moves_its_totals():
+    deltas = rollup_deltas(
+        FILMSHOWS, [(show(Attendance=50), show(Month="JUNE", Attendance=50))]
+    )
+
+    assert [delta["Attendance"] for delta in deltas.values()] == [-50, 50]
+
+
+def test_blank_cells_count_as_zero():
+    deltas = rollup_deltas(FILMSHOWS, [(None, show(Attendance=None, SD_Cards=float("nan")))])
+
+    (delta,) = deltas.values()
+    assert delta["count"] == 1
+    assert delta["Attendance"] == 0
+    assert delta["SD_Cards"] == 0
+
+
+def test_recomputed_keys_match_incremental_keys_when_fields_are_missing():
+    class Collection:
+        def aggregate(self, pipeline):
+            async def rows():
+                # $group leaves a missing field out of _id
+                yield {"_id": {"State": "Kebbi", "Month": "MAY"}, "count": 1, "Attendance": 80}
+
+            return rows()
+
+    class Db:
+        def __getitem__(self, name):
+            return Collection()
+
+    (key,) = asyncio.run(compute_rollups(Db(), "filmshow_collection"))
+    (expected,) = rollup_deltas(FILMSHOWS, [(None, {"State": "Kebbi", "Month": "MAY"})])
+    assert key == expected
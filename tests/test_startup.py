@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+from benchmarks.startup import HEAVY_MODULES
+
+
+def test_app_import_defers_heavy_dependencies():
+    # A fresh interpreter, since this one may have imported them already
+    code = (
+        "import sys, main\n"
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,12 @@
+from routes.states import cache_totals, cached_totals
+
+
+def test_totals_are_retired_by_a_write_through_any_worker():
+    cache_totals("Kebbi", 3, {"total_converts": 10})
+    assert cached_totals("Kebbi", 3) == {"total_converts": 10}
+
+    # Another worker's write bumped the version this worker reads
+    assert cached_totals("Kebbi", 4) is None
+    cache_totals("Kebbi", 4, {"total_converts": 12})
+    assert cached_totals("Kebbi", 3) is None
+    assert cached_totals("Kebbi", 4) == {"total_converts": 12}
@@ -0,0 +1,157 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from db.migrate_users import read_users, user_update
+from core.writebehind import write_behind
+from routes.users import (
+    GROUP_QUERIES,
+    MEMBER_QUERY,
+    create_contact,
+    group_label,
+    write_contacts,
+    write_volunteers,
+)
+
+
+class FakeCollection:
+    def __init__(self, key: str):
+        self.key = key
+        self.docs = {}
+        self.writes = 0
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.writes += 1
+            query, update = operation._filter, operation._doc
+            doc = self.docs.get(query[self.key])
+            if doc is None:
+                doc = self.docs[query[self.key]] = {**query, **update.get("$setOnInsert", {})}
+            doc.update(update.get("$set", {}))
+
+
+class FakeDb:
+    def __init__(self):
+        self.users_collection = FakeCollection("email")
+        self.contact_messages_collection = FakeCollection("_id")
+
+
+def contact(email: str, message: str) -> dict:
+    return {
+        "_id": ObjectId(),
+        "email": email,
+        "fullname": email.split("@")[0].title(),
+        "message": message,
+        "created_at": datetime(2024, 5, 1, tzinfo=timezone.utc),
+    }
+
+
+def matches(doc: dict, query: dict) -> bool:
+    return all(doc.get(field) == value for field, value in query.items())
+
+
+def test_membership_flags_are_kept_up_to_date_at_write_time():
+    db = FakeDb()
+    contacts = [
+        contact("ada@example.com", "Hello"),
+        contact("ada@example.com", "Hello"),
+        contact("ada@example.com", "Any news?"),
+    ]
+
+    async def scenario():
+        await write_contacts(db, contacts)
+        await write_volunteers(
+            db,
+            [
+                {"email": "bo@example.com", "fullname": "Bo", "phone_number": "1", "address": "Jos"},
+                {"email": "ada@example.com", "fullname": "Ada", "phone_number": "2", "address": "Kano"},
+            ],
+        )
+        # A replayed batch changes nothing
+        await write_contacts(db, contacts)
+
+    asyncio.run(scenario())
+    ada, bo = db.users_collection.docs["ada@example.com"], db.users_collection.docs["bo@example.com"]
+
+    assert (ada["is_contact"], ada["is_volunteer"]) == (True, True)
+    assert (bo["is_contact"], bo["is_volunteer"]) == (False, True)
+    # The double-clicked message is stored once, and only once after the replay
+    assert len(db.contact_messages_collection.docs) == 2
+    assert group_label(ada) == "contact | volunteer"
+    assert [matches(ada, GROUP_QUERIES[group]) for group in ("contact", "volunteer", "both")] == [
+        False,
+        False,
+        True,
+    ]
+    assert matches(bo, GROUP_QUERIES["volunteer"])
+
+
+def test_migration_merges_the_sql_tables_by_email(tmp_path):
+    path = str(tmp_path / "users.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE users (id TEXT, fullname TEXT, email TEXT);
+        CREATE TABLE contact (id TEXT, fullname TEXT, contact_email TEXT, message TEXT);
+        CREATE TABLE volunteer (
+            id TEXT, fullname TEXT, volunteer_email TEXT, phone_number TEXT, address TEXT
+        );
+        INSERT INTO users VALUES ('1', 'Ada', 'Ada@Example.com');
+        INSERT INTO contact VALUES ('2', 'Ada', 'ada@example.com', 'Hello');
+        INSERT INTO contact VALUES ('3', 'Cy', 'cy@example.com', 'Hi');
+        INSERT INTO volunteer VALUES ('4', 'Ada', 'ada@example.com', '+234', 'Kano');
+        """
+    )
+    connection.commit()
+    connection.close()
+
+    users, messages = read_users(path)
+
+    assert users["ada@example.com"]["is_contact"] and users["ada@example.com"]["is_volunteer"]
+    assert users["ada@example.com"]["address"] == "Kano"
+    assert not users["cy@example.com"]["is_volunteer"]
+    assert [message["email"] for message in messages] == ["ada@example.com", "cy@example.com"]
+
+
+def test_a_journal_failure_is_reported_as_unavailable(monkeypatch):
+    async def disk_full(db, kind, doc):
+        raise OSError(28, "No space left on device", "/srv/journal/1-00000001.journal")
+
+    monkeypatch.setattr(write_behind, "enqueue", disk_full)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(create_contact("Ada", "ada@example.com", "Hello", db=FakeDb()))
+
+    assert error.value.status_code == 503
+    assert "/srv/journal" not in error.value.detail
+
+
+def test_users_in_no_group_are_left_out_of_the_listing():
+    migrated = {"email": "dee@example.com", "is_contact": False, "is_volunteer": False}
+
+    assert group_label(migrated) is None
+    assert not any(matches(migrated, branch) for branch in MEMBER_QUERY["$or"])
+
+
+def test_rerunning_the_migration_keeps_flags_set_by_the_forms():
+    db = FakeDb()
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    migrated = {
+        "email": "ada@example.com",
+        "fullname": "Ada",
+        "is_contact": True,
+        "is_volunteer": False,
+    }
+
+    async def scenario():
+        await db.users_collection.bulk_write([user_update(migrated, now)])
+        volunteer = {"email": "ada@example.com", "fullname": "Ada", "phone_number": "2"}
+        await write_volunteers(db, [{**volunteer, "address": "Kano"}])
+        await db.users_collection.bulk_write([user_update(migrated, now)])
+
+    asyncio.run(scenario())
+    ada = db.users_collection.docs["ada@example.com"]
+    assert (ada["is_contact"], ada["is_volunteer"]) == (True, True)
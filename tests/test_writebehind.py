@@ -0,0 +1,158 @@
+import asyncio
+import os
+from datetime import datetime
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from core.writebehind import WriteBehindBuffer
+
+
+class RecordingHandler:
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+
+    async def __call__(self, db, docs):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("primary stepped down")
+        self.batches.append(docs)
+
+
+def make_buffer(directory, handler, max_batch=100, max_delay=60.0) -> WriteBehindBuffer:
+    buffer = WriteBehindBuffer(str(directory), max_batch=max_batch, max_delay=max_delay)
+    buffer.register("contact", handler)
+    return buffer
+
+
+def journal_files(directory) -> list[str]:
+    return sorted(name for name in os.listdir(directory) if name.endswith(".journal"))
+
+
+def test_a_full_segment_is_flushed_without_waiting_for_the_delay(tmp_path):
+    handler = RecordingHandler()
+    buffer = make_buffer(tmp_path, handler, max_batch=5, max_delay=60.0)
+
+    async def scenario():
+        await buffer.start(db=None)
+        await asyncio.gather(
+            *(buffer.enqueue(None, "contact", {"n": n}) for n in range(12))
+        )
+        await asyncio.sleep(0.1)
+        flushed = [doc["n"] for batch in handler.batches for doc in batch]
+        await buffer.stop()
+        return flushed
+
+    assert sorted(asyncio.run(scenario())) == list(range(12))
+    assert journal_files(tmp_path) == []
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    crashed = make_buffer(tmp_path, RecordingHandler())
+
+    async def crash():
+        await crashed.start(db=None)
+        await crashed.enqueue(None, "contact", {"email": "ada@example.com", "at": datetime(2024, 5, 1)})
+        await crashed.enqueue(None, "contact", {"email": "bo@example.com", "at": datetime(2024, 5, 2)})
+        # The worker dies without flushing, mid-way through a write
+        crashed.task.cancel()
+        crashed.segment.append(b'{"kind": "contact", "doc": {"em')
+        crashed.segment.close()
+
+    asyncio.run(crash())
+    assert len(journal_files(tmp_path)) == 1
+
+    handler = RecordingHandler()
+    restarted = make_buffer(tmp_path, handler)
+
+    async def restart():
+        await restarted.start(db=None)
+        await restarted.stop()
+
+    asyncio.run(restart())
+    assert handler.batches == [
+        [
+            {"email": "ada@example.com", "at": datetime(2024, 5, 1)},
+            {"email": "bo@example.com", "at": datetime(2024, 5, 2)},
+        ]
+    ]
+    assert journal_files(tmp_path) == []
+
+
+def test_failed_flushes_are_retried_and_kept_across_restarts(tmp_path):
+    handler = RecordingHandler(failures=2)
+    buffer = make_buffer(tmp_path, handler)
+
+    async def scenario():
+        await buffer.start(db=None)
+        await buffer.enqueue(None, "contact", {"n": 1})
+        await buffer.flush()
+        assert handler.batches == []
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    # Both flushes failed, so the submission waits in the journal
+    assert len(journal_files(tmp_path)) == 1
+
+    restarted = make_buffer(tmp_path, handler)
+
+    async def restart():
+        await restarted.start(db=None)
+        await restarted.stop()
+
+    asyncio.run(restart())
+    assert handler.batches == [[{"n": 1}]]
+    assert journal_files(tmp_path) == []
+
+
+def test_without_start_submissions_are_written_through(tmp_path):
+    handler = RecordingHandler()
+    buffer = make_buffer(tmp_path, handler)
+
+    asyncio.run(buffer.enqueue("db", "contact", {"n": 1}))
+
+    assert handler.batches == [[{"n": 1}]]
+    assert os.listdir(tmp_path) == []
+
+
+def test_a_rejected_segment_is_set_aside_without_blocking_the_next(tmp_path):
+    handler = RecordingHandler()
+
+    async def reject_bad(db, docs):
+        if any(doc.get("bad") for doc in docs):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121}]})
+        await handler(db, docs)
+
+    buffer = make_buffer(tmp_path, reject_bad)
+
+    async def scenario():
+        await buffer.start(db=None)
+        await buffer.enqueue(None, "contact", {"bad": True})
+        await buffer.flush()
+        await buffer.enqueue(None, "contact", {"n": 1})
+        await buffer.flush()
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert handler.batches == [[{"n": 1}]]
+    assert journal_files(tmp_path) == []
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".failed")]
+
+
+def test_a_cancelled_request_does_not_strand_the_rest_of_its_batch(tmp_path):
+    handler = RecordingHandler()
+    buffer = make_buffer(tmp_path, handler)
+
+    async def scenario():
+        await buffer.start(db=None)
+        loop = asyncio.get_running_loop()
+        cancelled, waiting = loop.create_future(), loop.create_future()
+        cancelled.cancel()
+        buffer.pending += [({"kind": "contact", "doc": {"n": 1}}, cancelled)]
+        buffer.pending += [({"kind": "contact", "doc": {"n": 2}}, waiting)]
+        await buffer.flush()
+        await asyncio.wait_for(waiting, 1)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert handler.batches == [[{"n": 1}, {"n": 2}]]
@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+
+from core.youtube import (
+    MetadataBackfill,
+    MetadataSource,
+    MetadataUnavailable,
+    VideoMetadata,
+    VideoNotFound,
+    video_id,
+)
+
+
+class StubSource(MetadataSource):
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    def fetch(self, video_id: str) -> dict:
+        self.calls.append(video_id)
+        if video_id == "missingvide":
+            raise VideoNotFound("Video unavailable")
+        time.sleep(self.delay)
+        return {"title": f"Title {video_id}", "description": "About it"}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    def find(self, query, projection=None):
+        return FakeCursor(
+            [doc for doc in self.docs.values() if doc.get("title") is None]
+        )
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+
+class FakeDb:
+    def __init__(self, links=()):
+        self.youtube_metadata_collection = FakeCollection()
+        self.links_collection = FakeCollection(links)
+        self.versions_collection = FakeCollection()
+        self.versions_collection.update_one = self._bump
+
+    async def _bump(self, query, update, upsert=False):
+        pass
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://youtu.be/dQw4w9WgXcQ?si=share",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42",
+        "https://m.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    ],
+)
+def test_video_id_normalizes_every_url_form(url):
+    assert video_id(url) == "dQw4w9WgXcQ"
+
+
+def test_video_id_rejects_other_urls():
+    assert video_id("https://www.youtube.com/watch?v=short") is None
+    assert video_id("https://example.com/watch?v=dQw4w9WgXcQ") is None
+
+
+def test_metadata_is_fetched_once_per_video():
+    source = StubSource(delay=0.02)
+    metadata = VideoMetadata(source, timeout=1, workers=2)
+    db = FakeDb()
+
+    async def scenario():
+        # Concurrent lookups share one fetch, later ones read the cache
+        first = await asyncio.gather(*(metadata.get(db, "dQw4w9WgXcQ") for _ in range(3)))
+        again = await metadata.get(db, "dQw4w9WgXcQ")
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert source.calls == ["dQw4w9WgXcQ"]
+    assert first[0] == again == {"title": "Title dQw4w9WgXcQ", "description": "About it"}
+    metadata.shutdown()
+
+
+def test_waiters_take_over_when_the_fetching_caller_is_cancelled():
+    source = StubSource(delay=0.05)
+    metadata = VideoMetadata(source, timeout=1, workers=2)
+    db = FakeDb()
+
+    async def scenario():
+        leader = asyncio.create_task(metadata.get(db, "dQw4w9WgXcQ"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(metadata.get(db, "dQw4w9WgXcQ"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()) == {"title": "Title dQw4w9WgXcQ", "description": "About it"}
+    assert source.calls == ["dQw4w9WgXcQ", "dQw4w9WgXcQ"]
+    metadata.shutdown()
+
+
+def test_slow_or_missing_videos_raise_without_blocking_the_loop():
+    metadata = VideoMetadata(StubSource(delay=0.2), timeout=0.05, workers=2)
+    db = FakeDb()
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        with pytest.raises(MetadataUnavailable):
+            await metadata.get(db, "dQw4w9WgXcQ")
+        task.cancel()
+        # The loop kept running while the fetch was outstanding
+        assert ticks > 3
+
+        with pytest.raises(VideoNotFound):
+            await metadata.get(db, "missingvide")
+
+    asyncio.run(scenario())
+    assert db.youtube_metadata_collection.docs == {}
+    metadata.shutdown()
+
+
+def test_backfill_fills_links_without_titles():
+    db = FakeDb(
+        links=[
+            {"_id": 1, "url": "https://youtu.be/dQw4w9WgXcQ", "media_type": "youtube", "title": None},
+            {"_id": 2, "url": "https://youtu.be/missingvide", "media_type": "youtube", "title": None},
+        ]
+    )
+    metadata = VideoMetadata(StubSource(), timeout=1, workers=1)
+    backfill = MetadataBackfill(metadata, interval=60, batch_size=10)
+
+    assert asyncio.run(backfill.run_once(db)) == 1
+    assert db.links_collection.docs[1]["title"] == "Title dQw4w9WgXcQ"
+    assert db.links_collection.docs[2]["title"] is None
+    assert "metadata_attempted_at" in db.links_collection.docs[2]
+    metadata.shutdown()